@@ -0,0 +1,383 @@
+"""Time druider on synthetic bestiaries at several multiples of data.csv.
+
+    python benchmarks/run.py                       # 1x, 10x and 100x
+    python benchmarks/run.py --scales 1,10,100,1000
+    python benchmarks/run.py --baseline benchmarks/results/1a2b3c4.json
+    python benchmarks/run.py --compare OLD.json NEW.json
+
+Each scale runs in a fresh interpreter, so its peak memory is its own. Results
+are saved as benchmarks/results/<commit>.json, so runs can be compared between
+commits. The checked-out tree under src/ is timed, not an installed copy.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from synthetic import ROOT, generate
+
+sys.path.insert(0, str(ROOT / "src"))
+
+RESULTS = Path(__file__).resolve().parent / "results"
+SCALES = (1, 10, 100)
+# Above this many rows only the virtual listing is driven; a DataTable of them is impractical.
+TABLE_MAX = 30_000
+THRESHOLD = 1.2
+
+Result = Dict[str, Any]
+
+
+def timed(function: Callable[[], Any], repeat: int) -> Result:
+    """Milliseconds taken by `function` over `repeat` calls."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summary(samples)
+
+
+def summary(samples: List[float]) -> Result:
+    return {
+        "n": len(samples),
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "p95": sorted(samples)[max(int(len(samples) * 0.95) - 1, 0)],
+        "max": max(samples),
+    }
+
+
+def peak_rss_kb() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def bench_core(path: Path, repeat: int) -> Result:
+    """Load, index, filter, search and sort without any UI."""
+    from druider.aggregates import Aggregates, GroupBy
+    from druider.compare import column, diff, profile
+    from druider.data import Column, load_data
+    from druider.encounters import MAX_KINDS, EncounterIndex, budget
+    from druider.facets import FacetIndex, parse
+    from druider.links import LinkIndex
+    from druider.parsing import ParsedFields
+    from druider.search import SearchIndex
+    from druider.sorting import SortEngine
+    from druider.wildshape import WildShapeIndex
+
+    for sidecar in path.parent.glob(f"{path.name}.*"):
+        if sidecar.suffix == ".snapshot":
+            sidecar.unlink()
+    results: Result = {}
+    started = time.perf_counter()
+    data = load_data(path)
+    results["rows"] = len(data)
+    results["load.cold"] = summary([(time.perf_counter() - started) * 1000])
+    results["load.warm"] = timed(lambda: load_data(path), repeat)
+    builds = {
+        "index.search": SearchIndex.load,
+        "index.facets": FacetIndex.load,
+        "index.parsed": ParsedFields.load,
+        "index.sort": SortEngine.load,
+        "index.encounters": EncounterIndex.load,
+        "index.links": LinkIndex.load,
+    }
+    loaded = {}
+    for name, load in builds.items():
+        started = time.perf_counter()
+        loaded[name] = load(data)
+        results[f"{name}.cold"] = summary([(time.perf_counter() - started) * 1000])
+        results[f"{name}.warm"] = timed(lambda load=load: load(data), repeat)
+    index, facets, sorter = (
+        loaded["index.search"],
+        loaded["index.facets"],
+        loaded["index.sort"],
+    )
+    facets.fields = loaded["index.parsed"]
+    results["index.wildshape"] = timed(lambda: WildShapeIndex.build(facets), repeat)
+    results["memory.indexed_kb"] = peak_rss_kb()
+
+    for name, expression in (
+        ("filter.facets", "type=animal OR type=magical beast, size<=large, cr<=6"),
+        ("filter.measure", "speed.swim>=30, skill.stealth>=+10"),
+    ):
+        term = parse(expression)
+        results[name] = timed(lambda term=term: facets.resolve(term), repeat)
+
+    def search() -> None:
+        index._cache.clear()
+        index.search("dra")
+
+    results["search.prefix"] = timed(search, repeat)
+    filtered = sorted(index.search("dra") or ())
+    keys = [(Column.cr, True), (Column._name, False)]
+    results["sort.all"] = timed(lambda: sorter.order(keys), repeat)
+    results["sort.filtered"] = timed(lambda: sorter.order(keys, filtered), repeat)
+
+    encounters, xp = loaded["index.encounters"], budget(10)
+    for kinds in range(1, MAX_KINDS + 1):
+        results[f"encounters.kinds{kinds}"] = timed(
+            lambda kinds=kinds: encounters.find(xp, kinds), repeat
+        )
+    animals = facets.resolve(parse("type=animal"))
+    results["encounters.filtered"] = timed(
+        lambda: encounters.find(xp, 2, candidates=animals), repeat
+    )
+    results["encounters.widest"] = timed(
+        lambda: encounters.find(budget(12), MAX_KINDS, 10), repeat
+    )
+
+    results["aggregates.all"] = timed(
+        lambda: Aggregates(data, facets, GroupBy.type).update(facets.universe), repeat
+    )
+    aggregates = Aggregates(data, facets, GroupBy.type)
+    steps = itertools.cycle(
+        [facets.resolve(parse(f"size<={size}")) for size in ("large", "medium")]
+    )
+    results["aggregates.step"] = timed(lambda: aggregates.update(next(steps)), repeat)
+
+    def compare() -> None:
+        profiles = [profile(data, row) for row in filtered[:10]]
+        diff(profiles)
+        for entry in profiles:
+            column(entry, profiles[0])
+
+    results["compare.ten"] = timed(compare, repeat)
+    return results
+
+
+async def bench_pilot(path: Path, virtual: bool, repeat: int) -> Result:
+    """Drive the app headlessly: startup, moving the selection, sorting and rendering details."""
+    from druider.app import DruidHelper
+    from druider.data import Column
+
+    results: Result = {}
+    app = DruidHelper(path, virtual=virtual, watch_source=False)
+    async with app.run_test(size=(160, 50)) as pilot:
+        deadline = time.perf_counter() + 600
+        while "interactive" not in app.timings:
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"{path} did not become interactive")
+            await pilot.pause(0.05)
+        for milestone in ("first frame", "data loaded", "indexed", "interactive"):
+            results[f"startup.{milestone.replace(' ', '_')}"] = summary(
+                [app.timings[milestone] * 1000]
+            )
+
+        animals = app.body.listing.animals
+        animals.focus()
+        await pilot.pause()
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await pilot.press("down")
+            await pilot.pause()
+            samples.append((time.perf_counter() - started) * 1000)
+        results["select"] = summary(samples)
+
+        samples = []
+        columns = (Column.cr, Column._name, Column.hp)
+        for step in range(repeat):
+            started = time.perf_counter()
+            animals.sort_data_column(columns[step % len(columns)])
+            await pilot.pause()
+            samples.append((time.perf_counter() - started) * 1000)
+        results["sort"] = summary(samples)
+
+        stats = app.body.details.stats
+        data = app.body.data
+        samples = []
+        for row in range(0, len(data), max(len(data) // 200, 1)):
+            started = time.perf_counter()
+            stats.get_tree(data[row], row)
+            samples.append((time.perf_counter() - started) * 1000)
+        results["render.tree"] = summary(samples)
+    results["memory.peak_kb"] = peak_rss_kb()
+    return results
+
+
+def worker(path: Path, repeat: int, pilot: bool) -> Result:
+    core = bench_core(path, repeat)
+    results = {
+        "rows": core.pop("rows"),
+        **{f"core.{name}": value for name, value in core.items()},
+    }
+    if pilot:
+        modes = ("table", "virtual") if results["rows"] <= TABLE_MAX else ("virtual",)
+        for mode in modes:
+            measured = asyncio.run(bench_pilot(path, mode == "virtual", repeat))
+            results.update(
+                {f"pilot.{mode}.{name}": value for name, value in measured.items()}
+            )
+    return results
+
+
+def git(*args: str) -> str:
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run(scales: List[int], repeat: int, pilot: bool) -> Result:
+    commit = git("rev-parse", "--short", "HEAD") or "unknown"
+    dirty = bool(git("status", "--porcelain", "--untracked-files=no"))
+    report: Result = {
+        "commit": commit,
+        "dirty": dirty,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scales": {},
+    }
+    for scale in scales:
+        path = generate(scale)
+        print(f"{scale}x: {path}", file=sys.stderr)
+        command = [
+            sys.executable,
+            __file__,
+            "--worker",
+            str(path),
+            "--repeat",
+            str(repeat),
+        ]
+        if not pilot:
+            command.append("--no-pilot")
+        finished = subprocess.run(command, capture_output=True, text=True)
+        if finished.returncode:
+            print(finished.stderr, file=sys.stderr)
+            report["scales"][f"{scale}x"] = {
+                "error": finished.stderr.strip().splitlines()[-1:]
+            }
+            continue
+        report["scales"][f"{scale}x"] = json.loads(
+            finished.stdout.strip().splitlines()[-1]
+        )
+    return report
+
+
+def save(report: Result) -> Path:
+    RESULTS.mkdir(exist_ok=True)
+    path = RESULTS / f"{report['commit']}{'-dirty' if report['dirty'] else ''}.json"
+    path.write_text(json.dumps(report, indent=1) + "\n")
+    return path
+
+
+def compare(old: Result, new: Result, threshold: float = THRESHOLD) -> List[str]:
+    """Lines comparing medians of `new` against `old`; those `threshold` times slower are flagged."""
+    lines = [
+        f"{old['commit']} -> {new['commit']}",
+        f"{'metric':<44}{'old':>12}{'new':>12}{'ratio':>8}",
+    ]
+    for scale, results in new["scales"].items():
+        before = old["scales"].get(scale, {})
+        for name, value in results.items():
+            previous = before.get(name)
+            if (
+                not isinstance(value, dict)
+                or not isinstance(previous, dict)
+                or "median" not in value
+            ):
+                if (
+                    isinstance(value, int)
+                    and isinstance(previous, int)
+                    and name.startswith("memory")
+                ):
+                    value, previous = {"median": value}, {"median": previous}
+                else:
+                    continue
+            ratio = value["median"] / previous["median"] if previous["median"] else 1.0
+            flag = (
+                "  slower"
+                if ratio > threshold
+                else "  faster" if ratio < 1 / threshold else ""
+            )
+            old_median, new_median = previous["median"], value["median"]
+            lines.append(
+                f"{scale + ' ' + name:<44}{old_median:>12.2f}{new_median:>12.2f}{ratio:>8.2f}{flag}"
+            )
+    return lines
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scales",
+        default=",".join(map(str, SCALES)),
+        help="comma-separated multiples of data.csv",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=9,
+        help="samples per timing (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-pilot",
+        dest="pilot",
+        action="store_false",
+        help="skip the headless app runs",
+    )
+    parser.add_argument(
+        "--baseline", type=Path, help="results file to compare this run against"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="ratio flagged as a regression",
+    )
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        type=Path,
+        metavar=("OLD", "NEW"),
+        help="compare two results files",
+    )
+    parser.add_argument("--worker", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker is not None:
+        print(json.dumps(worker(args.worker, args.repeat, args.pilot)))
+        return 0
+    if args.compare is not None:
+        old, new = (json.loads(path.read_text()) for path in args.compare)
+        print("\n".join(compare(old, new, args.threshold)))
+        return 0
+    # Read the baseline first: this run may overwrite it when nothing was committed in between.
+    baseline = (
+        json.loads(args.baseline.read_text()) if args.baseline is not None else None
+    )
+    report = run(
+        [int(scale) for scale in args.scales.split(",")], args.repeat, args.pilot
+    )
+    print(f"Saved {save(report)}", file=sys.stderr)
+    if baseline is not None:
+        print("\n".join(compare(baseline, report, args.threshold)))
+    else:
+        for scale, results in report["scales"].items():
+            for name, value in results.items():
+                shown = (
+                    f"{value['median']:.2f} ms"
+                    if isinstance(value, dict) and "median" in value
+                    else value
+                )
+                print(f"{scale + ' ' + name:<44}{shown}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
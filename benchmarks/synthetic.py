@@ -0,0 +1,104 @@
+"""Synthetic bestiaries: `data.csv` scaled up to N copies with unique, varied creatures.
+
+Rows follow the `Column` schema by copying `data.csv` itself. Each copy keeps
+every column of its template row, so filters, parsing and wild shape
+eligibility hit the same proportion of rows at every scale. Copies get a
+distinct id and name and jittered hit points and armour class, so search
+tokens and sort keys keep growing with the table rather than repeating.
+"""
+
+import argparse
+import csv
+import random
+from pathlib import Path
+from typing import Iterator, List
+
+ROOT = Path(__file__).resolve().parent.parent
+TEMPLATE = ROOT / "data.csv"
+DATA = Path(__file__).resolve().parent / "data"
+
+_SYLLABLES = (
+    "ar",
+    "bel",
+    "cor",
+    "dun",
+    "eth",
+    "fal",
+    "gor",
+    "hel",
+    "ix",
+    "jun",
+    "kar",
+    "lum",
+    "mor",
+    "nax",
+)
+
+
+def _epithet(copy: int) -> str:
+    """A pronounceable, unique word for each copy number (e.g. 1 -> "Bel", 15 -> "Belbel")."""
+    parts = []
+    while copy:
+        copy, digit = divmod(copy, len(_SYLLABLES))
+        parts.append(_SYLLABLES[digit])
+    return "".join(reversed(parts)).capitalize()
+
+
+def rows(template: Path, scale: int, seed: int = 0) -> Iterator[List[str]]:
+    with template.open(newline="") as fh:
+        reader = csv.reader(fh)
+        header = next(reader)
+        entries = list(reader)
+    yield header
+    name, id_, hp, ac = (header.index(title) for title in ("Name", "id", "HP", "AC"))
+    stride = (
+        max((int(entry[id_]) for entry in entries if entry[id_].isdigit()), default=0)
+        + 1
+    )
+    generator = random.Random(seed)
+    for copy in range(scale):
+        for entry in entries:
+            row = list(entry)
+            if copy:
+                row[name] = f"{entry[name]} {_epithet(copy)}"
+                if entry[id_].isdigit():
+                    row[id_] = str(int(entry[id_]) + copy * stride)
+                for column in (hp, ac):
+                    if entry[column].isdigit():
+                        row[column] = str(
+                            max(int(entry[column]) + generator.randint(-3, 3), 1)
+                        )
+            yield row
+
+
+def generate(
+    scale: int, out: Path | None = None, template: Path = TEMPLATE, seed: int = 0
+) -> Path:
+    """Write the `scale`x bestiary (once; an existing file is reused) and return its path."""
+    out = DATA / f"bestiary-{scale}x.csv" if out is None else out
+    if out.exists():
+        return out
+    out.parent.mkdir(parents=True, exist_ok=True)
+    temp = out.with_name(out.name + ".tmp")
+    with temp.open("w", newline="") as fh:
+        csv.writer(fh).writerows(rows(template, scale, seed))
+    temp.replace(out)
+    return out
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "scales",
+        nargs="+",
+        type=int,
+        help="multiples of data.csv to generate, e.g. 1 10 100",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    for scale in args.scales:
+        print(generate(scale, seed=args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,3 @@
 from druider.main import main
 
-main()
+raise SystemExit(main())
@@ -0,0 +1,228 @@
+"""Count, mean, min and max of numeric columns per group of the filtered rows.
+
+Each group keeps a running count, sum, min and max per measure, so a change
+of filters only applies the rows that entered or left the selection, found
+with bitmap differences. A group is recomputed only when its min or max
+leaves, and everything when the change is larger than the selection itself.
+"""
+
+import functools
+import logging
+import math
+import operator
+from array import array
+from collections import defaultdict
+from enum import Enum
+from typing import Dict, List, NamedTuple, Sequence, Set, Tuple
+
+from druider import bitmap
+from druider.data import Column, DataType
+from druider.facets import Facet, FacetIndex
+from druider.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+MEASURES: Tuple[Column, ...] = (
+    Column.hp,
+    Column.ac,
+    Column.cr,
+    Column.xp,
+    Column._str,
+    Column.dex,
+    Column.con,
+    Column.int,
+    Column.wis,
+    Column.cha,
+)
+# Where each CR band ends; the last one is open.
+CR_BANDS = (1, 5, 10, 15, 20)
+NONE = "—"
+
+
+class GroupBy(Enum):
+    type = "Type"
+    size = "Size"
+    cr = "CR band"
+    source = "Source"
+
+    @property
+    def title(self) -> str:
+        return self.value
+
+
+def cr_band(cr: float) -> str:
+    low = 0
+    for high in CR_BANDS:
+        if cr < high:
+            return f"CR {low}–{high - 1}" if low else f"CR < {high}"
+        low = high
+    return f"CR {low}+"
+
+
+def groups(facets: FacetIndex, by: GroupBy) -> Dict[str, int]:
+    """The rows of each group, as bitmaps, in display order."""
+    if by is GroupBy.cr:
+        bands: Dict[str, int] = {}
+        for key in facets.values(Facet.cr):
+            label = cr_band(key)
+            bands[label] = bands.get(label, 0) | facets.rows(Facet.cr, key)
+        return bands
+    facet = Facet[by.name]
+    return {facet.label(key): facets.rows(facet, key) for key in facets.values(facet)}
+
+
+class Summary(NamedTuple):
+    count: int
+    mean: float
+    min: float
+    max: float
+
+
+class _Running:
+    """Count, sum, min and max of one measure's values over the selected rows of one group."""
+
+    __slots__ = ("count", "total", "low", "high")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.low = math.inf
+        self.high = -math.inf
+
+    def add(self, values: List[float]) -> None:
+        self.count += len(values)
+        self.total += sum(values)
+        self.low = min(self.low, min(values))
+        self.high = max(self.high, max(values))
+
+    def remove(self, values: List[float]) -> bool:
+        """Take `values` out; False if that removed the min or max, which must then be recomputed."""
+        self.count -= len(values)
+        self.total -= sum(values)
+        return self.low < min(values) and max(values) < self.high
+
+    def copy(self) -> "_Running":
+        running = _Running()
+        running.count, running.total, running.low, running.high = (
+            self.count,
+            self.total,
+            self.low,
+            self.high,
+        )
+        return running
+
+    def summary(self) -> Summary | None:
+        if not self.count:
+            return None
+        return Summary(self.count, self.total / self.count, self.low, self.high)
+
+
+class Aggregates:
+    """`MEASURES` per group of `by` over a selection of rows, moved from one selection to the next by difference."""
+
+    def __init__(self, data: DataType, facets: FacetIndex, by: GroupBy) -> None:
+        self.by = by
+        found = groups(facets, by)
+        # Code 0 holds the rows in no group.
+        self.labels = [NONE, *found]
+        self.bits = [
+            facets.universe & ~functools.reduce(operator.or_, found.values(), 0),
+            *found.values(),
+        ]
+        self.codes = array("H", bytes(2 * facets.length))
+        for code, bits in enumerate(found.values(), 1):
+            for row in bitmap.members(bits):
+                self.codes[row] = code
+        # Sort keys are the typed values, with -inf for a missing one.
+        self.values = [data.sort_keys(column) for column in MEASURES]
+        # Aggregates of every row of a group, reused whenever all of them are selected.
+        self.whole: Dict[int, Tuple[int, List[_Running]]] = {}
+        self.clear()
+
+    def clear(self) -> None:
+        self.selection = 0
+        self.sizes = [0] * len(self.labels)
+        self.running = [[_Running() for _ in MEASURES] for _ in self.labels]
+
+    @timed("aggregate.update")
+    def update(self, selection: int) -> int:
+        """Move to the rows in `selection`; returns how many rows were applied."""
+        entered, left = selection & ~self.selection, self.selection & ~selection
+        # Starting over costs only the rows of groups not wholly selected.
+        whole = [
+            code
+            for code, bits in enumerate(self.bits)
+            if bits and selection & bits == bits
+        ]
+        rest = selection & ~functools.reduce(
+            operator.or_, (self.bits[code] for code in whole), 0
+        )
+        if bitmap.count(rest) < bitmap.count(entered) + bitmap.count(left):
+            self.clear()
+            for code in whole:
+                self._restore(code)
+            entered, left = rest, 0
+        self.selection = selection
+        applied = self._apply(bitmap.members(entered))
+        stale = self._remove(bitmap.members(left))
+        for code in stale:
+            self.running[code] = [_Running() for _ in MEASURES]
+            self.sizes[code] = 0
+            applied += self._apply(bitmap.members(selection & self.bits[code]))
+        return applied + bitmap.count(left)
+
+    def _buckets(self, rows: Sequence[int]) -> Dict[int, List[int]]:
+        buckets: Dict[int, List[int]] = defaultdict(list)
+        codes = self.codes
+        for row in rows:
+            buckets[codes[row]].append(row)
+        return buckets
+
+    def _present(self, values: Sequence[float], rows: List[int]) -> List[float]:
+        missing = -math.inf
+        return [value for value in map(values.__getitem__, rows) if value != missing]
+
+    def _restore(self, code: int) -> None:
+        """Select every row of group `code`, from the aggregates kept for it."""
+        if code not in self.whole:
+            members = bitmap.members(self.bits[code])
+            running = [_Running() for _ in MEASURES]
+            for measure, values in zip(running, self.values):
+                found = self._present(values, members)
+                if found:
+                    measure.add(found)
+            self.whole[code] = (len(members), running)
+        size, running = self.whole[code]
+        self.sizes[code] = size
+        self.running[code] = [measure.copy() for measure in running]
+
+    def _apply(self, rows: Sequence[int]) -> int:
+        for code, members in self._buckets(rows).items():
+            self.sizes[code] += len(members)
+            for running, values in zip(self.running[code], self.values):
+                found = self._present(values, members)
+                if found:
+                    running.add(found)
+        return len(rows)
+
+    def _remove(self, rows: Sequence[int]) -> Set[int]:
+        """Take out `rows`; returns the groups whose min or max left with them."""
+        stale = set()
+        for code, members in self._buckets(rows).items():
+            self.sizes[code] -= len(members)
+            for running, values in zip(self.running[code], self.values):
+                found = self._present(values, members)
+                if found and not running.remove(found):
+                    stale.add(code)
+        return stale
+
+    def summaries(self, measure: Column) -> List[Tuple[str, int, Summary | None]]:
+        """(group, rows, summary of `measure`) for every group with selected rows."""
+        position = MEASURES.index(measure)
+        rows = [
+            (label, size, running[position].summary())
+            for label, size, running in zip(self.labels, self.sizes, self.running)
+            if size
+        ]
+        # The rows in no group go last.
+        return rows[1:] + rows[:1] if rows and rows[0][0] == NONE else rows
@@ -0,0 +1,152 @@
+"""The Aggregates tab: count, mean, min and max of a measure per group of the listed rows."""
+
+import logging
+import threading
+from typing import AbstractSet, Dict
+
+from rich.table import Table
+from textual import on, work
+from textual.app import ComposeResult
+from textual.containers import Horizontal, Vertical
+from textual.widgets import Select, Static
+from textual.worker import get_current_worker
+
+from druider import bitmap
+from druider.aggregates import MEASURES, Aggregates, GroupBy
+from druider.data import Column, DataType
+from druider.facets import FacetIndex
+
+logger = logging.getLogger(__name__)
+
+
+def _number(value: float) -> str:
+    return f"{value:,.0f}" if value == int(value) else f"{value:,.2f}"
+
+
+class AggregatesView(Vertical):
+    """Aggregates of the rows the listing shows, refreshed while it is on screen.
+
+    Each grouping keeps its aggregates between updates, which a worker moves
+    from the last selection to the newest one.
+    """
+
+    data: DataType | None = None
+    facets: FacetIndex | None = None
+    rows: int | None = None
+    found: AbstractSet[int] | None = None
+    by: GroupBy = GroupBy.type
+    measure: Column = Column.hp
+    showing: bool = False
+
+    def __init__(self, *args, **kwargs) -> None:
+        self.engines: Dict[GroupBy, Aggregates] = {}
+        self._lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def compose(self) -> ComposeResult:
+        with Horizontal(id="aggregate-options"):
+            yield Select(
+                ((by.title, by) for by in GroupBy),
+                value=self.by,
+                allow_blank=False,
+                id="aggregate-by",
+            )
+            yield Select(
+                ((column.title, column) for column in MEASURES),
+                value=self.measure,
+                allow_blank=False,
+                id="aggregate-measure",
+            )
+        yield Static("Waiting for data", id="aggregate-table")
+
+    def set_data(self, data: DataType, facets: FacetIndex) -> None:
+        """Aggregate `data` from now on; a running update finishes against the old data."""
+        self.data, self.facets = data, facets
+        self.engines = {}
+        self.refresh_table()
+
+    def select(self, rows: int, found: AbstractSet[int] | None) -> None:
+        """The listing now shows `rows` narrowed to those `found` by search (all of them if None)."""
+        self.rows, self.found = rows, found
+        self.refresh_table()
+
+    def on_show(self) -> None:
+        self.showing = True
+        self.refresh_table()
+
+    def on_hide(self) -> None:
+        self.showing = False
+
+    @on(Select.Changed, "#aggregate-by")
+    def handle_by(self, event: Select.Changed) -> None:
+        self.by = event.value
+        self.refresh_table()
+
+    @on(Select.Changed, "#aggregate-measure")
+    def handle_measure(self, event: Select.Changed) -> None:
+        self.measure = event.value
+        self.refresh_table()
+
+    def refresh_table(self) -> None:
+        if (
+            self.showing
+            and self.data is not None
+            and self.facets is not None
+            and self.rows is not None
+        ):
+            self.update_table(
+                self.data,
+                self.facets,
+                self.engines,
+                self.rows,
+                self.found,
+                self.by,
+                self.measure,
+            )
+
+    @work(thread=True, exclusive=True, group="aggregates")
+    def update_table(
+        self,
+        data: DataType,
+        facets: FacetIndex,
+        engines: Dict[GroupBy, Aggregates],
+        rows: int,
+        found: AbstractSet[int] | None,
+        by: GroupBy,
+        measure: Column,
+    ) -> None:
+        worker = get_current_worker()
+        try:
+            # Updates replaced by newer ones while waiting are skipped.
+            with self._lock:
+                if worker.is_cancelled:
+                    return
+                if found is not None:
+                    rows &= bitmap.from_indices(found)
+                if by not in engines:
+                    engines[by] = Aggregates(data, facets, by)
+                engines[by].update(rows)
+                summaries = engines[by].summaries(measure)
+        except Exception as err:
+            logger.critical(err)
+            return
+        table = Table(expand=True, box=None)
+        table.add_column(by.title)
+        table.add_column("Rows", justify="right")
+        for title in ("Mean", "Min", "Max"):
+            table.add_column(f"{title} {measure.title}", justify="right")
+        for label, size, summary in summaries:
+            if summary is None:
+                table.add_row(label, f"{size:,}", "—", "—", "—")
+            else:
+                table.add_row(
+                    label,
+                    f"{size:,}",
+                    _number(summary.mean),
+                    _number(summary.min),
+                    _number(summary.max),
+                )
+        if not worker.is_cancelled:
+            self.app.call_from_thread(
+                self.query_one("#aggregate-table", Static).update, table
+            )
@@ -1,86 +1,686 @@
+from __future__ import annotations
+
 import logging
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, AbstractSet, Dict, Iterable, List, Sequence, Tuple
 
-from rich.tree import Tree
-from textual import on
+from textual import on, work
 from textual.app import App, ComposeResult
 from textual.containers import Container, Vertical, VerticalGroup
-from textual.widgets import Footer, Header, Static, TabbedContent, TabPane
+from textual.message import Message
+from textual.widgets import Static
+from textual.worker import get_current_worker
 
-from druider.data import Column, DataType, EntryType
+from druider.cache import LRUCache
+from druider.data import Column, DataType, EntryType, load_data, read_rows
 from druider.listing import Animals, Listing
-from druider.logging import add_to_stdlib
+from druider.logging import MAX_LINES, add_to_stdlib
+from druider.metrics import METRICS, timed
+
+if TYPE_CHECKING:
+    from rich.text import Text
+    from rich.tree import Tree
+
+    from druider.aggregatesview import AggregatesView
+    from druider.compareview import CompareView
+    from druider.database import Database
+    from druider.facets import FacetIndex
+    from druider.links import Link, LinkIndex
+    from druider.logging import DruidLog, FileSink
+    from druider.logview import LogPager
+    from druider.reload import Patched, Reloader
+    from druider.search import SearchIndex
+    from druider.sorting import SortEngine
+    from druider.virtual import VirtualAnimals
+    from druider.wildshape import WildShapeIndex
 
 logger = logging.getLogger(__name__)
 
 
+class StatBlock(Static):
+    """The selected entry; the names of related entries in it open them."""
+
+    class RelatedSelected(Message):
+        def __init__(self, row: int) -> None:
+            self.row = row
+            super().__init__()
+
+    def action_open_row(self, row: int) -> None:
+        self.post_message(self.RelatedSelected(row))
+
+
 class Stats(Container):
+    data: DataType | None = None
+    wildshape: WildShapeIndex | None = None
+    links: LinkIndex | None = None
+    shown: int | None = None
+    cache: LRUCache[int, Tree]
+    prefetch_radius: int
+    # Names listed per relation; large groups end in "and N more".
+    related_limit: int = 12
+
+    def __init__(self, *args, cache_size: int = 256, prefetch: int = 2, **kwargs):
+        self.cache = LRUCache(cache_size)
+        self.prefetch_radius = prefetch
+        super().__init__(*args, **kwargs)
+
     def compose(self) -> ComposeResult:
-        yield Static("Select animal for more details", id="stats")
+        yield StatBlock("Select animal for more details", id="stats")
+
+    def set_data(self, data: DataType) -> None:
+        self.data = data
+        self.cache.clear()
+
+    def set_indexes(self, wildshape: WildShapeIndex, links: LinkIndex) -> None:
+        self.wildshape = wildshape
+        self.links = links
+        self.cache.clear()
+
+    @timed("render.tree")
+    def get_tree(self, animal: EntryType, index: int | None = None) -> Tree:
+        from rich.tree import Tree
+
+        from druider.wildshape import describe
 
-    def get_tree(self, animal: EntryType) -> Tree:
         tree = Tree(animal[Column._name])
+        form = (
+            self.wildshape.form(index)
+            if self.wildshape is not None and index is not None
+            else None
+        )
+        if form is not None:
+            for line in describe(form):
+                tree.add(line)
+        if self.data is not None and index is not None and len(self.data.sources) > 1:
+            tree.add(f"From: {Path(self.data.origin(index)).name}")
+        if self.links is not None and index is not None:
+            for link, rows in self.links.related(index):
+                tree.add(self.related_line(link, rows, index))
         for index, value in enumerate(animal):
             if index != Column._name and value:
                 tree.add(f"{Column(index).title}: {value}")
         return tree
 
-    def update_animal(self, animal: EntryType) -> None:
-        self.query_one(Static).update(self.get_tree(animal))
+    def related_line(self, link: Link, rows: Sequence[int], index: int) -> Text:
+        """`rows` as names that open their entry when clicked."""
+        from rich.style import Style
+        from rich.text import Text
+
+        from druider.links import Link
+
+        assert self.data is not None
+        title = (
+            f"{link.title} ({self.data.cell(index, Column.group)})"
+            if link is Link.group
+            else link.title
+        )
+        line = Text(f"{title}: ")
+        others = [row for row in rows[: self.related_limit + 1] if row != index][
+            : self.related_limit
+        ]
+        for position, row in enumerate(others):
+            if position:
+                line.append(", ")
+            line.append(
+                self.data.cell(row, Column._name),
+                Style(meta={"@click": f"open_row({row})"}),
+            )
+        hidden = len(rows) - (index in rows) - len(others)
+        if hidden > 0:
+            line.append(f" and {hidden} more")
+        return line
+
+    def tree_for(self, index: int) -> Tree:
+        assert self.data is not None
+        return self.cache.get(
+            index, lambda index: self.get_tree(self.data[index], index)
+        )
+
+    @timed("render.show")
+    def show_row(self, index: int, neighbors: Iterable[int] = ()) -> None:
+        """Show row `index`, then warm the cache for `neighbors`.
+
+        A cached tree is shown at once; otherwise it is rendered on a worker,
+        which a newer row cancels, and the previous tree stays up meanwhile.
+        """
+        self.shown = index
+        neighbors = list(neighbors)
+        tree = self.cache.lookup(index)
+        if tree is None:
+            self.render_row(index, neighbors)
+            return
+        self.show_tree(tree, neighbors)
+
+    def show_tree(self, tree: Tree, neighbors: List[int]) -> None:
+        self.query_one(Static).update(tree)
+        logger.debug("Stats cache: %s", self.cache.info())
+        missing = [row for row in neighbors if row not in self.cache]
+        if missing:
+            self.prefetch(missing)
+
+    @work(thread=True, exclusive=True, group="render")
+    def render_row(self, index: int, neighbors: List[int]) -> None:
+        worker = get_current_worker()
+        data = self.data
+        if data is None:
+            return
+        tree = self.get_tree(data[index], index)
+        if data is not self.data:
+            return
+        # Keep a superseded tree too: moving back onto its row is then instant.
+        self.cache.put(index, tree)
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self.show_rendered, index, tree, neighbors)
+
+    def show_rendered(self, index: int, tree: Tree, neighbors: List[int]) -> None:
+        if self.shown == index:
+            self.show_tree(tree, neighbors)
+
+    def patch(
+        self,
+        data: DataType,
+        wildshape: WildShapeIndex,
+        links: LinkIndex,
+        rows: AbstractSet[int],
+    ) -> None:
+        """Switch to reloaded `data`, dropping only the cached trees of `rows` and the entries related to them."""
+        stale = links.neighborhood(rows)
+        if self.links is not None:
+            stale |= self.links.neighborhood(rows)
+        self.data = data
+        self.wildshape = wildshape
+        self.links = links
+        for row in stale:
+            self.cache.discard(row)
+        if self.shown in data.removed:
+            self.shown = None
+            self.query_one(Static).update("Select animal for more details")
+        elif self.shown in rows:
+            self.query_one(Static).update(self.tree_for(self.shown))
+
+    @work(thread=True, exclusive=True, group="prefetch")
+    def prefetch(self, rows: List[int]) -> None:
+        worker = get_current_worker()
+        data = self.data
+        for row in rows:
+            if worker.is_cancelled or data is not self.data or data is None:
+                return
+            if row not in self.cache:
+                self.cache.put(row, self.get_tree(data[row], row))
 
 
 class Details(Vertical):
-    def __init__(self, *args, **kwargs):
-        self.log_widget = add_to_stdlib()
+    log_widget: DruidLog | LogPager
+    compare: CompareView
+    aggregates: AggregatesView
+    sink: FileSink | None = None
+
+    def __init__(
+        self,
+        *args,
+        cache_size: int = 256,
+        prefetch: int = 2,
+        log_lines: int = MAX_LINES,
+        log_sink: FileSink | None = None,
+        metrics: bool = False,
+        **kwargs,
+    ):
+        self.metrics = metrics
+        if log_sink is not None:
+            from druider.logview import LogPager
+
+            # History lives on disk; the Logs tab pages it back in.
+            self.sink = log_sink.add_to_stdlib()
+            self.log_widget = LogPager(log_sink)
+        else:
+            self.log_widget = add_to_stdlib(max_lines=log_lines)
+        from druider.aggregatesview import AggregatesView
+        from druider.compareview import CompareView
+
+        self.stats = Stats(cache_size=cache_size, prefetch=prefetch)
+        self.compare = CompareView(id="compare")
+        self.aggregates = AggregatesView()
         super().__init__(*args, **kwargs)
 
     def compose(self) -> ComposeResult:
+        from textual.widgets import TabbedContent, TabPane
+
         with TabbedContent():
             with TabPane("Selected", id="details-selected-pane"):
                 with VerticalGroup(name="Selected", id="logs", classes="box"):
-                    yield Stats()
+                    yield self.stats
+            with TabPane("Compare", id="details-compare-pane"):
+                with VerticalGroup(name="Compare", classes="box"):
+                    yield self.compare
+            with TabPane("Aggregates", id="details-aggregates-pane"):
+                with VerticalGroup(name="Aggregates", id="aggregates", classes="box"):
+                    yield self.aggregates
             with TabPane("Logs", id="details-logs-pane"):
                 with VerticalGroup(name="Logs", id="logs", classes="box"):
                     yield self.log_widget
+            if self.metrics:
+                from druider.metricsview import MetricsView
+
+                with TabPane("Metrics", id="details-metrics-pane"):
+                    with VerticalGroup(name="Metrics", id="metrics", classes="box"):
+                        yield MetricsView()
+
+    def on_unmount(self) -> None:
+        if self.sink is not None:
+            self.sink.stop()
 
 
 class Body(Vertical):
     """Application body."""
 
-    data: DataType
+    class RowsParsed(Message):
+        def __init__(self, start: int, rows: List[EntryType]) -> None:
+            self.start = start
+            self.rows = rows
+            super().__init__()
 
-    def __init__(self, data: DataType, *args, **kwargs):
-        self.data = data
-        self.details = Details(name="Details", id="details")
-        self.listing = Listing(data, name="Listing", id="listing")
+    class Loaded(Message):
+        def __init__(self, data: DataType) -> None:
+            self.data = data
+            super().__init__()
+
+    class Indexed(Message):
+        def __init__(
+            self,
+            data: DataType,
+            index: SearchIndex,
+            facets: FacetIndex,
+            sorter: SortEngine,
+            wildshape: WildShapeIndex,
+            links: LinkIndex,
+            database: Database | None = None,
+        ) -> None:
+            self.data = data
+            self.index = index
+            self.facets = facets
+            self.sorter = sorter
+            self.wildshape = wildshape
+            self.links = links
+            self.database = database
+            super().__init__()
+
+    class Reloaded(Message):
+        def __init__(self, patched: Patched, rows: AbstractSet[int]) -> None:
+            self.patched = patched
+            self.rows = rows
+            super().__init__()
+
+    data: DataType | None = None
+    backend: str = "memory"
+    source: Path | None = None
+    reloader: Reloader | None = None
+    pending: int | None = None
+    _source_stat: Tuple[int, int] | None = None
+
+    def __init__(
+        self,
+        *args,
+        virtual: bool = True,
+        backend: str = "memory",
+        detail_cache_size: int = 256,
+        prefetch: int = 2,
+        log_lines: int = MAX_LINES,
+        log_sink: FileSink | None = None,
+        metrics: bool = False,
+        **kwargs,
+    ):
+        self.backend = backend
+        self.details = Details(
+            name="Details",
+            id="details",
+            cache_size=detail_cache_size,
+            prefetch=prefetch,
+            log_lines=log_lines,
+            log_sink=log_sink,
+            metrics=metrics,
+        )
+        # Paged database rows need the virtual listing.
+        self.listing = Listing(
+            name="Listing", id="listing", virtual=virtual or backend == "sqlite"
+        )
         super().__init__(*args, **kwargs)
 
     def compose(self) -> ComposeResult:
         yield self.listing
         yield self.details
 
+    @work(thread=True, exclusive=True, group="load")
+    def load(
+        self,
+        source: Path | Sequence[Path] | DataType,
+        rebuild: bool = False,
+        precedence: str = "first",
+    ) -> None:
+        """Load and index `source` off the UI thread, streaming rows as they are parsed."""
+        # The index modules are imported here, on the worker, after the first frame.
+        from druider.facets import FacetIndex
+        from druider.links import LinkIndex
+        from druider.parsing import ParsedFields
+        from druider.search import SearchIndex
+        from druider.sorting import SortEngine
+        from druider.sources import load_sources
+        from druider.wildshape import WildShapeIndex
+
+        if isinstance(source, Path):
+            self.source, self._source_stat = source, _stat(source)
+            data = load_data(source, rebuild=rebuild, progress=self.post_rows)
+        elif isinstance(source, (list, tuple)):
+            data = load_sources(source, precedence, rebuild=rebuild)
+        else:
+            data = source
+        mark = self.app.mark
+        mark("data loaded")
+        self.post_message(self.Loaded(data))
+        with METRICS.timer("index.search"):
+            index = SearchIndex.load(data)
+        mark("search index")
+        with METRICS.timer("index.facets"):
+            facets = FacetIndex.load(data)
+        mark("facet index")
+        with METRICS.timer("index.parsed"):
+            facets.fields = ParsedFields.load(data)
+        mark("parsed fields")
+        with METRICS.timer("index.sort"):
+            sorter = SortEngine.load(data)
+        mark("sort index")
+        with METRICS.timer("index.wildshape"):
+            wildshape = WildShapeIndex.build(facets)
+        mark("wild shape index")
+        with METRICS.timer("index.links"):
+            links = LinkIndex.load(data)
+        mark("link index")
+        database = None
+        if self.backend == "sqlite":
+            from druider.database import Database
+
+            with METRICS.timer("index.database"):
+                database = Database.load(data, rebuild=rebuild)
+            database.fields = facets.fields
+            mark("database")
+        self.post_message(
+            self.Indexed(data, index, facets, sorter, wildshape, links, database)
+        )
+
+    def check_source(self) -> None:
+        """Reload the data file if it changed on disk since it was last read."""
+        if self.source is None or self.reloader is None:
+            return
+        stat = _stat(self.source)
+        if stat is not None and stat != self._source_stat:
+            self._source_stat = stat
+            self.reload()
+
+    @work(thread=True, exclusive=True, group="reload")
+    @timed("reload")
+    def reload(self) -> None:
+        """Diff the data file against the loaded rows and patch in only what changed."""
+        assert self.source is not None and self.reloader is not None
+        started = time.perf_counter()
+        try:
+            _, rows = read_rows(self.source)
+        except (OSError, ValueError) as err:
+            logger.warning(f"Could not reload {self.source}: {err}")
+            return
+        changes = self.reloader.diff(rows)
+        if not changes:
+            logger.debug("%s changed on disk, but no rows did", self.source)
+            return
+        patched = self.reloader.apply(changes)
+        logger.info(
+            f"Reloaded {self.source} in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+        self.post_message(self.Reloaded(patched, changes.rows))
+
+    def post_rows(self, start: int, rows: List[EntryType]) -> None:
+        self.post_message(self.RowsParsed(start, rows))
+
+    @on(RowsParsed)
+    def handle_rows(self, event: RowsParsed):
+        self.listing.add_batch(event.start, event.rows)
+
+    @on(Loaded)
+    def handle_loaded(self, event: Loaded):
+        logger.info(f"Loaded {len(event.data)} rows")
+        self.data = event.data
+        self.details.stats.set_data(event.data)
+        self.details.compare.set_data(event.data)
+
+    @on(Indexed)
+    def handle_indexed(self, event: Indexed):
+        from druider.reload import Reloader
+
+        try:
+            self.listing.set_data(
+                event.data,
+                event.index,
+                event.facets,
+                event.sorter,
+                event.wildshape,
+                database=event.database,
+            )
+            self.details.stats.set_indexes(event.wildshape, event.links)
+            self.details.aggregates.set_data(event.data, event.facets)
+            self.reloader = Reloader(
+                event.data, event.index, event.facets, event.sorter, event.links
+            )
+            self.app.mark("indexed")
+            self.app.call_after_refresh(self.app.interactive)
+        except Exception as err:
+            logger.critical(err)
+
+    @on(Reloaded)
+    def handle_reloaded(self, event: Reloaded):
+        try:
+            patched = event.patched
+            self.data = patched.data
+            self.listing.reload(
+                patched.data,
+                patched.index,
+                patched.facets,
+                patched.sorter,
+                patched.wildshape,
+                event.rows,
+            )
+            self.details.stats.patch(
+                patched.data, patched.wildshape, patched.links, event.rows
+            )
+            self.details.aggregates.set_data(patched.data, patched.facets)
+            self.details.compare.patch(patched.data, event.rows)
+            for row in self.listing.animals.marked & patched.data.removed:
+                self.listing.animals.mark(row, False)
+        except Exception as err:
+            logger.critical(err)
+
+    @on(Listing.Filtered)
+    def handle_filtered(self, event: Listing.Filtered):
+        try:
+            self.details.aggregates.select(event.rows, event.found)
+        except Exception as err:
+            logger.critical(err)
+
+    @on(StatBlock.RelatedSelected)
+    def handle_related(self, event: StatBlock.RelatedSelected):
+        try:
+            logger.info(f"Related entry opened: {event.row}")
+            self.show_animal(event.row)
+        except Exception as err:
+            logger.critical(err)
+
+    @on(Animals.Marked)
+    def handle_marked(self, event: Animals.Marked | VirtualAnimals.Marked):
+        try:
+            logger.info(
+                f"{'Marked' if event.marked else 'Unmarked'} for comparison: {event.row}"
+            )
+            if event.marked:
+                self.details.compare.add(event.row)
+                self.details.query_one("TabbedContent").active = "details-compare-pane"
+            else:
+                self.details.compare.remove(event.row)
+        except Exception as err:
+            logger.critical(err)
+
+    # The handlers named after their message need no import of the widget sending it.
+    def on_virtual_animals_marked(self, event: VirtualAnimals.Marked):
+        self.handle_marked(event)
+
+    def on_compare_view_unmarked(self, event: CompareView.Unmarked):
+        try:
+            self.listing.animals.mark(event.row, False)
+        except Exception as err:
+            logger.critical(err)
+
     @on(Animals.CellSelected)
+    @timed("event.select")
     def handle_selection(self, event: Animals.CellSelected):
-        # TODO: workers? async def? definitely need something
         try:
             selected = self.query_one(Animals).select_animal(event)
             if selected is not None:
-                logger.info(f"Passing to Stats: {selected}")
-                self.query_one(Stats).update_animal(self.data[selected])
+                self.show_animal(selected)
         except Exception as err:
             logger.critical(err)
 
+    @on(Animals.CellHighlighted)
+    @timed("event.highlight")
+    def handle_highlight(self, event: Animals.CellHighlighted):
+        try:
+            if event.cell_key.row_key.value is not None:
+                self.show_animal(int(event.cell_key.row_key.value))
+        except Exception as err:
+            logger.critical(err)
+
+    @timed("event.highlight")
+    def on_virtual_animals_row_highlighted(self, event: VirtualAnimals.RowHighlighted):
+        try:
+            self.show_animal(event.row)
+        except Exception as err:
+            logger.critical(err)
+
+    @timed("event.select")
+    def on_virtual_animals_row_selected(self, event: VirtualAnimals.RowSelected):
+        try:
+            logger.info(f"Animal selected: {event.row}")
+            self.show_animal(event.row)
+        except Exception as err:
+            logger.critical(err)
+
+    def show_animal(self, index: int) -> None:
+        """Show row `index` once the events already queued are handled, so a burst shows only its last row."""
+        if self.data is None:
+            return
+        scheduled = self.pending is not None
+        self.pending = index
+        if not scheduled:
+            self.call_later(self.show_pending)
+
+    def show_pending(self) -> None:
+        index, self.pending = self.pending, None
+        if index is None or self.data is None:
+            return
+        logger.debug("Passing to Stats: %s", index)
+        stats = self.details.stats
+        stats.show_row(
+            index, self.listing.animals.neighbors(index, stats.prefetch_radius)
+        )
+
+
+def _stat(path: Path) -> Tuple[int, int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
 
 class DruidHelper(App):
     CSS_PATH = "layout.tcss"
 
-    def __init__(self, data: DataType, *args, **kwargs):
+    source: Path | Sequence[Path] | DataType
+    started: float
+    timings: Dict[str, float]
+    poll_interval: float = 1.0
+
+    def __init__(
+        self,
+        source: Path | Sequence[Path] | DataType,
+        *args,
+        rebuild: bool = False,
+        precedence: str = "first",
+        virtual: bool = True,
+        backend: str = "memory",
+        detail_cache_size: int = 256,
+        prefetch: int = 2,
+        log_lines: int = MAX_LINES,
+        log_sink: FileSink | None = None,
+        started: float | None = None,
+        watch_source: bool = True,
+        profile_startup: bool = False,
+        metrics: bool = False,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
-        self.body = Body(data, id="body")
+        self.source = source
+        self.rebuild = rebuild
+        self.precedence = precedence
+        self.watch_source = watch_source
+        self.profile_startup = profile_startup
+        self.started = time.perf_counter() if started is None else started
+        self.timings = {}
+        self.body = Body(
+            id="body",
+            virtual=virtual,
+            backend=backend,
+            detail_cache_size=detail_cache_size,
+            prefetch=prefetch,
+            log_lines=log_lines,
+            log_sink=log_sink,
+            metrics=metrics,
+        )
 
     def compose(self) -> ComposeResult:
+        from textual.widgets import Footer, Header
+
         yield Header()
         yield self.body
         yield Footer()
 
     def on_mount(self):
         self.theme = "monokai"
+        self.call_after_refresh(self.start_loading)
+        if self.watch_source and isinstance(self.source, Path):
+            self.set_interval(self.poll_interval, self.body.check_source)
+
+    def start_loading(self) -> None:
+        # Loading only starts once the empty layout has painted.
+        self.mark("first frame")
+        self.body.load(self.source, self.rebuild, self.precedence)
+
+    def interactive(self) -> None:
+        self.mark("interactive")
+        if self.profile_startup:
+            self.exit()
+
+    def mark(self, milestone: str) -> float:
+        """Record and log the time from startup to `milestone`, in seconds."""
+        elapsed = self.timings[milestone] = time.perf_counter() - self.started
+        logger.info(f"Startup: {milestone} after {elapsed * 1000:.1f} ms")
+        return elapsed
+
+
+def startup_report(timings: Dict[str, float]) -> str:
+    """`timings` as a table of milestones, each with its time since launch and since the one before."""
+    lines = ["Startup profile (ms)", f"  {'milestone':<18}{'elapsed':>10}{'step':>10}"]
+    previous = 0.0
+    for milestone, elapsed in sorted(timings.items(), key=lambda item: item[1]):
+        lines.append(
+            f"  {milestone:<18}{elapsed * 1000:>10.1f}{(elapsed - previous) * 1000:>10.1f}"
+        )
+        previous = elapsed
+    return "\n".join(lines)
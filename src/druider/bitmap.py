@@ -0,0 +1,35 @@
+"""Row sets stored as Python integers, one bit per row."""
+
+from typing import Iterable, List
+
+_BITS = tuple(tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256))
+
+
+def from_indices(indices: Iterable[int], length: int = 0) -> int:
+    mask = bytearray((length + 7) // 8)
+    for index in indices:
+        byte = index >> 3
+        if byte >= len(mask):
+            mask.extend(bytes(byte - len(mask) + 1))
+        mask[byte] |= 1 << (index & 7)
+    return int.from_bytes(mask, "little")
+
+
+def members(bits: int) -> List[int]:
+    """Indices of the set bits, ascending."""
+    rows: List[int] = []
+    for offset, byte in enumerate(
+        bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    ):
+        if byte:
+            base = offset << 3
+            rows.extend([base + bit for bit in _BITS[byte]])
+    return rows
+
+
+def full(length: int) -> int:
+    return (1 << length) - 1
+
+
+def count(bits: int) -> int:
+    return bits.bit_count()
@@ -0,0 +1,94 @@
+"""Entries side by side: the fields they differ in, and by how much.
+
+An entry's cells are read once into a profile. Comparing is then a single
+pass over the profiles, field by field, while each entry's column depends
+only on its profile and the reference entry's, so it can be reused as other
+entries come and go.
+"""
+
+import math
+from typing import List, NamedTuple, Sequence, Tuple
+
+from druider.data import Column, DataType, parse_number
+
+# Shown in the listing against rows marked for comparison.
+MARK = "●"
+FIELDS: Tuple[Column, ...] = tuple(
+    column for column in Column if column is not Column._name
+)
+# Stats, saves and speeds; other numbers (ids, flags) are only compared for equality.
+DELTAS = frozenset(
+    (
+        Column.cr,
+        Column.xp,
+        Column.class1_lvl,
+        Column.class2_lvl,
+        Column.ac,
+        Column.ac_touch,
+        Column.ac_flat_footed,
+        Column.hp,
+        Column.fort,
+        Column.ref,
+        Column.will,
+        Column._str,
+        Column.dex,
+        Column.con,
+        Column.int,
+        Column.wis,
+        Column.cha,
+        Column.base_speed,
+        Column.fly_speed,
+        Column.climb_speed,
+        Column.swim_speed,
+        Column.burrow_speed,
+        Column.speed_land,
+        Column.mr,
+    )
+)
+
+
+class Profile(NamedTuple):
+    """An entry's name and cells of `FIELDS`, with the numbers of `DELTAS` (NaN elsewhere or if missing)."""
+
+    name: str
+    cells: Tuple[str, ...]
+    numbers: Tuple[float, ...]
+
+
+def profile(data: DataType, row: int) -> Profile:
+    cells = tuple(data.cell(row, column) for column in FIELDS)
+    numbers = tuple(
+        parse_number(cell) if column in DELTAS else math.nan
+        for column, cell in zip(FIELDS, cells)
+    )
+    return Profile(data.cell(row, Column._name), cells, numbers)
+
+
+class Diff(NamedTuple):
+    """Per field of `FIELDS`, whether any entry compared has a value, and whether their values differ."""
+
+    shown: Tuple[bool, ...]
+    differs: Tuple[bool, ...]
+
+
+def diff(profiles: Sequence[Profile]) -> Diff:
+    shown, differs = [], []
+    for values in zip(*(profile.cells for profile in profiles)):
+        shown.append(any(values))
+        differs.append(len(set(values)) > 1)
+    return Diff(tuple(shown), tuple(differs))
+
+
+class Cell(NamedTuple):
+    text: str
+    # How much larger than the reference's the number is; None if either is not a number, or they are equal.
+    delta: float | None
+
+
+def column(profile: Profile, reference: Profile) -> List[Cell]:
+    """The cells of `profile` in every field, with deltas against `reference`."""
+    cells = []
+    for text, number, base in zip(profile.cells, profile.numbers, reference.numbers):
+        delta = number - base
+        cells.append(Cell(text, None if math.isnan(delta) or not delta else delta))
+    return cells
@@ -0,0 +1,118 @@
+"""The Compare tab: marked entries side by side."""
+
+import logging
+from typing import AbstractSet, List, Tuple
+
+from rich.style import Style
+from rich.table import Table
+from rich.text import Text
+from textual.message import Message
+from textual.widgets import Static
+
+from druider.cache import LRUCache
+from druider.compare import FIELDS, Profile, column, diff, profile
+from druider.data import DataType
+from druider.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+EMPTY = "Press m on entries in the listing to compare them"
+
+
+def _delta(delta: float) -> str:
+    return f"{delta:+,.0f}" if delta == int(delta) else f"{delta:+,.2f}"
+
+
+class CompareView(Static):
+    """Marked entries in columns, the fields they differ in highlighted, numbers against the first entry.
+
+    Profiles are cached per row, and rendered columns per profile and
+    reference with every field both plain and highlighted, so marking or
+    unmarking an entry renders at most its own column. Clicking an entry's
+    name takes it out of the comparison.
+    """
+
+    class Unmarked(Message):
+        def __init__(self, row: int) -> None:
+            self.row = row
+            super().__init__()
+
+    data: DataType | None = None
+    rows: List[int]
+    profiles: LRUCache[int, Profile]
+    columns: LRUCache[Tuple[Profile, Profile], List[Tuple[Text, Text]]]
+
+    def __init__(self, *args, cache_size: int = 64, **kwargs) -> None:
+        self.rows = []
+        self.profiles = LRUCache(cache_size)
+        self.columns = LRUCache(cache_size)
+        super().__init__(EMPTY, *args, **kwargs)
+
+    def set_data(self, data: DataType) -> None:
+        self.data = data
+        self.profiles.clear()
+        self.show()
+
+    def patch(self, data: DataType, rows: AbstractSet[int]) -> None:
+        """Switch to reloaded `data`, dropping the profiles of `rows`; their columns then miss the cache."""
+        self.data = data
+        for row in rows:
+            self.profiles.discard(row)
+        self.show()
+
+    def add(self, row: int) -> None:
+        if row not in self.rows:
+            self.rows.append(row)
+            self.show()
+
+    def remove(self, row: int) -> None:
+        if row in self.rows:
+            self.rows.remove(row)
+            self.show()
+
+    def action_unmark(self, row: int) -> None:
+        self.post_message(self.Unmarked(row))
+
+    @timed("render.compare")
+    def show(self) -> None:
+        data = self.data
+        if data is None or not self.rows:
+            self.update(EMPTY)
+            return
+        profiles = [
+            self.profiles.get(row, lambda row: profile(data, row)) for row in self.rows
+        ]
+        found = diff(profiles)
+        table = Table(expand=True, box=None)
+        table.add_column("")
+        for row, entry in zip(self.rows, profiles):
+            table.add_column(
+                Text(
+                    f"{entry.name} ✕",
+                    Style(bold=True, meta={"@click": f"unmark({row})"}),
+                )
+            )
+        columns = [
+            self.columns.get((entry, profiles[0]), self.render_column)
+            for entry in profiles
+        ]
+        for position, (field, shown, differs) in enumerate(
+            zip(FIELDS, found.shown, found.differs)
+        ):
+            if shown:
+                title = Text(field.title, "bold" if differs else "dim")
+                table.add_row(title, *(cells[position][differs] for cells in columns))
+        logger.debug("Compare cache: %s", self.columns.info())
+        self.update(table)
+
+    def render_column(self, key: Tuple[Profile, Profile]) -> List[Tuple[Text, Text]]:
+        """Each field of entry `key[0]` as shown when it is the same for every entry and when it differs."""
+        texts = []
+        for cell in column(*key):
+            plain, highlighted = Text(cell.text), Text(cell.text, "yellow")
+            if cell.delta is not None:
+                highlighted.append(
+                    f" ({_delta(cell.delta)})", "green" if cell.delta > 0 else "red"
+                )
+            texts.append((plain, highlighted))
+        return texts
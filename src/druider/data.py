@@ -1,10 +1,32 @@
 import csv
-from enum import IntEnum, auto
+import json
+import logging
+import math
+import re
+import sys
+from array import array
+from collections.abc import Sequence
+from enum import Enum, IntEnum, auto
 from pathlib import Path
-from typing import Tuple
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Iterable, List, Tuple
+
+from druider.metrics import timed
+from druider.snapshot import (
+    Fingerprint,
+    Snapshot,
+    SnapshotWriter,
+    mapped_path,
+    open_cached,
+    open_mapped,
+    snapshot_path,
+)
+
+logger = logging.getLogger(__name__)
 
 EntryType = Tuple[str]
-DataType = Tuple[Tuple[str]]
+Progress = Callable[[int, List[EntryType]], None]
+SCHEMA = 2
+BATCH = 500
 
 
 class Column(IntEnum):
@@ -91,14 +113,459 @@ class Column(IntEnum):
     def key(self) -> str:
         return self.name
 
+    @property
+    def kind(self) -> "Kind":
+        return _KINDS.get(self, Kind.text)
+
+
+class Kind(Enum):
+    """How a column is stored in the typed column store."""
+
+    text = auto()
+    number = auto()
+    category = auto()
+
+
+class Size(IntEnum):
+    fine = auto()
+    diminutive = auto()
+    tiny = auto()
+    small = auto()
+    medium = auto()
+    large = auto()
+    huge = auto()
+    gargantuan = auto()
+    colossal = auto()
+
+    @classmethod
+    def parse(cls, value: str):
+        return cls[value.lower()]
+
+
+_KINDS: Dict[Column, Kind] = {
+    **dict.fromkeys(
+        (
+            Column.cr,
+            Column.xp,
+            Column.class1_lvl,
+            Column.class2_lvl,
+            Column.ac,
+            Column.ac_touch,
+            Column.ac_flat_footed,
+            Column.hp,
+            Column.fort,
+            Column.ref,
+            Column.will,
+            Column._str,
+            Column.dex,
+            Column.con,
+            Column.int,
+            Column.wis,
+            Column.cha,
+            Column.characterflag,
+            Column.companionflag,
+            Column.base_speed,
+            Column.fly_speed,
+            Column.climb_speed,
+            Column.swim_speed,
+            Column.burrow_speed,
+            Column.speed_land,
+            Column.fly,
+            Column.climb,
+            Column.burrow,
+            Column.swim,
+            Column.id,
+            Column.uniquemonster,
+            Column.mr,
+            Column.mythic,
+            Column.mt,
+        ),
+        Kind.number,
+    ),
+    **dict.fromkeys(
+        (
+            Column.race,
+            Column.class1,
+            Column.class2,
+            Column.alignment,
+            Column.size,
+            Column.type,
+            Column.subtype1,
+            Column.subtype2,
+            Column.subtype3,
+            Column.subtype4,
+            Column.subtype5,
+            Column.subtype6,
+            Column.environment,
+            Column.treasure,
+            Column.group,
+            Column.maneuverability,
+            Column.speed_special,
+            Column.variantparent,
+            Column.classarchetypes,
+            Column.companionfamiliarlink,
+            Column.alternatenameform,
+            Column.source,
+        ),
+        Kind.category,
+    ),
+}
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_FIELDS: Dict[str, Column] = {column.key.lstrip("_"): column for column in Column}
+
+
+def parse_number(value: str) -> float:
+    """Parse the leading number of a cell ("9,600", "0.50", "20 (ice only)"), or NaN."""
+    match = _NUMBER.match(value.replace(",", ""))
+    return float(match.group()) if match else math.nan
+
+
+def field_column(name: str) -> Column | None:
+    """The column a CSV header or JSON field names ("AC_Flat-footed", "ac_flat_footed", "Name")."""
+    return _FIELDS.get(re.sub(r"[^a-z0-9]+", "_", name.casefold()).strip("_"))
+
+
+def identity(row: EntryType) -> Hashable:
+    """What makes two versions of a row the same creature: its id, else name and source."""
+    return row[Column.id] or (row[Column._name], row[Column.source])
+
+
+class Store(Sequence):
+    """Typed, column-oriented view over a snapshot.
+
+    Numeric columns are `float` arrays (NaN when missing), low-cardinality
+    columns are dictionary encoded against interned strings, and everything
+    else stays as lazily decoded text. Indexing still yields plain rows.
+    """
+
+    snapshot: Snapshot
+    source: Path | None
+    base: "Store"
+    removed: FrozenSet[int] = frozenset()
+
+    def __init__(self, snapshot: Snapshot, source: Path | None = None) -> None:
+        self.snapshot = snapshot
+        self.source = source
+        self.base = self
+        self._length = snapshot.meta["rows"]
+        self._overlay: Dict[int, EntryType] = {}
+        self._columns: Dict[Column, Sequence[str]] = {}
+        self._categories: Dict[Column, Tuple[str, ...]] = {}
+        self._keys: Dict[Column, Sequence[Any]] = {}
+
+    @classmethod
+    def empty(cls) -> "Store":
+        return cls(Snapshot.from_bytes(encode_rows(()).to_bytes(Fingerprint(0, 0, ""))))
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index) -> EntryType:
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(len(self))))
+        if index in self._overlay:
+            return self._overlay[index]
+        return tuple(self.cell(index, column) for column in Column)
+
+    @property
+    def patched(self) -> Dict[int, EntryType]:
+        """Rows replaced or appended since the snapshot was loaded."""
+        return self._overlay
+
+    def patch(
+        self, changed: Dict[int, EntryType], removed: Iterable[int] = ()
+    ) -> "Store":
+        """A copy with `changed` rows replaced and `removed` rows tombstoned.
+
+        Indices past the end append rows. The snapshot is shared; the overlay
+        accumulates over successive patches, and tombstoned rows keep their
+        index so positional indexes stay valid.
+        """
+        store = Store(self.snapshot, self.source)
+        store.base = self.base
+        store._overlay = {**self._overlay, **changed}
+        store.removed = self.removed.union(removed)
+        store._length = max(self._length, max(changed, default=-1) + 1)
+        return store
+
+    @property
+    def sources(self) -> List[str]:
+        """The files rows were merged from, in load order."""
+        return self.snapshot.meta.get("sources") or (
+            [str(self.source)] if self.source is not None else []
+        )
+
+    def origin(self, index: int) -> str:
+        """The file row `index` was taken from."""
+        sources = self.sources
+        if "origin.codes" in self.snapshot and index < self.snapshot.meta["rows"]:
+            return sources[self.snapshot.section("origin.codes")[index]]
+        return sources[0] if sources else ""
+
+    def cell(self, index: int, column: Column) -> str:
+        if self._overlay and index in self._overlay:
+            return self._overlay[index][column]
+        if column.kind is Kind.category:
+            return self.categories(column)[self.codes(column)[index]]
+        return self.column(column)[index]
+
+    def column(self, column: Column) -> Sequence[str]:
+        """Every value of `column` as strings."""
+        try:
+            return self._columns[column]
+        except KeyError:
+            pass
+        if self._overlay:
+            values = _Overlaid(
+                self.base.column(column), self._overlay, column, self._length
+            )
+        elif column.kind is Kind.category:
+            values = tuple(map(self.categories(column).__getitem__, self.codes(column)))
+        else:
+            values = self.snapshot.text(column.key)
+        self._columns[column] = values
+        return values
+
+    def numbers(self, column: Column) -> Sequence[float]:
+        return self.snapshot.section(f"{column.key}.values")
+
+    def codes(self, column: Column) -> Sequence[int]:
+        return self.snapshot.section(f"{column.key}.codes")
+
+    def categories(self, column: Column) -> Tuple[str, ...]:
+        try:
+            return self._categories[column]
+        except KeyError:
+            values = tuple(
+                map(sys.intern, self.snapshot.meta["categories"][column.key])
+            )
+            self._categories[column] = values
+            return values
+
+    def code(self, column: Column, value: str) -> int | None:
+        try:
+            return self.categories(column).index(value)
+        except ValueError:
+            return None
+
+    def mapped(self, name: str, build: Callable[["Store"], SnapshotWriter]) -> Snapshot:
+        """The snapshot `build(self)` writes, persisted next to the source file between runs.
+
+        The sidecar is memory-mapped rather than deserialized, so processes
+        opening the same file share one copy of its pages.
+        """
+        fingerprint = self.snapshot.fingerprint
+        if self.source is None or self._overlay or self.removed:
+            return Snapshot.from_bytes(build(self).to_bytes(fingerprint))
+        path = mapped_path(self.source, name)
+        snapshot = open_mapped(path, fingerprint.digest, schema=SCHEMA)
+        if snapshot is not None:
+            return snapshot
+        writer = build(self)
+        writer.meta["schema"] = SCHEMA
+        try:
+            writer.write(path, fingerprint)
+        except OSError as err:
+            logger.warning(f"Could not write {path}: {err}")
+            return Snapshot.from_bytes(writer.to_bytes(fingerprint))
+        return Snapshot.open(path)
+
+    def sort_keys(self, column: Column) -> Sequence[Any]:
+        """Per-row sort keys for `column`, computed from the typed arrays once."""
+        try:
+            return self._keys[column]
+        except KeyError:
+            pass
+        if self._overlay:
+            keys = [sort_key(column, value) for value in self.column(column)]
+        elif column.kind is Kind.number:
+            keys = [-math.inf if math.isnan(v) else v for v in self.numbers(column)]
+        elif column.kind is Kind.category:
+            ranks = _category_ranks(column, self.categories(column))
+            keys = array("I", map(ranks.__getitem__, self.codes(column)))
+        else:
+            keys = [value.casefold() for value in self.column(column)]
+        self._keys[column] = keys
+        return keys
+
+
+class _Overlaid(Sequence):
+    """A column of the base store with patched rows read from the overlay."""
+
+    def __init__(
+        self,
+        values: Sequence[str],
+        overlay: Dict[int, EntryType],
+        column: Column,
+        length: int,
+    ) -> None:
+        self.values = values
+        self.overlay = overlay
+        self.column = column
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(len(self))))
+        if index < 0:
+            index += self.length
+        row = self.overlay.get(index)
+        return self.values[index] if row is None else row[self.column]
+
+
+def sort_key(column: Column, value: str) -> Any:
+    """The sort key of a single raw `value`, ordered like `Store.sort_keys`."""
+    if column.kind is Kind.number:
+        number = parse_number(value)
+        return -math.inf if math.isnan(number) else number
+    if column is Column.size:
+        return _size_rank(value)
+    return value.casefold()
+
+
+def _category_ranks(column: Column, categories: Tuple[str, ...]) -> List[int]:
+    if column is Column.size:
+        key = _size_rank
+    else:
+        key = str.casefold
+    order = sorted(range(len(categories)), key=lambda code: key(categories[code]))
+    ranks = [0] * len(categories)
+    for rank, code in enumerate(order):
+        ranks[code] = rank
+    return ranks
+
+
+def _size_rank(value: str) -> int:
+    try:
+        return Size.parse(value)
+    except KeyError:
+        return 0
+
+
+DataType = Store
+
+
+def read_csv(
+    file: Path, progress: Progress | None = None
+) -> Tuple[List[str], List[EntryType]]:
+    """Parse `file`, reporting every `BATCH` parsed rows to `progress`.
+
+    Columns are matched by header name, so files may order (or omit) them freely.
+    """
+    with file.open(newline="") as fh:
+        reader = csv.reader(fh)
+        header = next(reader, [])
+        order = _header_order(header)
+        if order is not None:
+            reader = (
+                tuple(entry[i] if 0 <= i < len(entry) else "" for i in order)
+                for entry in reader
+            )
+        if progress is None:
+            return header, [tuple(entry) for entry in reader]
+        rows: List[EntryType] = []
+        for entry in reader:
+            rows.append(tuple(entry))
+            if len(rows) % BATCH == 0:
+                progress(len(rows) - BATCH, rows[-BATCH:])
+        if len(rows) % BATCH:
+            last = len(rows) - len(rows) % BATCH
+            progress(last, rows[last:])
+        return header, rows
+
+
+def _header_order(header: List[str]) -> List[int] | None:
+    """Source positions of each column, or None if `header` is already in column order."""
+    positions = {field_column(name): position for position, name in enumerate(header)}
+    order = [positions.get(column, -1) for column in Column]
+    return None if order == list(range(len(Column))) else order
+
+
+def read_jsonl(
+    file: Path, progress: Progress | None = None
+) -> Tuple[List[str], List[EntryType]]:
+    """Parse one JSON object per line, keyed by column name; missing fields are empty."""
+    header = [column.title for column in Column]
+    rows: List[EntryType] = []
+    with file.open(encoding="utf-8") as fh:
+        for number, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as err:
+                raise ValueError(f"{file}:{number}: {err}") from None
+            entry = [""] * len(Column)
+            for name, value in record.items():
+                column = field_column(name)
+                if column is not None and value is not None:
+                    entry[column] = value if isinstance(value, str) else str(value)
+            rows.append(tuple(entry))
+            if progress is not None and len(rows) % BATCH == 0:
+                progress(len(rows) - BATCH, rows[-BATCH:])
+    if progress is not None and len(rows) % BATCH:
+        last = len(rows) - len(rows) % BATCH
+        progress(last, rows[last:])
+    return header, rows
+
+
+def read_rows(
+    file: Path, progress: Progress | None = None
+) -> Tuple[List[str], List[EntryType]]:
+    """Parse a CSV or, by its suffix, JSON Lines bestiary file."""
+    if file.suffix.casefold() in (".jsonl", ".ndjson"):
+        return read_jsonl(file, progress)
+    return read_csv(file, progress)
+
+
+def encode_rows(rows: Iterable[EntryType], **meta) -> SnapshotWriter:
+    rows = list(rows)
+    columns = tuple(zip(*rows)) or ((),) * len(Column)
+    writer = SnapshotWriter(schema=SCHEMA, rows=len(rows), categories={}, **meta)
+    for column in Column:
+        values = columns[column]
+        if column.kind is Kind.category:
+            lookup: Dict[str, int] = {}
+            codes = [lookup.setdefault(value, len(lookup)) for value in values]
+            writer.add(
+                f"{column.key}.codes",
+                array("H" if len(lookup) < 1 << 16 else "I", codes),
+            )
+            writer.meta["categories"][column.key] = list(lookup)
+            continue
+        if column.kind is Kind.number:
+            writer.add(f"{column.key}.values", array("d", map(parse_number, values)))
+        writer.add_text(column.key, values)
+    return writer
+
+
+def build_snapshot(file: Path, progress: Progress | None = None) -> Snapshot:
+    fingerprint = Fingerprint.of(file)
+    header, rows = read_rows(file, progress)
+    writer = encode_rows(rows, header=header)
+    try:
+        writer.write(snapshot_path(file), fingerprint)
+    except OSError as err:
+        logger.warning(f"Could not write snapshot for {file}: {err}")
+        return Snapshot.from_bytes(writer.to_bytes(fingerprint))
+    return Snapshot.open(snapshot_path(file))
+
+
+@timed("load.data")
+def load_data(
+    file: Path, rebuild: bool = False, progress: Progress | None = None
+) -> DataType:
+    """Load `file` from its snapshot, building one if needed.
 
-def load_data(file: Path) -> Tuple[Tuple[str]]:
-    data = []
-    header = True
-    with file.open() as fh:
-        for entry in csv.reader(fh):
-            if header is True:
-                header = False
-            else:
-                data.append(tuple(entry))
-    return tuple(data)
+    Rows are only parsed when the snapshot is rebuilt; `progress` then
+    receives them in batches as they are read.
+    """
+    snapshot = None if rebuild else open_cached(snapshot_path(file), file)
+    if snapshot is None or snapshot.meta.get("schema") != SCHEMA:
+        logger.info(f"Building snapshot for {file}")
+        snapshot = build_snapshot(file, progress)
+    return Store(snapshot, source=file)
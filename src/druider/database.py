@@ -0,0 +1,493 @@
+"""An optional SQLite backend: the bestiary in an indexed database with full-text search.
+
+Filters, search, sorting and limits run as SQL and results are paged from a
+cursor, so a query never holds every row, or every row index, in Python. The
+database is kept beside the source as ``<file>.sqlite`` and is rebuilt only
+when the snapshot it was built from changes.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections.abc import Sequence as SequenceABC
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from druider import bitmap
+from druider.cache import LRUCache
+from druider.data import SCHEMA as DATA_SCHEMA
+from druider.data import Column, DataType, EntryType, Kind, parse_number, sort_key
+from druider.facets import And, Contains, Facet, Is, Measure, Not, Or, Range, Term
+from druider.search import SEARCHABLE, tokenize
+from druider.sorting import SortKey
+
+if TYPE_CHECKING:
+    from druider.parsing import ParsedFields
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = 1
+SUFFIX = ".sqlite"
+PAGE = 1000
+
+_NUMBERS: Tuple[Column, ...] = tuple(
+    column for column in Column if column.kind is Kind.number
+)
+# Subtypes span six columns, so they get a table of their own.
+_FACETS: Tuple[Facet, ...] = tuple(
+    facet for facet in Facet if facet is not Facet.subtype
+)
+_INDEXED: Dict[str, str] = {
+    "type": '"facet.type"',
+    "size": '"facet.size"',
+    "size_rank": '"size.rank"',
+    "cr": '"facet.cr"',
+    "xp": '"xp.n"',
+    "environment": '"facet.environment"',
+    "source": '"facet.source"',
+    "name": '"_name" COLLATE NOCASE',
+}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _facet_column(facet: Facet) -> str:
+    return _quote(f"facet.{facet.value}")
+
+
+def _number_column(column: Column) -> str:
+    return _quote(f"{column.key}.n")
+
+
+def order_by(keys: Sequence[SortKey]) -> str:
+    """An ORDER BY list matching `SortEngine.order`: missing numbers first, ties in row order."""
+    terms = []
+    for column, reverse in keys:
+        if column.kind is Kind.number:
+            expression = _number_column(column)
+        elif column is Column.size:
+            expression = '"size.rank"'
+        else:
+            expression = f"{_quote(column.key)} COLLATE NOCASE"
+        terms.append(f"{expression} DESC" if reverse else expression)
+    return ", ".join([*terms, "row"])
+
+
+def database_path(source: Path) -> Path:
+    return source.with_name(source.name + SUFFIX)
+
+
+class Database:
+    """The rows of one store in SQLite, queried with facet terms, search words and sort keys."""
+
+    connection: sqlite3.Connection
+    fields: "ParsedFields | None" = None
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.connection = connection
+        self._keys: Dict[Facet, List[Any]] = {}
+
+    @classmethod
+    def load(cls, data: DataType, rebuild: bool = False) -> "Database":
+        """The database for `data`, reused while the snapshot it was built from is unchanged."""
+        key = f"{DATA_SCHEMA}.{SCHEMA}:{data.snapshot.fingerprint.digest}"
+        if data.source is None or data.patched or data.removed:
+            return cls.build(data, ":memory:", key)
+        path = database_path(data.source)
+        if not rebuild:
+            connection = _open(path, key)
+            if connection is not None:
+                return cls(connection)
+        temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            temp.unlink(missing_ok=True)
+            cls.build(data, str(temp), key).connection.close()
+            os.replace(temp, path)
+        except (OSError, sqlite3.Error) as err:
+            logger.warning(f"Could not write {path}: {err}")
+            return cls.build(data, ":memory:", key)
+        return cls(_connect(str(path)))
+
+    @classmethod
+    def build(cls, data: DataType, target: str, key: str) -> "Database":
+        started = time.perf_counter()
+        connection = _connect(target)
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        columns = [
+            "row INTEGER PRIMARY KEY",
+            *(f"{_quote(column.key)} TEXT" for column in Column),
+            *(f"{_number_column(column)} REAL" for column in _NUMBERS),
+            '"size.rank" INTEGER',
+            *(_facet_column(facet) for facet in _FACETS),
+        ]
+        searchable = ", ".join(_quote(column.key) for column in SEARCHABLE)
+        with connection:
+            connection.execute(f"CREATE TABLE creatures ({', '.join(columns)})")
+            connection.execute(
+                "CREATE TABLE subtypes (key TEXT NOT NULL, row INTEGER NOT NULL, PRIMARY KEY (key, row))"
+            )
+            connection.execute(f"CREATE VIRTUAL TABLE search USING fts5({searchable})")
+            connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            database = cls(connection)
+            # Whole columns decode far faster than row after row.
+            entries = enumerate(zip(*(data.column(column) for column in Column)))
+            database._insert(
+                (entry for entry in entries if entry[0] not in data.removed)
+            )
+            for name, expression in _INDEXED.items():
+                connection.execute(
+                    f"CREATE INDEX creatures_{name} ON creatures ({expression})"
+                )
+            connection.execute("INSERT INTO meta VALUES ('key', ?)", (key,))
+        connection.execute("ANALYZE")
+        logger.info(
+            f"Built SQLite database of {len(data)} rows in {time.perf_counter() - started:.2f}s"
+        )
+        return database
+
+    def _insert(
+        self,
+        entries: Iterable[Tuple[int, EntryType]],
+        where: str = "1",
+        params: Sequence[Any] = (),
+    ) -> None:
+        """Write `entries`, (row, entry) pairs which `where` selects once written, to every table."""
+        record = _Records()
+        marks = ", ".join("?" * (1 + len(Column) + len(_NUMBERS) + 1 + len(_FACETS)))
+        self.connection.executemany(
+            f"INSERT INTO creatures VALUES ({marks})",
+            (record(*entry) for entry in entries),
+        )
+        self.connection.create_function(
+            "subtype", 1, Facet.subtype.key, deterministic=True
+        )
+        for column in map(_quote, (column.key for column in Facet.subtype.columns)):
+            self.connection.execute(
+                f"INSERT OR IGNORE INTO subtypes SELECT subtype({column}), row FROM creatures"
+                f" WHERE ({where}) AND subtype({column}) IS NOT NULL",
+                params,
+            )
+        searchable = ", ".join(_quote(column.key) for column in SEARCHABLE)
+        self.connection.execute(
+            f"INSERT INTO search (rowid, {searchable}) SELECT row, {searchable} FROM creatures WHERE {where}",
+            params,
+        )
+
+    def patch(self, data: DataType, rows: Iterable[int]) -> None:
+        """Re-write `rows` from patched `data`, deleting those it removed."""
+        rows = list(rows)
+        selected = json.dumps(rows)
+        with self.connection:
+            for table, column in (
+                ("creatures", "row"),
+                ("subtypes", "row"),
+                ("search", "rowid"),
+            ):
+                self.connection.execute(
+                    f"DELETE FROM {table} WHERE {column} IN (SELECT value FROM json_each(?))",
+                    (selected,),
+                )
+            self._insert(
+                (
+                    (row, data[row])
+                    for row in rows
+                    if row < len(data) and row not in data.removed
+                ),
+                "row IN (SELECT value FROM json_each(?))",
+                (selected,),
+            )
+            # The file no longer matches any snapshot; the next start rebuilds it.
+            self.connection.execute("DELETE FROM meta WHERE key = 'key'")
+        self._keys.clear()
+
+    def where(self, term: Term | None) -> Tuple[str, List[Any]]:
+        """`term` as a WHERE condition over `creatures` and its parameters."""
+        if term is None:
+            return "1", []
+        if isinstance(term, Is):
+            marks = ", ".join("?" * len(term.keys))
+            if term.facet is Facet.subtype:
+                return (
+                    f"row IN (SELECT row FROM subtypes WHERE key IN ({marks}))",
+                    list(term.keys),
+                )
+            return f"{_facet_column(term.facet)} IN ({marks})", list(term.keys)
+        if isinstance(term, Contains):
+            needle = term.text.casefold()
+            if term.facet is Facet.subtype:
+                return "row IN (SELECT row FROM subtypes WHERE instr(lower(key), ?))", [
+                    needle
+                ]
+            column = _facet_column(term.facet)
+            label = f"printf('%g', {column})" if term.facet is Facet.cr else column
+            return f"instr(lower({label}), ?)", [needle]
+        if isinstance(term, Range):
+            return self._range(term)
+        if isinstance(term, Measure):
+            if self.fields is None:
+                raise ValueError(
+                    f"Parsed fields are not loaded, so {term.name} cannot be filtered on"
+                )
+            rows = bitmap.members(self.fields.select(term.name, term.op, term.value))
+            return "row IN (SELECT value FROM json_each(?))", [json.dumps(rows)]
+        if isinstance(term, (And, Or)):
+            if not term.terms:
+                return ("1" if isinstance(term, And) else "0"), []
+            parts, params = [], []
+            for part in term.terms:
+                sql, values = self.where(part)
+                parts.append(f"({sql})")
+                params.extend(values)
+            return (" AND " if isinstance(term, And) else " OR ").join(parts), params
+        if isinstance(term, Not):
+            # NULL (a row without a value for the facet) does not match, so its negation must.
+            sql, params = self.where(term.term)
+            return f"NOT COALESCE(({sql}), 0)", params
+        raise ValueError(f"Unsupported filter {term!r}")
+
+    def _range(self, term: Range) -> Tuple[str, List[Any]]:
+        if term.facet is Facet.size:
+            column = '"size.rank"'
+            conditions, params = [f"{_facet_column(Facet.size)} IS NOT NULL"], []
+        elif term.facet is Facet.subtype:
+            column = "key"
+            conditions, params = ["1"], []
+        else:
+            column = _facet_column(term.facet)
+            conditions, params = [f"{column} IS NOT NULL"], []
+        for bound, op in ((term.low, ">="), (term.high, "<=")):
+            if bound is not None:
+                conditions.append(f"{column} {op} ?")
+                params.append(term.facet.order(bound))
+        sql = " AND ".join(conditions)
+        if term.facet is Facet.subtype:
+            return f"row IN (SELECT row FROM subtypes WHERE {sql})", params
+        return sql, params
+
+    def query(
+        self, term: Term | None = None, search: str = ""
+    ) -> Tuple[str, List[Any]]:
+        """The WHERE condition for rows matching `term` and every word of `search` as a prefix."""
+        sql, params = self.where(term)
+        words = tokenize(search)
+        if words:
+            sql = f"({sql}) AND row IN (SELECT rowid FROM search WHERE search MATCH ?)"
+            params = [*params, " ".join(f'"{word}"*' for word in words)]
+        return sql, params
+
+    def select(
+        self,
+        term: Term | None = None,
+        search: str = "",
+        sort: Sequence[SortKey] = (),
+        limit: int | None = None,
+    ) -> "Rows":
+        """Rows matching `term` and `search` in `sort` order, at most `limit` of them."""
+        where, params = self.query(term, search)
+        return Rows(self, where, params, order_by(sort), limit)
+
+    def order(
+        self, keys: Sequence[SortKey], rows: Iterable[int] | None = None
+    ) -> Sequence[int]:
+        """Like `SortEngine.order`; a query's rows are re-queried in the new order."""
+        if isinstance(rows, Rows) and rows.database is self:
+            return rows.ordered(keys)
+        if rows is None:
+            return self.select(sort=keys)
+        return Rows(
+            self,
+            "row IN (SELECT value FROM json_each(?))",
+            [json.dumps(list(rows))],
+            order_by(keys),
+        )
+
+    def values(self, facet: Facet) -> List[Any]:
+        try:
+            return self._keys[facet]
+        except KeyError:
+            pass
+        if facet is Facet.subtype:
+            sql = "SELECT DISTINCT key FROM subtypes"
+        else:
+            column = _facet_column(facet)
+            sql = f"SELECT DISTINCT {column} FROM creatures WHERE {column} IS NOT NULL"
+        keys = self._keys[facet] = sorted(
+            (key for key, in self.connection.execute(sql)), key=facet.order
+        )
+        return keys
+
+    def counts(self, facet: Facet, term: Term | None = None) -> Dict[Any, int]:
+        """Rows per value of `facet` among those matching `term`."""
+        where, params = self.where(term)
+        if facet is Facet.subtype:
+            matching = f"SELECT row FROM creatures WHERE {where}"
+            sql = f"SELECT key, COUNT(*) FROM subtypes WHERE row IN ({matching}) GROUP BY key"
+        else:
+            column = _facet_column(facet)
+            sql = f"SELECT {column}, COUNT(*) FROM creatures WHERE {column} IS NOT NULL AND ({where}) GROUP BY 1"
+        return dict(self.connection.execute(sql, params))
+
+    def options(
+        self, facet: Facet, term: Term | None = None
+    ) -> Iterable[Tuple[str, Any, int]]:
+        """(label, key, count) for every value of `facet`, like `facet_options`."""
+        counts = self.counts(facet, term)
+        for key in self.values(facet):
+            yield facet.label(key), key, counts.get(key, 0)
+
+
+class Rows(SequenceABC):
+    """The row indices of one query, in order, read a page at a time as they are used.
+
+    Positional access fetches (and keeps a few) pages of `PAGE` rows;
+    iteration streams from a cursor. Nothing is read until it is needed.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        where: str,
+        params: List[Any],
+        order: str,
+        limit: int | None = None,
+    ) -> None:
+        self.database = database
+        self.where = where
+        self.params = params
+        self.order = order
+        self.limit = limit
+        self._length: int | None = None
+        self._pages: LRUCache[int, List[int]] = LRUCache(16)
+
+    def sql(self, columns: str = "row") -> str:
+        sql = (
+            f"SELECT {columns} FROM creatures WHERE {self.where} ORDER BY {self.order}"
+        )
+        return sql if self.limit is None else f"{sql} LIMIT {int(self.limit)}"
+
+    def __len__(self) -> int:
+        if self._length is None:
+            sql = f"SELECT COUNT(*) FROM ({self.sql()})"
+            self._length = self.database.connection.execute(
+                sql, self.params
+            ).fetchone()[0]
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        number, offset = divmod(index, PAGE)
+        return self._pages.get(number, self._page)[offset]
+
+    def _page(self, number: int) -> List[int]:
+        sql = f"SELECT row FROM ({self.sql()}) LIMIT {PAGE} OFFSET {number * PAGE}"
+        return [row for row, in self.database.connection.execute(sql, self.params)]
+
+    def __iter__(self) -> Iterator[int]:
+        for (row,) in _stream(
+            self.database.connection.execute(self.sql(), self.params)
+        ):
+            yield row
+
+    def __contains__(self, value) -> bool:
+        sql = f"SELECT 1 FROM ({self.sql()}) WHERE row = ? LIMIT 1"
+        return (
+            self.database.connection.execute(sql, [*self.params, value]).fetchone()
+            is not None
+        )
+
+    def index(self, value, start: int = 0, stop: int | None = None) -> int:
+        """The position of row `value`, numbered by SQLite rather than by reading the rows before it."""
+        numbered = self.sql(
+            f"row, ROW_NUMBER() OVER (ORDER BY {self.order}) - 1 AS position"
+        )
+        sql = f"SELECT position FROM ({numbered}) WHERE row = ?"
+        found = self.database.connection.execute(sql, [*self.params, value]).fetchone()
+        if found is None or found[0] < start or (stop is not None and found[0] >= stop):
+            raise ValueError(f"{value} is not in the rows")
+        return found[0]
+
+    def ordered(self, keys: Sequence[SortKey]) -> "Rows":
+        return Rows(self.database, self.where, self.params, order_by(keys), self.limit)
+
+    def cells(self, columns: Sequence[Column]) -> Iterator[List[str]]:
+        """The values of `columns` for every row, streamed from a cursor."""
+        selected = ", ".join(_quote(column.key) for column in columns)
+        cursor = self.database.connection.execute(self.sql(selected), self.params)
+        for values in _stream(cursor):
+            yield list(values)
+
+
+def _stream(cursor: sqlite3.Cursor) -> Iterator[Tuple[Any, ...]]:
+    while True:
+        page = cursor.fetchmany(PAGE)
+        if not page:
+            return
+        yield from page
+
+
+def _connect(target: str, uri: bool = False) -> sqlite3.Connection:
+    # Built on a worker thread, queried from the UI thread; sqlite serializes access.
+    return sqlite3.connect(target, check_same_thread=False, uri=uri)
+
+
+def _open(path: Path, key: str) -> sqlite3.Connection | None:
+    """Open the database at `path` if it was built under `key`."""
+    if not path.exists():
+        return None
+    try:
+        if os.access(path, os.W_OK):
+            connection = _connect(str(path))
+        else:
+            connection = _connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+        stored = connection.execute(
+            "SELECT value FROM meta WHERE key = 'key'"
+        ).fetchone()
+    except sqlite3.Error as err:
+        logger.debug(f"Database {path} unusable: {err}")
+        return None
+    if stored is None or stored[0] != key:
+        connection.close()
+        return None
+    return connection
+
+
+class _Records:
+    """Turns rows into `creatures` records, memoizing the parse of repeated cell values."""
+
+    def __init__(self) -> None:
+        self._numbers: Dict[str, float | None] = {}
+        self._keys: Dict[Tuple[Facet, str], Any] = {}
+
+    def number(self, value: str) -> float | None:
+        try:
+            return self._numbers[value]
+        except KeyError:
+            number = parse_number(value)
+            number = self._numbers[value] = None if number != number else number
+            return number
+
+    def key(self, facet: Facet, value: str) -> Any:
+        try:
+            return self._keys[facet, value]
+        except KeyError:
+            key = self._keys[facet, value] = facet.key(value)
+            return key
+
+    def __call__(self, row: int, entry: EntryType) -> Tuple[Any, ...]:
+        return (
+            row,
+            *entry,
+            *(self.number(entry[column]) for column in _NUMBERS),
+            sort_key(Column.size, entry[Column.size]),
+            *(self.key(facet, entry[facet.columns[0]]) for facet in _FACETS),
+        )
@@ -0,0 +1,530 @@
+"""Build encounters: groups of creatures whose total XP fits a party's budget.
+
+Budgets follow the Pathfinder encounter tables: the average party level,
+adjusted for party size and the chosen difficulty, gives a CR whose XP is the
+budget. Each creature may only appear in the group sizes its Organization
+lists (solitary, pair, pack (3-6), ...).
+"""
+
+import argparse
+import logging
+import random
+import re
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from heapq import merge
+from itertools import chain
+from typing import (
+    TYPE_CHECKING,
+    Collection,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+)
+
+from druider import bitmap
+from druider.data import Column, DataType
+from druider.metrics import timed
+from druider.snapshot import SnapshotWriter
+from druider.sources import add_arguments as add_source_arguments
+from druider.sources import load_sources, source_files
+
+if TYPE_CHECKING:
+    from druider.facets import Term
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES: Dict[str, int] = {
+    "easy": -1,
+    "average": 0,
+    "challenging": 1,
+    "hard": 2,
+    "epic": 3,
+}
+# XP for CR 1/8, 1/6, 1/4, 1/3 and 1/2; from CR 1 on, each CR alternately adds a third and a half.
+_FRACTIONAL_XP = (50, 65, 100, 135, 200)
+MAX_COUNT = 12
+SLACK = 0.2
+MAX_KINDS = 8
+# Candidates tried at each level of the search before it gives up on a branch,
+# and starting groups tried per encounter asked for before the search gives up.
+BRANCHING = 32
+ATTEMPTS = 64
+# Positions the search may look at in one call, and from one starting group;
+# these bound its cost however many kinds an encounter combines.
+NODES = 20_000
+NODES_PER_ANCHOR = 400
+# Candidates fewer than one row in this many, and than `SUBSET` in all, get
+# groups of their own for a query rather than being sought among all groups.
+SPARSE = 8
+SUBSET = 1_000
+
+# "pack (3-6)"; dice counts such as "tribe (1d4 bands ...)" are not sizes.
+_GROUP = re.compile(
+    r"\s*(?P<name>[^()]*?)\s*(?:\(\s*(?P<low>\d+)(?![\dd])(?:\s*-\s*(?P<high>\d+))?[^)]*\)?)?\s*$"
+)
+_SPLIT = re.compile(r",|\bor\b|\band\b")
+
+
+def xp_for_cr(cr: int) -> int:
+    """XP of a creature of challenge rating `cr`; CRs below 1 step down through 1/2, 1/3, 1/4, 1/6, 1/8."""
+    if cr < 1:
+        return _FRACTIONAL_XP[max(len(_FRACTIONAL_XP) - 1 + cr, 0)]
+    xp = 400
+    for step in range(1, cr):
+        xp = xp * 3 // 2 if step % 2 else xp * 4 // 3
+    return xp
+
+
+def budget(level: int, party: int = 4, difficulty: str = "average") -> int:
+    """The XP budget of an encounter for `party` characters of average `level`."""
+    if difficulty not in DIFFICULTIES:
+        raise ValueError(
+            f"Unknown difficulty {difficulty!r}, expected one of {', '.join(DIFFICULTIES)}"
+        )
+    apl = level + (1 if party >= 6 else -1 if party <= 3 else 0)
+    return xp_for_cr(apl + DIFFICULTIES[difficulty])
+
+
+@lru_cache(maxsize=4096)
+def organization(text: str) -> Dict[str, Tuple[int, int]]:
+    """Group names and their size ranges, e.g. "solitary, pair, or pack (3-6)".
+
+    A blank or unreadable organization counts as solitary; "any" allows any size.
+    """
+    groups: Dict[str, Tuple[int, int]] = {}
+    for part in _SPLIT.split(text.casefold()):
+        match = _GROUP.match(part)
+        if match is None or not match["name"]:
+            continue
+        name = match["name"]
+        if match["low"] is not None:
+            groups[name] = (int(match["low"]), int(match["high"] or match["low"]))
+        elif name in ("solitary", "unique"):
+            groups[name] = (1, 1)
+        elif name == "pair":
+            groups[name] = (2, 2)
+        elif name == "any":
+            groups[name] = (1, MAX_COUNT)
+    return groups or {"solitary": (1, 1)}
+
+
+def group_sizes(
+    text: str, allowed: Collection[str] | None = None, limit: int = MAX_COUNT
+) -> Dict[int, str]:
+    """Each size (up to `limit`) an organization allows, with the group it forms; only `allowed` groups if given."""
+    sizes: Dict[int, str] = {}
+    for name, (low, high) in organization(text).items():
+        if allowed is None or name in allowed:
+            for size in range(low, min(high, limit) + 1):
+                sizes.setdefault(size, name)
+    return sizes
+
+
+class Group(NamedTuple):
+    """`count` of the creature at `row`, together worth `xp`."""
+
+    xp: float
+    row: int
+    count: int
+
+
+class Encounter(NamedTuple):
+    groups: Tuple[Group, ...]
+
+    @property
+    def xp(self) -> float:
+        return sum(group.xp for group in self.groups)
+
+    @property
+    def rows(self) -> FrozenSet[int]:
+        return frozenset(group.row for group in self.groups)
+
+
+class Groups(NamedTuple):
+    """Groups in ascending order of XP, as parallel arrays."""
+
+    xps: Sequence[float]
+    rows: Sequence[int]
+    counts: Sequence[int]
+
+    def group(self, position: int) -> Group:
+        return Group(self.xps[position], self.rows[position], self.counts[position])
+
+
+class EncounterIndex:
+    """Every group of every creature with an XP value, as its organization allows, in ascending order of XP.
+
+    The groups for the default options live in a memory-mapped sidecar, so
+    a query only pays for its search; other options build theirs once.
+    """
+
+    groups: Groups
+
+    def __init__(self, data: DataType, groups: Groups) -> None:
+        self.data = data
+        self.groups = groups
+        self.variants: Dict[Tuple[FrozenSet[str] | None, int], Groups] = {}
+
+    @classmethod
+    @timed("index.encounters")
+    def build(
+        cls,
+        data: DataType,
+        allowed: Collection[str] | None = None,
+        limit: int = MAX_COUNT,
+        rows: Iterable[int] | None = None,
+    ) -> "EncounterIndex":
+        """The groups of every creature, or only of those in `rows`."""
+        keys = data.sort_keys(Column.xp)
+        rows = (
+            [row for row in range(len(data)) if row not in data.removed]
+            if rows is None
+            else list(rows)
+        )
+        rows = [row for row in rows if keys[row] > 0]
+        rows.sort(key=keys.__getitem__)
+        # Creatures are in XP order, so the groups of each size are too and only need merging.
+        runs: Dict[int, List[Tuple[float, int, int]]] = {}
+        for row in rows:
+            for size in group_sizes(
+                data.cell(row, Column.organization), allowed, limit
+            ):
+                runs.setdefault(size, []).append((keys[row] * size, row, size))
+        xps, found, counts = array("d"), array("I"), array("H")
+        for xp, row, size in merge(*runs.values()):
+            xps.append(xp)
+            found.append(row)
+            counts.append(size)
+        return cls(data, Groups(xps, found, counts))
+
+    @classmethod
+    def load(cls, data: DataType) -> "EncounterIndex":
+        snapshot = data.mapped("encounters", lambda data: cls.build(data).writer())
+        return cls(data, Groups(*(snapshot.section(name) for name in Groups._fields)))
+
+    def writer(self) -> SnapshotWriter:
+        writer = SnapshotWriter()
+        for name, column in zip(Groups._fields, self.groups):
+            writer.add(name, column)
+        return writer
+
+    def options(
+        self, allowed: Collection[str] | None = None, limit: int = MAX_COUNT
+    ) -> Groups:
+        """The groups when only `allowed` organizations, of at most `limit` creatures, may form."""
+        if allowed is None and limit == MAX_COUNT:
+            return self.groups
+        key = (None if allowed is None else frozenset(allowed), limit)
+        if key not in self.variants:
+            self.variants[key] = type(self).build(self.data, allowed, limit).groups
+        return self.variants[key]
+
+    @timed("encounters.find")
+    def find(
+        self,
+        budget: float,
+        kinds: int = 2,
+        count: int = 5,
+        candidates: int | None = None,
+        allowed: Collection[str] | None = None,
+        limit: int = MAX_COUNT,
+        slack: float = SLACK,
+        seed: int = 0,
+    ) -> List[Encounter]:
+        """Up to `count` encounters of `kinds` different creatures worth (1 - `slack`) to 1 times `budget`.
+
+        Only creatures in the `candidates` bitmap take part, if given. The
+        groups of a few candidates are built for the query; many are picked
+        out of all groups as the search meets them.
+        """
+        groups = self.options(allowed, limit)
+        rows = None if candidates is None else bitmap.members(candidates)
+        if (
+            rows is not None
+            and len(rows) <= SUBSET
+            and len(rows) * SPARSE < len(self.data)
+        ):
+            groups, rows = (
+                type(self).build(self.data, allowed, limit, rows).groups,
+                None,
+            )
+        elif rows is not None:
+            rows = set(rows)
+        found = find(groups, budget * (1 - slack), budget, kinds, count, seed, rows)
+        logger.debug(f"{len(found)} encounters of {kinds} kinds for {budget} XP")
+        return found
+
+
+def find(
+    groups: Groups,
+    low: float,
+    high: float,
+    kinds: int,
+    count: int = 5,
+    seed: int = 0,
+    rows: Collection[int] | None = None,
+) -> List[Encounter]:
+    """Up to `count` encounters of `kinds` of `groups` (of creatures in `rows`, if given), worth `low` to `high` XP.
+
+    No creature appears in two encounters, so they vary. Each encounter
+    starts from a random group and is completed by a depth-first search that
+    bisects the XP order for the picks that can still fit, those nearest the
+    mean left first, so the last pick lands the total near `high`. It tries
+    at most `BRANCHING` picks per level and looks at `NODES_PER_ANCHOR`
+    positions from each starting group and `NODES` in all, so more kinds can
+    mean fewer encounters found but never exponentially more time.
+    """
+    xps = groups.xps
+    if not xps or kinds < 1:
+        return []
+    # The first group must leave room for the others at their smallest, and need no more than their largest.
+    start = bisect_left(xps, low - (kinds - 1) * xps[-1])
+    anchors = bisect_right(xps, high - (kinds - 1) * xps[0]) - start
+    used: Set[int] = set()
+    found: List[Encounter] = []
+    failed, spent = 0, 0
+    for anchor in _shuffled(anchors, random.Random(seed)):
+        if spent >= NODES:
+            break
+        spent += 1
+        first = groups.group(start + anchor)
+        if first.row in used or rows is not None and first.row not in rows:
+            continue
+        nodes = [min(NODES_PER_ANCHOR, NODES - spent)]
+        allowance = nodes[0]
+        rest = _complete(
+            groups,
+            kinds - 1,
+            low - first.xp,
+            high - first.xp,
+            len(xps),
+            used | {first.row},
+            rows,
+            nodes,
+        )
+        spent += allowance - nodes[0]
+        if rest is None:
+            failed += 1
+            if failed == ATTEMPTS * count:
+                break
+            continue
+        encounter = Encounter((first, *rest))
+        found.append(encounter)
+        used.update(encounter.rows)
+        if len(found) == count:
+            break
+    found.sort(key=lambda encounter: -encounter.xp)
+    return found
+
+
+def _complete(
+    groups: Groups,
+    kinds: int,
+    low: float,
+    high: float,
+    stop: int,
+    exclude: Set[int],
+    rows: Collection[int] | None,
+    nodes: List[int],
+) -> Tuple[Group, ...] | None:
+    """`kinds` groups before position `stop`, of creatures in `rows` but not `exclude`, worth `low` to `high` XP.
+
+    `nodes` holds how many more positions may be looked at, shared by every branch.
+    """
+    if kinds == 0:
+        return () if low <= 0 else None
+    xps = groups.xps
+    # The largest pick is at least the mean and leaves room for the others at their smallest.
+    top = min(stop, bisect_right(xps, high - (kinds - 1) * xps[0]))
+    bottom = bisect_left(xps, low / kinds, 0, top)
+    # Picks just under the mean of `high` come first: they leave the same mean for the rest, where the largest
+    # would leave the others only the smallest groups, of which there are few.
+    middle = max(bottom, bisect_right(xps, high / kinds, 0, top))
+    tried = 0
+    for position in chain(range(middle - 1, bottom - 1, -1), range(middle, top)):
+        if nodes[0] <= 0:
+            break
+        nodes[0] -= 1
+        row = groups.rows[position]
+        if row in exclude or rows is not None and row not in rows:
+            continue
+        xp = xps[position]
+        rest = _complete(
+            groups,
+            kinds - 1,
+            low - xp,
+            high - xp,
+            position,
+            exclude | {row},
+            rows,
+            nodes,
+        )
+        if rest is not None:
+            return (groups.group(position), *rest)
+        tried += 1
+        if tried == BRANCHING:
+            break
+    return None
+
+
+def _shuffled(length: int, generator: random.Random) -> Iterator[int]:
+    """0 to `length` - 1 in random order, drawn lazily (Fisher-Yates over a sparse swap table)."""
+    swapped: Dict[int, int] = {}
+    for position in range(length):
+        choice = generator.randrange(position, length)
+        yield swapped.get(choice, choice)
+        swapped[choice] = swapped.get(position, position)
+
+
+def _names(text: str) -> List[str]:
+    return [name.strip().casefold() for name in text.split(",") if name.strip()]
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "filter", nargs="?", default="", help="filter expression, e.g. 'type=animal'"
+    )
+    parser.add_argument(
+        "-l", "--level", type=int, required=True, help="average party level"
+    )
+    parser.add_argument(
+        "-p",
+        "--party",
+        type=int,
+        default=4,
+        help="number of characters (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-d",
+        "--difficulty",
+        choices=DIFFICULTIES,
+        default="average",
+        help="encounter difficulty (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-e",
+        "--environment",
+        help="only creatures whose environment mentions this, e.g. forest",
+    )
+    parser.add_argument(
+        "--organization",
+        type=_names,
+        help="only these groupings, e.g. solitary,pair,pack",
+    )
+    parser.add_argument(
+        "-k",
+        "--kinds",
+        type=int,
+        choices=range(1, MAX_KINDS + 1),
+        default=2,
+        metavar=f"1-{MAX_KINDS}",
+        help="different creatures per encounter (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-n",
+        "--count",
+        type=int,
+        default=5,
+        help="encounters to suggest (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-group",
+        type=int,
+        default=MAX_COUNT,
+        help="most creatures of one kind (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--slack",
+        type=float,
+        default=SLACK,
+        help="fraction of the budget an encounter may leave unspent (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="change to get other suggestions"
+    )
+    add_source_arguments(parser)
+
+
+def candidates(
+    data: DataType, expression: str = "", environment: str | None = None
+) -> int | None:
+    """The rows `expression` and `environment` allow, or None when neither restricts them."""
+    from druider.facets import And, Contains, Facet, FacetIndex, parse
+    from druider.query import _uses_measures
+
+    terms: List["Term"] = []
+    term = parse(expression)
+    if term is not None:
+        terms.append(term)
+    if environment:
+        terms.append(Contains(Facet.environment, environment))
+    if not terms:
+        return None
+    facets = FacetIndex.load(data)
+    if _uses_measures(term):
+        from druider.parsing import ParsedFields
+
+        facets.fields = ParsedFields.load(data)
+    return facets.resolve(And(tuple(terms)))
+
+
+def write(
+    out: TextIO,
+    data: DataType,
+    encounters: Sequence[Encounter],
+    allowed: Collection[str] | None = None,
+    limit: int = MAX_COUNT,
+) -> None:
+    """`encounters` one per line; `allowed` and `limit` must be those they were found with."""
+    for number, encounter in enumerate(encounters, 1):
+        parts = []
+        for group in encounter.groups:
+            sizes = group_sizes(
+                data.cell(group.row, Column.organization), allowed, limit
+            )
+            name = sizes[group.count]
+            parts.append(
+                f"{group.count} × {data.cell(group.row, Column._name)} ({name}, {group.xp:,.0f})"
+            )
+        out.write(f"{number:>2}. {encounter.xp:>10,.0f} XP  {', '.join(parts)}\n")
+
+
+def run(args: argparse.Namespace, out: TextIO | None = None) -> int:
+    out = sys.stdout if out is None else out
+    try:
+        total = budget(args.level, args.party, args.difficulty)
+        data = load_sources(source_files(args), args.precedence)
+        allowed = candidates(data, args.filter, args.environment)
+        encounters = EncounterIndex.load(data).find(
+            total,
+            args.kinds,
+            args.count,
+            allowed,
+            args.organization,
+            args.max_group,
+            args.slack,
+            args.seed,
+        )
+    except (OSError, ValueError) as err:
+        print(f"druider encounter: {err}", file=sys.stderr)
+        return 2
+    out.write(
+        f"Budget {total:,} XP for {args.party} characters of level {args.level}, {args.difficulty}\n"
+    )
+    if not encounters:
+        out.write(
+            "No encounters fit; try more kinds, a larger --slack or fewer constraints.\n"
+        )
+        return 1
+    write(out, data, encounters, args.organization, args.max_group)
+    return 0
@@ -0,0 +1,500 @@
+"""Bitmap-indexed facets and the query terms that combine them."""
+
+import logging
+import math
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Tuple
+
+from druider import bitmap
+from druider.data import Column, DataType, Size
+from druider.metrics import timed
+from druider.parsing import SPEEDS, ParsedFields
+from druider.snapshot import SnapshotWriter
+
+logger = logging.getLogger(__name__)
+
+
+class Facet(Enum):
+    type = "type"
+    subtype = "subtype"
+    size = "size"
+    alignment = "alignment"
+    environment = "environment"
+    source = "source"
+    mythic = "mythic"
+    unique = "unique"
+    cr = "cr"
+
+    @property
+    def title(self) -> str:
+        return "CR" if self is Facet.cr else self.value.capitalize()
+
+    @property
+    def columns(self) -> Tuple[Column, ...]:
+        return _COLUMNS[self]
+
+    def normalize(self, value: str) -> Any:
+        """Canonical key for a raw cell or user supplied value."""
+        value = value.strip()
+        if self is Facet.cr:
+            if "/" in value:
+                top, _, bottom = value.partition("/")
+                number = float(top) / float(bottom)
+            else:
+                number = float(value)
+            # The data rounds fractional CRs half up: 1/8 is "0.13", 1/6 is "0.17".
+            return math.floor(number * 100 + 0.5) / 100
+        if self in (Facet.mythic, Facet.unique):
+            return "yes" if value.casefold() in ("1", "yes", "true", "y") else "no"
+        if self in (Facet.alignment, Facet.source):
+            return value
+        return value.casefold()
+
+    def key(self, value: str) -> Any | None:
+        """The key a raw cell is indexed under, or None if it has none."""
+        if not value or value == "NULL":
+            return None
+        try:
+            return self.normalize(value)
+        except ValueError:
+            return None
+
+    def order(self, key: Any) -> Any:
+        if self is Facet.size:
+            return Size.parse(key)
+        return key
+
+    def label(self, key: Any) -> str:
+        if self is Facet.cr:
+            return f"{key:g}"
+        return str(key)
+
+
+_COLUMNS: Dict[Facet, Tuple[Column, ...]] = {
+    Facet.type: (Column.type,),
+    Facet.subtype: (
+        Column.subtype1,
+        Column.subtype2,
+        Column.subtype3,
+        Column.subtype4,
+        Column.subtype5,
+        Column.subtype6,
+    ),
+    Facet.size: (Column.size,),
+    Facet.alignment: (Column.alignment,),
+    Facet.environment: (Column.environment,),
+    Facet.source: (Column.source,),
+    Facet.mythic: (Column.mythic,),
+    Facet.unique: (Column.uniquemonster,),
+    Facet.cr: (Column.cr,),
+}
+
+
+class _Bitmaps(Mapping):
+    """The bitmaps of one facet, each decoded from its slice of a sidecar section when first used."""
+
+    def __init__(self, keys: List[Any], bits: memoryview, length: int) -> None:
+        self.positions = {key: position for position, key in enumerate(keys)}
+        self.bits = bits
+        self.stride = (length + 7) // 8
+        self.decoded: Dict[Any, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __getitem__(self, key: Any) -> int:
+        try:
+            return self.decoded[key]
+        except KeyError:
+            pass
+        start = self.positions[key] * self.stride
+        stop = start + self.stride
+        bits = self.decoded[key] = int.from_bytes(self.bits[start:stop], "little")
+        return bits
+
+
+class FacetIndex:
+    """One bitmap per distinct (normalized) value of every facet."""
+
+    length: int
+    bitmaps: Dict[Facet, Mapping[Any, int]]
+    fields: ParsedFields | None = None
+    removed: int = 0
+
+    def __init__(self, length: int, bitmaps: Dict[Facet, Mapping[Any, int]]) -> None:
+        self.length = length
+        self.bitmaps = bitmaps
+
+    def patched(self, data: DataType) -> "FacetIndex":
+        """This index with the rows `data` patched or removed since it was built re-indexed."""
+        touched = bitmap.from_indices([*data.patched, *data.removed], len(data))
+        bitmaps = {
+            facet: {key: bits & ~touched for key, bits in values.items()}
+            for facet, values in self.bitmaps.items()
+        }
+        for index, row in data.patched.items():
+            if index in data.removed:
+                continue
+            for facet in Facet:
+                for column in facet.columns:
+                    key = facet.key(row[column])
+                    if key is not None:
+                        bitmaps[facet][key] = bitmaps[facet].get(key, 0) | 1 << index
+        patched = FacetIndex(len(data), bitmaps)
+        patched.removed = bitmap.from_indices(data.removed, len(data))
+        if self.fields is not None:
+            patched.fields = self.fields.patched(data)
+        return patched
+
+    @classmethod
+    def build(cls, data: DataType) -> "FacetIndex":
+        bitmaps: Dict[Facet, Dict[Any, int]] = {}
+        for facet in Facet:
+            rows: Dict[Any, List[int]] = {}
+            for column in facet.columns:
+                for index, value in enumerate(data.column(column)):
+                    key = facet.key(value)
+                    if key is not None:
+                        rows.setdefault(key, []).append(index)
+            bitmaps[facet] = {
+                key: bitmap.from_indices(indices, len(data))
+                for key, indices in rows.items()
+            }
+        return cls(len(data), bitmaps)
+
+    @classmethod
+    def load(cls, data: DataType) -> "FacetIndex":
+        snapshot = data.mapped("facets", lambda data: cls.build(data).writer())
+        keys = snapshot.meta["keys"]
+        return cls(
+            len(data),
+            {
+                facet: _Bitmaps(
+                    keys[facet.value], snapshot.section(facet.value), len(data)
+                )
+                for facet in Facet
+            },
+        )
+
+    def writer(self) -> SnapshotWriter:
+        # Keys are strings, or numbers for CR, so they keep their type in the JSON header.
+        writer = SnapshotWriter(
+            keys={facet.value: list(self.bitmaps[facet]) for facet in Facet}
+        )
+        stride = (self.length + 7) // 8
+        for facet, values in self.bitmaps.items():
+            writer.add(
+                facet.value,
+                b"".join(bits.to_bytes(stride, "little") for bits in values.values()),
+            )
+        return writer
+
+    @property
+    def universe(self) -> int:
+        return bitmap.full(self.length) & ~self.removed
+
+    def values(self, facet: Facet) -> List[Any]:
+        return sorted(self.bitmaps[facet], key=facet.order)
+
+    def rows(self, facet: Facet, key: Any) -> int:
+        return self.bitmaps[facet].get(key, 0)
+
+    @timed("filter.resolve")
+    def resolve(self, term: "Term | None") -> int:
+        return self.universe if term is None else term.resolve(self)
+
+    def counts(self, facet: Facet, within: int | None = None) -> Dict[Any, int]:
+        """Rows per value of `facet`, restricted to `within` when given."""
+        if within is None:
+            return {
+                key: bitmap.count(bits) for key, bits in self.bitmaps[facet].items()
+            }
+        return {
+            key: bitmap.count(bits & within)
+            for key, bits in self.bitmaps[facet].items()
+        }
+
+
+class Term:
+    def resolve(self, index: FacetIndex) -> int:
+        raise NotImplementedError
+
+    def __and__(self, other: "Term") -> "Term":
+        return And((self, other))
+
+    def __or__(self, other: "Term") -> "Term":
+        return Or((self, other))
+
+    def __invert__(self) -> "Term":
+        return Not(self)
+
+
+@dataclass(frozen=True)
+class Is(Term):
+    """Rows whose `facet` is any of `keys`."""
+
+    facet: Facet
+    keys: Tuple[Any, ...]
+
+    def resolve(self, index: FacetIndex) -> int:
+        bits = 0
+        for key in self.keys:
+            bits |= index.rows(self.facet, key)
+        return bits
+
+
+@dataclass(frozen=True)
+class Contains(Term):
+    """Rows whose `facet` value contains `text`, e.g. environment ~ forest."""
+
+    facet: Facet
+    text: str
+
+    def resolve(self, index: FacetIndex) -> int:
+        needle = self.text.casefold()
+        bits = 0
+        for key, rows in index.bitmaps[self.facet].items():
+            if needle in self.facet.label(key).casefold():
+                bits |= rows
+        return bits
+
+
+@dataclass(frozen=True)
+class Range(Term):
+    """Rows whose ordered `facet` lies within [low, high]; either bound may be None."""
+
+    facet: Facet
+    low: Any = None
+    high: Any = None
+
+    def resolve(self, index: FacetIndex) -> int:
+        low = -math.inf if self.low is None else self.facet.order(self.low)
+        high = math.inf if self.high is None else self.facet.order(self.high)
+        bits = 0
+        for key, rows in index.bitmaps[self.facet].items():
+            if low <= self.facet.order(key) <= high:
+                bits |= rows
+        return bits
+
+
+@dataclass(frozen=True)
+class Measure(Term):
+    """Rows whose parsed `name` (e.g. speed.swim, skill.stealth) compares `op` to `value`."""
+
+    name: str
+    op: str
+    value: float
+
+    def resolve(self, index: FacetIndex) -> int:
+        if index.fields is None:
+            raise ValueError("Parsed fields are not loaded yet")
+        return index.fields.select(self.name, self.op, self.value)
+
+
+@dataclass(frozen=True)
+class And(Term):
+    terms: Tuple[Term, ...]
+
+    def resolve(self, index: FacetIndex) -> int:
+        bits = index.universe
+        for term in self.terms:
+            bits &= term.resolve(index)
+            if not bits:
+                break
+        return bits
+
+
+@dataclass(frozen=True)
+class Or(Term):
+    terms: Tuple[Term, ...]
+
+    def resolve(self, index: FacetIndex) -> int:
+        bits = 0
+        for term in self.terms:
+            bits |= term.resolve(index)
+        return bits
+
+
+@dataclass(frozen=True)
+class Not(Term):
+    term: Term
+
+    def resolve(self, index: FacetIndex) -> int:
+        return index.universe & ~self.term.resolve(index)
+
+
+_TOKEN = re.compile(
+    r'\s*(?:(?P<paren>[()])|(?P<comma>,)|"(?P<quoted>[^"]*)"'
+    r'|(?P<op>!=|<=|>=|=|<|>|~)|(?P<word>[^\s(),"=<>!~]+))'
+)
+_KEYWORDS = ("and", "or", "not")
+_MEASURE = re.compile(
+    r"^(?:(?:speed|skill)\..+|hd|(?:melee|ranged)\.(?:bonus|attacks))$"
+)
+
+
+def parse(text: str) -> Term | None:
+    """Parse a filter expression such as ``type=animal OR type=magical beast, size<=large, cr<=6``.
+
+    Clauses are ``facet op value`` with ``=``, ``!=``, ``<``, ``<=``, ``>``, ``>=`` or ``~``
+    (contains). Parsed stat-block measures compare numerically: ``speed.swim>=30``,
+    ``skill.stealth>=+10``, ``"skill.sleight of hand">5``, ``hd>=10``, ``melee.bonus>15``.
+    ``AND`` (or juxtaposition) binds tighter than ``OR``, and commas join the
+    resulting groups loosest of all; ``NOT`` and parentheses work as usual.
+    Raises ValueError on malformed input.
+    """
+    tokens = _tokenize(text)
+    if not tokens:
+        return None
+    parser = _Parser(tokens)
+    term = parser.expression()
+    if parser.position != len(tokens):
+        raise ValueError(f"Unexpected {tokens[parser.position][1]!r}")
+    return term
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Cannot parse {text[position:]!r}")
+        kind = match.lastgroup or "word"
+        value = match.group(kind)
+        if kind == "word" and value.casefold() in _KEYWORDS:
+            kind = value.casefold()
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens: List[Tuple[str, str]]) -> None:
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self, offset: int = 0) -> str | None:
+        position = self.position + offset
+        return self.tokens[position][0] if position < len(self.tokens) else None
+
+    def take(self, *kinds: str) -> str:
+        kind, value = (
+            self.tokens[self.position] if self.peek() else (None, "end of input")
+        )
+        if kind not in kinds:
+            raise ValueError(f"Expected {' or '.join(kinds)}, got {value!r}")
+        self.position += 1
+        return value
+
+    def expression(self) -> Term:
+        terms = [self.disjunction()]
+        while self.peek() == "comma":
+            self.take("comma")
+            terms.append(self.disjunction())
+        return terms[0] if len(terms) == 1 else And(tuple(terms))
+
+    def disjunction(self) -> Term:
+        terms = [self.conjunction()]
+        while self.peek() == "or":
+            self.take("or")
+            terms.append(self.conjunction())
+        return terms[0] if len(terms) == 1 else Or(tuple(terms))
+
+    def conjunction(self) -> Term:
+        terms = [self.unary()]
+        while True:
+            kind = self.peek()
+            if kind == "and":
+                self.position += 1
+            elif kind not in ("not", "word", "quoted"):
+                if not (kind == "paren" and self.tokens[self.position][1] == "("):
+                    break
+            terms.append(self.unary())
+        return terms[0] if len(terms) == 1 else And(tuple(terms))
+
+    def unary(self) -> Term:
+        if self.peek() == "not":
+            self.take("not")
+            return Not(self.unary())
+        if self.peek() == "paren":
+            if self.take("paren") != "(":
+                raise ValueError("Unbalanced ')'")
+            term = self.expression()
+            if self.take("paren") != ")":
+                raise ValueError("Expected ')'")
+            return term
+        return self.clause()
+
+    def clause(self) -> Term:
+        name = " ".join(self.take("word", "quoted").casefold().split())
+        if _MEASURE.match(name):
+            return self.measure(name)
+        try:
+            facet = Facet(name)
+        except ValueError:
+            raise ValueError(
+                f"Unknown facet {name!r}; expected one of {[f.value for f in Facet]}"
+            )
+        op = self.take("op")
+        value = self.value()
+        if op == "~":
+            return Contains(facet, value)
+        try:
+            key = facet.normalize(value)
+            facet.order(key)
+        except (KeyError, ValueError):
+            raise ValueError(f"Invalid {facet.value} {value!r}")
+        if op == "=":
+            return Is(facet, (key,))
+        if op == "!=":
+            return Not(Is(facet, (key,)))
+        if op in ("<", ">") and facet in (Facet.cr, Facet.size):
+            # Strict bounds are inclusive bounds minus the boundary value itself.
+            bound = Range(facet, high=key) if op == "<" else Range(facet, low=key)
+            return And((bound, Not(Is(facet, (key,)))))
+        if op == "<=":
+            return Range(facet, high=key)
+        if op == ">=":
+            return Range(facet, low=key)
+        raise ValueError(f"{op!r} needs an ordered facet (cr or size)")
+
+    def measure(self, name: str) -> Term:
+        if name.startswith("speed.") and name[6:] not in SPEEDS:
+            raise ValueError(
+                f"Unknown speed {name[6:]!r}; expected one of {list(SPEEDS)}"
+            )
+        op = self.take("op")
+        value = self.value()
+        try:
+            number = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid number {value!r} for {name}")
+        if op == "~":
+            raise ValueError(f"'~' does not apply to {name}")
+        return Measure(name, op, number)
+
+    def value(self) -> str:
+        if self.peek() == "quoted":
+            return self.take("quoted")
+        words = [self.take("word")]
+        # Unquoted values run until a keyword, separator or the next clause.
+        while self.peek() == "word" and self.peek(1) != "op":
+            words.append(self.take("word"))
+        return " ".join(words)
+
+
+def facet_options(
+    index: FacetIndex, facet: Facet, within: int
+) -> Iterable[Tuple[str, Any, int]]:
+    """(label, key, count) for every value of `facet`, counting rows in `within`."""
+    counts = index.counts(facet, within)
+    for key in index.values(facet):
+        yield facet.label(key), key, counts[key]
@@ -0,0 +1,428 @@
+"""Cross-references between entries: variants, alternate forms, companions and groups.
+
+The data names related creatures as free text. This index resolves those
+names once per dataset into rows, kept per relation as compressed sparse rows
+(an offsets array into one array of targets), so an entry's relatives are a
+slice away instead of a scan by name.
+"""
+
+import logging
+from array import array
+from collections import defaultdict
+from collections.abc import Sequence as SequenceABC
+from enum import Enum
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Sequence, Set, Tuple
+
+from druider.data import Column, DataType
+from druider.snapshot import SnapshotWriter
+
+if TYPE_CHECKING:
+    from druider.reload import Changes
+
+logger = logging.getLogger(__name__)
+
+# The columns links are resolved through, by their casefolded text.
+KEYED: Tuple[Column, ...] = (
+    Column._name,
+    Column.variantparent,
+    Column.companionfamiliarlink,
+    Column.alternatenameform,
+    Column.group,
+)
+
+
+class Link(Enum):
+    parent = "Variant of"
+    variants = "Variants"
+    forms = "Alternate forms"
+    companions = "Companions"
+    group = "Group"
+
+    @property
+    def title(self) -> str:
+        return self.value
+
+
+class Adjacency:
+    """The rows linked to each key, `targets[offsets[key]:offsets[key + 1]]`."""
+
+    def __init__(self, offsets: Sequence[int], targets: Sequence[int]) -> None:
+        self.offsets = offsets
+        self.targets = targets
+
+    def __len__(self) -> int:
+        return max(len(self.offsets) - 1, 0)
+
+    def __getitem__(self, key: int) -> Sequence[int]:
+        if key + 1 >= len(self.offsets):
+            return ()
+        start, stop = self.offsets[key], self.offsets[key + 1]
+        return self.targets[start:stop]
+
+    @classmethod
+    def from_sets(cls, length: int, links: Dict[int, Set[int]]) -> "Adjacency":
+        offsets, targets = array("I", [0]), array("I")
+        for key in range(length):
+            targets.extend(sorted(links.get(key, ())))
+            offsets.append(len(targets))
+        return cls(offsets, targets)
+
+    def add_to(self, writer: SnapshotWriter, name: str) -> None:
+        writer.add(f"{name}.offsets", array("I", self.offsets))
+        writer.add(f"{name}.targets", array("I", self.targets))
+
+
+class _PatchedAdjacency:
+    """An adjacency with the rows linked to some keys replaced."""
+
+    def __init__(self, base: Adjacency, overlay: Dict[int, Sequence[int]]) -> None:
+        self.base = base
+        self.overlay = overlay
+
+    def __len__(self) -> int:
+        return max(len(self.base), max(self.overlay, default=-1) + 1)
+
+    def __getitem__(self, key: int) -> Sequence[int]:
+        found = self.overlay.get(key)
+        return self.base[key] if found is None else found
+
+    def patched(self, overlay: Dict[int, Sequence[int]]) -> "_PatchedAdjacency":
+        return _PatchedAdjacency(self.base, {**self.overlay, **overlay})
+
+
+class _PatchedIds(SequenceABC):
+    """Group numbers per row, with patched rows' numbers read from `overlay`."""
+
+    def __init__(
+        self, base: Sequence[int], overlay: Dict[int, int], length: int
+    ) -> None:
+        self.base = base
+        self.overlay = overlay
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index):
+        found = self.overlay.get(index)
+        if found is not None:
+            return found
+        return self.base[index] if index < len(self.base) else 0
+
+
+def _key(text: str) -> str:
+    text = text.strip()
+    return "" if text == "NULL" else text.casefold()
+
+
+class _Keys:
+    """The rows per key of each column in `KEYED`, moved along with the data as it is patched."""
+
+    def __init__(self, data: DataType) -> None:
+        self.data = data
+        self.rows: Dict[Column, Dict[str, Set[int]]] = {
+            column: defaultdict(set) for column in KEYED
+        }
+        for column in KEYED:
+            rows, values = self.rows[column], data.column(column)
+            for row in range(len(data)):
+                if row not in data.removed:
+                    key = _key(values[row])
+                    if key:
+                        rows[key].add(row)
+
+    def get(self, column: Column, key: str) -> Set[int]:
+        return self.rows[column].get(key, set()) if key else set()
+
+    def key(self, row: int, column: Column) -> str:
+        return _key(self.data.cell(row, column)) if row not in self.data.removed else ""
+
+    def update(self, data: DataType, rows: Iterable[int]) -> None:
+        """Move to `data`, in which `rows` changed."""
+        rows = list(rows)
+        for column in KEYED:
+            found = self.rows[column]
+            for row in rows:
+                if row < len(self.data):
+                    found.get(self.key(row, column), set()).discard(row)
+        self.data = data
+        for column in KEYED:
+            found = self.rows[column]
+            for row in rows:
+                key = self.key(row, column)
+                if key:
+                    found[key].add(row)
+
+
+def _resolve(keys: _Keys, name: str, row: int) -> List[int]:
+    """The rows called `name`, preferring those from the source of `row`."""
+    found = sorted(keys.get(Column._name, _key(name)))
+    if not found:
+        return []
+    data = keys.data
+    source = data.cell(row, Column.source)
+    same = [other for other in found if data.cell(other, Column.source) == source]
+    return [other for other in same or found if other != row]
+
+
+class LinkIndex:
+    """Each entry's parent variant, child variants, alternate forms, companions and group.
+
+    Groups are stored once each: every row holds the number of its group
+    (0 for none) and the members are listed per group.
+    """
+
+    keys: _Keys | None = None
+
+    def __init__(
+        self,
+        data: DataType,
+        adjacency: Dict[Link, "Adjacency | _PatchedAdjacency"],
+        group_ids: Sequence[int],
+    ) -> None:
+        self.data = data
+        self.adjacency = adjacency
+        self.group_ids = group_ids
+
+    @classmethod
+    def build(cls, data: DataType) -> "LinkIndex":
+        rows = [row for row in range(len(data)) if row not in data.removed]
+        keys = _Keys(data)
+        resolve = partial(_resolve, keys)
+
+        links: Dict[Link, Dict[int, Set[int]]] = {
+            link: defaultdict(set) for link in Link if link is not Link.group
+        }
+        variants, companions = data.column(Column.variantparent), data.column(
+            Column.companionfamiliarlink
+        )
+        for row in rows:
+            for parent in resolve(variants[row], row):
+                links[Link.parent][row].add(parent)
+                links[Link.variants][parent].add(row)
+            for companion in resolve(companions[row], row):
+                links[Link.companions][row].add(companion)
+                links[Link.companions][companion].add(row)
+        for form in _forms(data, rows, resolve):
+            for row in form:
+                links[Link.forms][row].update(other for other in form if other != row)
+
+        group_ids = array("I", bytes(4 * len(data)))
+        members: Dict[int, Set[int]] = defaultdict(set)
+        numbers: Dict[str, int] = {}
+        groups = data.column(Column.group)
+        for row in rows:
+            key = _key(groups[row])
+            if key:
+                number = group_ids[row] = numbers.setdefault(key, len(numbers) + 1)
+                members[number].add(row)
+        adjacency = {
+            link: Adjacency.from_sets(len(data), links[link]) for link in links
+        }
+        adjacency[Link.group] = Adjacency.from_sets(len(numbers) + 1, members)
+        logger.debug(f"Linked {len(data)} rows into {len(numbers)} groups")
+        index = cls(data, adjacency, group_ids)
+        index.keys = keys
+        return index
+
+    @classmethod
+    def load(cls, data: DataType) -> "LinkIndex":
+        snapshot = data.mapped("links", lambda data: cls.build(data).writer())
+        adjacency = {
+            link: Adjacency(
+                snapshot.section(f"{link.name}.offsets"),
+                snapshot.section(f"{link.name}.targets"),
+            )
+            for link in Link
+        }
+        return cls(data, adjacency, snapshot.section("group.ids"))
+
+    def patched(self, data: DataType, changes: "Changes") -> "LinkIndex":
+        """This index for `data`, in which `changes` were made, re-linking only the rows they can affect.
+
+        Those are the rows changed, inserted or removed, the rows linked to
+        them before, and the rows naming them now. The rows per key are
+        looked up from this index's, which move on to the patched one.
+        """
+        touched = changes.rows
+        keys = self.keys if self.keys is not None else _Keys(self.data)
+        # Rows whose own references may resolve differently, and whatever they resolved to before.
+        referring = set(touched)
+        for row in touched:
+            for link in (Link.parent, Link.variants, Link.companions, Link.forms):
+                referring.update(self.get(link, row))
+        keys.update(data, touched)
+        for row in touched:
+            name = keys.key(row, Column._name)
+            referring |= keys.get(Column.variantparent, name) | keys.get(
+                Column.companionfamiliarlink, name
+            )
+        resolve = partial(_resolve, keys)
+        stale = set(referring)
+        for row in referring:
+            for link in (Link.parent, Link.variants, Link.companions):
+                stale.update(self.get(link, row))
+            if row not in data.removed:
+                stale.update(resolve(data.cell(row, Column.variantparent), row))
+                stale.update(resolve(data.cell(row, Column.companionfamiliarlink), row))
+
+        def referrers(row: int, column: Column) -> Set[int]:
+            """The rows whose `column` resolves to `row`."""
+            found = keys.get(column, keys.key(row, Column._name))
+            return {
+                other
+                for other in found
+                if row in resolve(data.cell(other, column), other)
+            }
+
+        overlays: Dict[Link, Dict[int, Sequence[int]]] = {link: {} for link in Link}
+        for row in stale:
+            if row in data.removed:
+                for link in (Link.parent, Link.variants, Link.companions):
+                    overlays[link][row] = ()
+                continue
+            overlays[Link.parent][row] = tuple(
+                resolve(data.cell(row, Column.variantparent), row)
+            )
+            overlays[Link.variants][row] = tuple(
+                sorted(referrers(row, Column.variantparent))
+            )
+            companions = referrers(row, Column.companionfamiliarlink)
+            companions.update(
+                resolve(data.cell(row, Column.companionfamiliarlink), row)
+            )
+            overlays[Link.companions][row] = tuple(sorted(companions))
+
+        # Forms are components of a graph through names and aliases; only rows with alternate names start one.
+        alternates = set().union(*keys.rows[Column.alternatenameform].values())
+        forms = {}
+        for form in _forms(data, sorted(alternates), resolve):
+            for row in form:
+                forms[row] = tuple(sorted(other for other in form if other != row))
+        before = set(forms) | referring
+        for row in list(before):
+            before.update(self.get(Link.forms, row))
+        for row in before:
+            found = forms.get(row, ())
+            if tuple(self.get(Link.forms, row)) != found:
+                overlays[Link.forms][row] = found
+
+        ids: Dict[int, int] = {}
+        numbers: Dict[str, int] = {}
+        count = len(self.adjacency[Link.group])
+        for row in sorted(touched):
+            key = keys.key(row, Column.group)
+            if not key:
+                ids[row] = 0
+            elif key not in numbers:
+                kept = [
+                    other
+                    for other in keys.get(Column.group, key)
+                    if other not in touched
+                ]
+                if kept:
+                    numbers[key] = self.group_ids[kept[0]]
+                else:
+                    numbers[key], count = count, count + 1
+            ids.setdefault(row, numbers.get(key, 0))
+        for number in {*ids.values(), *(self.get_group(row) for row in touched)} - {0}:
+            members = {
+                row for row in self.adjacency[Link.group][number] if row not in touched
+            }
+            members.update(row for row, found in ids.items() if found == number)
+            overlays[Link.group][number] = tuple(sorted(members))
+
+        adjacency = {}
+        for link, overlay in overlays.items():
+            current = self.adjacency[link]
+            if isinstance(current, _PatchedAdjacency):
+                adjacency[link] = current.patched(overlay)
+            else:
+                adjacency[link] = _PatchedAdjacency(current, overlay)
+        group_ids = self.group_ids
+        if isinstance(group_ids, _PatchedIds):
+            group_ids = _PatchedIds(
+                group_ids.base, {**group_ids.overlay, **ids}, len(data)
+            )
+        else:
+            group_ids = _PatchedIds(group_ids, ids, len(data))
+        patched = LinkIndex(data, adjacency, group_ids)
+        patched.keys = keys
+        logger.debug(f"Re-linked {len(stale)} rows for {len(touched)} changed")
+        return patched
+
+    def writer(self) -> SnapshotWriter:
+        writer = SnapshotWriter()
+        for link, adjacency in self.adjacency.items():
+            adjacency.add_to(writer, link.name)
+        writer.add("group.ids", array("I", self.group_ids))
+        return writer
+
+    def get(self, link: Link, row: int) -> Sequence[int]:
+        """The rows `link` relates to `row`; a group includes `row` itself."""
+        if link is Link.group:
+            return self.adjacency[link][self.get_group(row)]
+        return self.adjacency[link][row]
+
+    def get_group(self, row: int) -> int:
+        """The number of the group of `row`, 0 for none."""
+        return self.group_ids[row] if row < len(self.group_ids) else 0
+
+    def related(self, row: int) -> List[Tuple[Link, Sequence[int]]]:
+        """Every relation `row` has, with its rows as `get` returns them."""
+        found = []
+        for link in Link:
+            rows = self.get(link, row)
+            if len(rows) > (1 if link is Link.group else 0):
+                found.append((link, rows))
+        return found
+
+    def neighborhood(self, rows: Iterable[int]) -> Set[int]:
+        """`rows` and every row related to one of them."""
+        found = set(rows)
+        for row in list(found):
+            for link in Link:
+                found.update(self.get(link, row))
+        return found
+
+
+def _forms(
+    data: DataType, rows: Sequence[int], resolve: Callable[[str, int], List[int]]
+) -> List[List[int]]:
+    """Sets of rows that are forms of one creature.
+
+    Rows of one name and source with alternate names are its forms (a
+    werewolf's human and hybrid forms). A creature's only alternate name is
+    another name for it, shared with the rows that use it too.
+    """
+    names, sources = data.column(Column._name), data.column(Column.source)
+    alternates = data.column(Column.alternatenameform)
+    creatures: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+    for row in rows:
+        if _key(alternates[row]):
+            creatures[_key(names[row]), sources[row]].append(row)
+    parent = {row: row for row in rows}
+
+    def find(row: int) -> int:
+        parent.setdefault(row, row)
+        while parent[row] != row:
+            parent[row] = row = parent[parent[row]]
+        return row
+
+    def union(row: int, other: int) -> None:
+        parent[find(row)] = find(other)
+
+    aliases: Dict[str, int] = {}
+    for forms in creatures.values():
+        for row in forms[1:]:
+            union(row, forms[0])
+        if len({_key(alternates[row]) for row in forms}) == 1:
+            alias, row = _key(alternates[forms[0]]), forms[0]
+            union(row, aliases.setdefault(alias, row))
+            for other in resolve(alias, row):
+                union(other, row)
+    components: Dict[int, List[int]] = defaultdict(list)
+    for row in sorted(parent):
+        components[find(row)].append(row)
+    return [component for component in components.values() if len(component) > 1]
@@ -1,86 +1,262 @@
+from __future__ import annotations
+
 import logging
-from collections.abc import Callable
-from enum import IntEnum, auto
-from typing import Any, Dict, Iterable, TypeVar
+from typing import (
+    TYPE_CHECKING,
+    AbstractSet,
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+)
 
+from rich.text import Text
 from textual import on
 from textual.app import ComposeResult
+from textual.binding import Binding
 from textual.containers import Container
-from textual.widgets import DataTable
-from textual.widgets.data_table import ColumnKey
+from textual.message import Message
+from textual.validation import Function
+from textual.widgets import Collapsible, DataTable, Input, Select, SelectionList, Static
+from textual.widgets.data_table import ColumnKey, RowDoesNotExist, RowKey
+from textual.widgets.selection_list import Selection
+
+from druider import bitmap
+from druider.compare import MARK
+from druider.data import Column, DataType, EntryType, Store
+from druider.facets import And, Facet, FacetIndex, Is, Term, facet_options, parse
+from druider.metrics import timed
+from druider.sorting import SortEngine, SortStack
 
-from druider.data import Column, DataType
+if TYPE_CHECKING:
+    from druider.database import Database
+    from druider.search import SearchIndex
+    from druider.virtual import VirtualAnimals
+    from druider.wildshape import WildShapeIndex
 
 logger = logging.getLogger(__name__)
 T = TypeVar("T")
 
 
-class Size(IntEnum):
-    fine = auto()
-    diminutive = auto()
-    tiny = auto()
-    small = auto()
-    medium = auto()
-    large = auto()
-    huge = auto()
-    gargantuan = auto()
-    colossal = auto()
+class _RowCell(str):
+    """A name cell that knows its row, so `DataTable.sort` can order rows by index."""
+
+    row: int
 
-    @classmethod
-    def parse(cls, value: str):
-        return cls[value.lower()]
+    def __new__(cls, value: str, row: int) -> "_RowCell":
+        cell = super().__new__(cls, value)
+        cell.row = row
+        return cell
 
 
 class Animals(DataTable):
+    """The listing as a `DataTable`, which holds a row for every entry it shows.
+
+    Narrowing removes the rows that left and adds those that entered; order
+    is applied with `DataTable.sort`, so the rows shown keep their keys and
+    cells. `VirtualAnimals` is the listing that only reads the rows on screen.
+    """
+
+    BINDINGS = [Binding("m", "toggle_mark", "Compare")]
+
+    class Marked(Message):
+        def __init__(self, row: int, marked: bool) -> None:
+            self.row = row
+            self.marked = marked
+            super().__init__()
+
     data: DataType
-    current_sorts: set = set()
-    _sorters: Dict[Column, Callable[[str], Any]] = {
-        Column._name: lambda s: s[0],
-        Column.size: Size.parse,
-    }
-    _actions: Dict[Column, str] = {
-        Column._name: "sort_by_name",
-        Column.size: "sort_by_size",
-    }
+    candidates: List[int]
+    marked: Set[int]
+    sorter: SortEngine | None = None
+    sort_stack: SortStack
+    _columns: Tuple[Column, ...] = (
+        Column.size,
+        Column._name,
+        Column.cr,
+        Column.xp,
+        Column.hp,
+        Column.ac,
+        Column.base_speed,
+    )
+    _mark = "mark"
+    # `remove_row` re-indexes every row, so past this many re-indexed rows per
+    # row kept, the table is cleared and the rows kept are added back instead.
+    _reindex_ratio = 64
     zebra_stripes = True
 
     def __init__(self, data: DataType, *args, **kwargs) -> None:
         self.data = data
+        self.candidates = []
+        self.marked = set()
+        self.sort_stack = SortStack()
         super().__init__(*args, **kwargs)
 
+    @property
+    def cursor_data_row(self) -> int | None:
+        if not self.row_count:
+            return None
+        row_key = self.coordinate_to_cell_key(self.cursor_coordinate).row_key
+        return None if row_key.value is None else int(row_key.value)
+
     def add_data_column(self, column: Column) -> ColumnKey:
         return self.add_column(column.title, key=column.key)
 
     def add_data_columns(self) -> Iterable[ColumnKey]:
         return (
-            self.add_data_column(Column.size),
-            self.add_data_column(Column._name),
+            self.add_column("", key=self._mark),
+            *(self.add_data_column(column) for column in self._columns),
+        )
+
+    def data_cell(self, index: int, column: Column) -> str:
+        value = self.data.cell(index, column)
+        return _RowCell(value, index) if column is Column._name else value
+
+    def add_data_row(self, index: int) -> RowKey:
+        mark = MARK if index in self.marked else ""
+        return self.add_row(
+            mark,
+            *(self.data_cell(index, column) for column in self._columns),
+            key=str(index),
         )
 
     def add_data_rows(self):
-        for index, entry in enumerate(self.data):
-            if entry[Column.type] == "animal":
-                self.add_row(entry[Column.size], entry[Column._name], key=str(index))
+        for index in self.candidates:
+            self.add_data_row(index)
+
+    def add_batch(self, start: int, rows: List[EntryType]) -> None:
+        """Show freshly parsed rows before the store they belong to is ready."""
+        for index, entry in enumerate(rows, start):
+            self.add_row(
+                "",
+                *(
+                    (
+                        _RowCell(entry[column], index)
+                        if column is Column._name
+                        else entry[column]
+                    )
+                    for column in self._columns
+                ),
+                key=str(index),
+            )
+
+    def set_data(self, data: DataType, sorter: SortEngine) -> None:
+        self.data = data
+        self.sorter = sorter
+
+    def refresh_rows(self, rows: Iterable[int]) -> None:
+        """Re-read the cells of `rows` that are currently in the table."""
+        for index in rows:
+            row_key = RowKey(str(index))
+            if row_key in self.rows and index < len(self.data):
+                for column in self._columns:
+                    self.update_cell(row_key, column.key, self.data_cell(index, column))
+
+    def show_rows(self, rows: AbstractSet[int] | None) -> None:
+        """Narrow the table to the candidates in `rows` (all of them if None)."""
+        wanted = (
+            self.candidates
+            if rows is None
+            else [i for i in self.candidates if i in rows]
+        )
+        if self.sort_stack and self.sorter is not None:
+            wanted = self.sorter.order(self.sort_stack.keys, wanted)
+        self.set_rows(wanted)
+
+    def set_rows(self, rows: Sequence[int]) -> None:
+        """Show `rows` in order, keeping the cursor on its row if that is still shown.
+
+        Rows already shown keep their cells; only the rows that left are
+        removed and only those that entered are added.
+        """
+        current = self.cursor_data_row
+        keep = {str(index) for index in rows}
+        left = [row_key for row_key in self.rows if row_key.value not in keep]
+        if len(left) * len(self.rows) > self._reindex_ratio * len(rows):
+            self.clear()
+        else:
+            for row_key in left:
+                self.remove_row(row_key)
+        for index in rows:
+            if str(index) not in self.rows:
+                self.add_data_row(index)
+        self.order_rows(rows, keep=current)
+
+    def order_rows(self, rows: Sequence[int], keep: int | None = None) -> None:
+        """Put the rows shown in the order of `rows`, keeping row `keep` under the cursor."""
+        position = {index: order for order, index in enumerate(rows)}
+        self.sort(Column._name.key, key=lambda cell: position[cell.row])
+        if keep is not None and str(keep) in self.rows:
+            self.move_cursor(row=self.get_row_index(str(keep)), animate=False)
+
+    def neighbors(self, index: int, radius: int) -> List[int]:
+        """Rows displayed up to `radius` positions above and below row `index`."""
+        try:
+            position = self.get_row_index(str(index))
+        except RowDoesNotExist:
+            return []
+        ordered = self.ordered_rows
+        rows = []
+        for offset in range(1, radius + 1):
+            for near in (position + offset, position - offset):
+                if 0 <= near < len(ordered):
+                    rows.append(int(ordered[near].key.value))
+        return rows
+
+    def mark(self, index: int, marked: bool = True) -> None:
+        """Mark row `index` for comparison, or unmark it."""
+        if (index in self.marked) == marked:
+            return
+        if marked:
+            self.marked.add(index)
+        else:
+            self.marked.discard(index)
+        if str(index) in self.rows:
+            self.update_cell(
+                str(index), self._mark, MARK if marked else "", update_width=True
+            )
+        self.post_message(self.Marked(index, marked))
+
+    def action_toggle_mark(self) -> None:
+        index = self.cursor_data_row
+        if index is not None:
+            self.mark(index, index not in self.marked)
 
     def on_mount(self) -> None:
         logger.info("hello world")
         self.add_data_columns()
         self.add_data_rows()
 
-    def sort_reverse(self, sort_type: str):
-        """Determine if `sort_type` is ascending or descending."""
-        reverse = sort_type in self.current_sorts
-        if reverse:
-            self.current_sorts.remove(sort_type)
-        else:
-            self.current_sorts.add(sort_type)
-        return reverse
-
+    @timed("sort.column")
     def sort_data_column(self, column: Column):
-        self.sort(
-            column.key, key=self._sorters[column], reverse=self.sort_reverse(column.key)
+        self.sort_stack.push(column)
+        self.apply_sort()
+
+    def apply_sort(self) -> None:
+        """Re-order the rows shown by the sort stack, from the engine's cached ranks."""
+        if self.sorter is None:
+            return
+        rows = [int(row.key.value) for row in self.ordered_rows]
+        # Labels first: sorting refreshes the cached header along with the rows.
+        self.update_sort_labels()
+        self.order_rows(
+            self.sorter.order(self.sort_stack.keys, rows), keep=self.cursor_data_row
         )
 
+    def update_sort_labels(self) -> None:
+        for column in self._columns:
+            label = Text(column.title)
+            indicator = self.sort_stack.indicator(column)
+            if indicator:
+                label.append(f" {indicator}", style="bold")
+            data_column = self.columns[ColumnKey(column.key)]
+            data_column.label = label
+            data_column.content_width = max(data_column.content_width, label.cell_len)
+
     def action_sort_by_size(self) -> None:
         self.sort_data_column(Column.size)
 
@@ -90,7 +266,7 @@ class Animals(DataTable):
     def select_animal(self, event: DataTable.CellSelected) -> None | int:
         selected = None
         try:
-            if event.cell_key.column_key.value:
+            if event.cell_key.column_key.value in Column.__members__:
                 if Column[event.cell_key.column_key.value] is Column._name:
                     if event.cell_key.row_key.value is None:
                         raise ValueError(event.cell_key.row_key)
@@ -101,16 +277,264 @@ class Animals(DataTable):
         return selected
 
 
+def _parses(expression: str) -> bool:
+    try:
+        parse(expression)
+    except ValueError as err:
+        logger.debug("Invalid filter: %s", err)
+        return False
+    return True
+
+
 class Listing(Container):
-    animals: Animals
+    DEFAULT_FILTER = "type=animal"
 
-    def __init__(self, data: DataType, *args, **kwargs) -> None:
-        self.animals = Animals(data)
+    animals: Animals | VirtualAnimals
+    index: SearchIndex | None = None
+    facets: FacetIndex | None = None
+    database: Database | None = None
+    wildshape: WildShapeIndex | None = None
+    level: int | None = None
+    expression: Term | None = None
+    selected: Dict[Facet, Set[Any]]
+    search: str = ""
+    filtered_rows: int = 0
+
+    class Filtered(Message):
+        """The rows passing the filters changed, or the search narrowing them did.
+
+        `found` is what the search matched, None for no search.
+        """
+
+        def __init__(self, rows: int, found: AbstractSet[int] | None) -> None:
+            self.rows = rows
+            self.found = found
+            super().__init__()
+
+    def __init__(self, *args, virtual: bool = True, **kwargs) -> None:
+        data = Store.empty()
+        if virtual:
+            from druider.virtual import VirtualAnimals
+
+            self.animals = VirtualAnimals(data, id="animals")
+        else:
+            self.animals = Animals(data, id="animals")
+        self.selected = {}
+        self.expression = parse(self.DEFAULT_FILTER)
         super().__init__(*args, **kwargs)
 
     def compose(self) -> ComposeResult:
-        # TODO: yield sort and search
+        yield Input(placeholder="Search", id="search", disabled=True)
+        yield Select((), prompt="Any creature", id="druid-level", disabled=True)
+        with Collapsible(title="Filters", id="filters"):
+            yield Input(
+                self.DEFAULT_FILTER,
+                placeholder="e.g. type=animal OR type=magical beast, size<=large, cr<=6",
+                validators=[Function(_parses, "Invalid filter")],
+                id="filter",
+                disabled=True,
+            )
+            yield Select(
+                ((facet.title, facet) for facet in Facet),
+                value=Facet.type,
+                allow_blank=False,
+                id="facet",
+            )
+            yield SelectionList(id="facet-options")
         yield self.animals
+        yield Static("Loading…", id="listing-status")
+
+    def add_batch(self, start: int, rows: List[EntryType]) -> None:
+        self.animals.add_batch(start, rows)
+        self.query_one("#listing-status", Static).update(
+            f"Loading… {start + len(rows)} rows parsed"
+        )
+
+    def set_data(
+        self,
+        data: DataType,
+        index: SearchIndex,
+        facets: FacetIndex,
+        sorter: SortEngine,
+        wildshape: WildShapeIndex,
+        database: Database | None = None,
+    ) -> None:
+        """Switch from the loading state to the fully indexed `data`.
+
+        With a `database`, the rows shown are queried from it rather than
+        the in-memory indexes; the listing must then be virtual.
+        """
+        self.index = index
+        self.facets = facets
+        self.wildshape = wildshape
+        self.database = database
+        self.animals.set_data(data, sorter if database is None else database)
+        levels = self.query_one("#druid-level", Select)
+        with levels.prevent(Select.Changed):
+            levels.set_options(wildshape.options())
+        self.apply_filters()
+        for widget in self.query(Input):
+            widget.disabled = False
+        levels.disabled = False
+        self.query_one("#listing-status", Static).display = False
+
+    def reload(
+        self,
+        data: DataType,
+        index: SearchIndex,
+        facets: FacetIndex,
+        sorter: SortEngine,
+        wildshape: WildShapeIndex,
+        rows: AbstractSet[int],
+    ) -> None:
+        """Swap in patched indexes, touching only `rows`; filters, sort and cursor are kept."""
+        self.index = index
+        self.facets = facets
+        self.wildshape = wildshape
+        if self.database is not None:
+            self.database.patch(data, rows)
+        self.animals.set_data(data, sorter if self.database is None else self.database)
+        self.animals.refresh_rows(rows)
+        levels = self.query_one("#druid-level", Select)
+        with levels.prevent(Select.Changed):
+            levels.set_options(wildshape.options())
+            if self.level is not None:
+                levels.value = self.level
+        self.apply_filters()
+
+    def term(self, exclude: Facet | None = None) -> Term | None:
+        """The filter expression and every facet selection but `exclude`'s, as one term."""
+        terms = [
+            Is(facet, tuple(keys))
+            for facet, keys in self.selected.items()
+            if keys and facet is not exclude
+        ]
+        if self.expression is not None:
+            terms.append(self.expression)
+        return And(tuple(terms)) if terms else None
+
+    def filtered(self, exclude: Facet | None = None) -> int:
+        """Rows passing the filter expression and every facet selection but `exclude`'s."""
+        assert self.facets is not None
+        rows = self.facets.resolve(self.term(exclude))
+        if self.wildshape is not None and self.level is not None:
+            rows &= self.wildshape.rows(self.level)
+        return rows
+
+    def query_term(self, exclude: Facet | None = None) -> Term | None:
+        """Like `filtered`, as a term for the database: wild shape eligibility is a filter too."""
+        from druider.wildshape import level_term
+
+        term = self.term(exclude)
+        if self.level is None:
+            return term
+        return (
+            level_term(self.level)
+            if term is None
+            else And((term, level_term(self.level)))
+        )
+
+    def show_query(self) -> None:
+        """Show the rows the database finds for the filters and search, in the listing's sort order."""
+        from druider.virtual import VirtualAnimals
+
+        assert self.database is not None and isinstance(self.animals, VirtualAnimals)
+        animals = self.animals
+        rows = self.database.select(
+            self.query_term(), self.search, animals.sort_stack.keys
+        )
+        animals.set_rows(rows, keep=animals.cursor_data_row)
+
+    @timed("filter.apply")
+    def apply_filters(self) -> None:
+        if self.facets is None or self.index is None:
+            return
+        self.filtered_rows = self.filtered()
+        if self.database is not None:
+            self.show_query()
+            self.update_facet_options()
+            self.post_filtered()
+            return
+        found = self.index.search(self.search)
+        self.animals.candidates = bitmap.members(self.filtered_rows)
+        self.animals.show_rows(found)
+        self.update_facet_options()
+        self.post_filtered(found)
+
+    def post_filtered(self, found: AbstractSet[int] | None = None) -> None:
+        """Tell the app which rows the filters and search select; `found` spares searching again."""
+        assert self.index is not None
+        if found is None:
+            found = self.index.search(self.search)
+        self.post_message(self.Filtered(self.filtered_rows, found))
+
+    def update_facet_options(self) -> None:
+        facet = self.query_one("#facet", Select).value
+        if self.database is not None:
+            found = self.database.options(facet, self.query_term(exclude=facet))
+        else:
+            assert self.facets is not None
+            found = facet_options(self.facets, facet, self.filtered(exclude=facet))
+        options = self.query_one("#facet-options", SelectionList)
+        selected = self.selected.get(facet, set())
+        with options.prevent(SelectionList.SelectedChanged):
+            options.clear_options()
+            options.add_options(
+                Selection(f"{label} ({count})", key, key in selected)
+                for label, key, count in found
+                if count or key in selected
+            )
+
+    @on(Input.Changed, "#search")
+    @timed("event.search")
+    def handle_search(self, event: Input.Changed):
+        try:
+            self.search = event.value
+            if self.database is not None:
+                self.show_query()
+                self.post_filtered()
+            elif self.index is not None:
+                found = self.index.search(event.value)
+                self.animals.show_rows(found)
+                self.post_filtered(found)
+        except Exception as err:
+            logger.critical(err)
+
+    @on(Input.Changed, "#filter")
+    @timed("event.filter")
+    def handle_filter(self, event: Input.Changed):
+        if event.validation_result is not None and not event.validation_result.is_valid:
+            return
+        try:
+            self.expression = parse(event.value)
+            self.apply_filters()
+        except Exception as err:
+            logger.critical(err)
+
+    @on(Select.Changed, "#druid-level")
+    @timed("event.level")
+    def handle_level(self, event: Select.Changed):
+        try:
+            self.level = None if event.value is Select.NULL else event.value
+            logger.info(f"Wild shape level: {self.level}")
+            self.apply_filters()
+        except Exception as err:
+            logger.critical(err)
+
+    @on(Select.Changed, "#facet")
+    def handle_facet(self, event: Select.Changed):
+        if self.facets is not None or self.database is not None:
+            self.update_facet_options()
+
+    @on(SelectionList.SelectedChanged, "#facet-options")
+    @timed("event.facet")
+    def handle_facet_selection(self, event: SelectionList.SelectedChanged):
+        try:
+            facet = self.query_one("#facet", Select).value
+            self.selected[facet] = set(event.selection_list.selected)
+            self.apply_filters()
+        except Exception as err:
+            logger.critical(err)
 
     @on(Animals.RowSelected)
     @on(Animals.CellSelected)
@@ -121,22 +545,12 @@ class Listing(Container):
         logger.debug(event)
 
     @on(Animals.HeaderSelected)
+    @timed("event.sort")
     def handle_header(self, event: Animals.HeaderSelected):
-        # TODO: icon to indicate sort direction
         try:
-            if event.column_key.value:
+            if event.column_key.value in Column.__members__:
                 column = Column[event.column_key.value]
                 logger.info(f"Sorting Animals by {column!r}")
                 self.query_one(Animals).sort_data_column(column)
         except Exception as err:
             logger.critical(err)
-
-    # @on(Animals.CellSelected)
-    def _handle_cell(self, event: Animals.CellSelected):
-        # NOTE: This may need to go on the app or body for values to be easily passed to details
-        try:
-            if event.cell_key.column_key.value:
-                if Column[event.cell_key.column_key.value] is Column._name:
-                    logger.info(f"Caching Animal cell {event.value}")
-        except Exception as err:
-            logger.critical(err)
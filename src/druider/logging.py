@@ -1,39 +1,147 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
-
-from rich.logging import RichHandler
-from textual.app import ComposeResult
-from textual.widget import Widget
-from textual.widgets import RichLog
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, List
 
 if TYPE_CHECKING:
-    from loguru import FilterDict, FilterFunction, Record
+    from loguru import FilterDict, FilterFunction
+
+    from druider.logview import DruidLog
+
+MAX_LINES = 5000
+BATCH = 256
+FILE_FORMAT = "%(asctime)s %(levelname)-8s %(name)s: %(message)s"
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Enqueue records as they are; formatting happens on the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class LevelSampler(logging.Filter):
+    """While `log` is off screen, drop records below `level`, keeping one in `sample` (0: none)."""
+
+    def __init__(
+        self, log: DruidLog, level: int = logging.INFO, sample: int = 0
+    ) -> None:
+        super().__init__()
+        self.log = log
+        self.level = level
+        self.sample = sample
+        self.skipped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.log.closed:
+            return False
+        if self.log.showing or record.levelno >= self.level:
+            return True
+        self.skipped += 1
+        return bool(self.sample) and self.skipped % self.sample == 0
+
+
+class FileSink:
+    """Size-rotated log files (`path`, `path`.1 … `path`.`backups`) written by a background thread."""
+
+    path: Path
+    backups: int
+    handler: QueueHandler
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = 5 * 1024 * 1024,
+        backups: int = 5,
+        level: int = logging.DEBUG,
+    ) -> None:
+        self.path = Path(path)
+        self.backups = backups
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file_handler = RotatingFileHandler(
+            self.path,
+            maxBytes=max_bytes,
+            backupCount=backups,
+            encoding="utf-8",
+            delay=True,
+        )
+        self.file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+        self.queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+        self.handler = DeferredQueueHandler(self.queue)  # type: ignore
+        self.handler.setLevel(level)
+        self.listener = QueueListener(self.queue, self.file_handler)  # type: ignore
+        self._detach: List[Callable[[], None]] = []
+        self._started = False
+
+    def files(self) -> List[Path]:
+        """Existing log files, oldest first."""
+        names = [
+            self.path.with_name(f"{self.path.name}.{n}")
+            for n in range(self.backups, 0, -1)
+        ]
+        return [file for file in (*names, self.path) if file.exists()]
+
+    def start(self) -> None:
+        if not self._started:
+            self.listener.start()
+            self._started = True
+
+    def stop(self) -> None:
+        """Detach from every logger, flush what is queued and close the file."""
+        for detach in self._detach:
+            detach()
+        self._detach.clear()
+        if self._started:
+            self.listener.stop()
+            self._started = False
+        self.file_handler.close()
+
+    def add_to_stdlib(self) -> "FileSink":
+        root = logging.getLogger()
+        root.addHandler(self.handler)
+        self._detach.append(lambda: root.removeHandler(self.handler))
+        self.start()
+        return self
+
+    def add_to_loguru(
+        self,
+        level: str | int = "DEBUG",
+        filter: str | FilterFunction | FilterDict | None = None,
+        **kwargs,
+    ) -> "FileSink":
+        from loguru import logger
+
+        sink_id = logger.add(
+            self.handler,
+            format=lambda _: "{message}",
+            backtrace=False,
+            level=level,
+            filter=filter,
+            **kwargs,
+        )
+        self._detach.append(lambda: logger.remove(sink_id))
+        self.start()
+        return self
 
 
-class DruidLog(RichLog):
-    file = False
-    console: Widget
-    handler: RichHandler
+def __getattr__(name: str):
+    # The Textual widget is only imported by code that actually shows logs.
+    if name == "DruidLog":
+        from druider.logview import DruidLog
 
-    def __init__(self, *args, **kwargs) -> None:
-        super().__init__(*args, **kwargs)
-        self.handler = RichHandler(
-            console=self,  # type: ignore
-            show_path=False,
-            rich_tracebacks=True,
-        )
+        return DruidLog
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-    def print(self, content):
-        self.write(content)
 
+def add_to_stdlib(**options) -> DruidLog:
+    from druider.logview import DruidLog
 
-def add_to_stdlib() -> DruidLog:
-    import logging
-
-    log = DruidLog()
+    log = DruidLog(**options)
     root = logging.getLogger()
-    root.addHandler(log.handler)
+    root.addHandler(log.queue_handler)
     return log
 
 
@@ -44,9 +152,11 @@ def add_to_loguru(
 ) -> DruidLog:
     from loguru import logger
 
+    from druider.logview import DruidLog
+
     log = DruidLog()
     logger.add(
-        log.handler,
+        log.queue_handler,
         format=lambda _: "{message}",
         backtrace=False,
         level=level,
@@ -54,347 +164,3 @@ def add_to_loguru(
         **kwargs,
     )
     return log
-
-
-def test():
-    import logging
-
-    from textual.app import App
-    from textual.containers import Vertical
-    from textual.widgets import Button, Label
-
-    class LoggingConsole(RichLog):
-        file = False
-        console: Widget
-
-    logger = logging.getLogger()
-    rich_log_handler = RichHandler(
-        console=LoggingConsole(),  # type: ignore
-        rich_tracebacks=True,
-    )
-    logger.addHandler(rich_log_handler)
-    logger.setLevel(logging.DEBUG)
-
-    logger = logging.getLogger()
-    rich_log_handler2 = RichHandler(
-        console=LoggingConsole(),  # type: ignore
-        rich_tracebacks=True,
-    )
-    logger.addHandler(rich_log_handler2)
-    logger.setLevel(logging.DEBUG)
-
-    class QuestionApp(App[str]):
-        DEFAULT_CSS = """
-        #buttons {
-            height: 20%;
-        }
-        Vertical {
-            border: round green 50%;
-        }
-        """
-
-        def compose(self) -> ComposeResult:
-            with Vertical(name="Buttons", id="buttons"):
-                yield Label("Do you love Textual?")
-                yield Button("Yes", id="yes", variant="primary")
-                yield Button("No", id="no", variant="error")
-            with Vertical():
-                with Vertical():
-                    yield rich_log_handler.console  # type: ignore
-                with Vertical():
-                    yield rich_log_handler2.console  # type: ignore
-                    # yield Placeholder()
-
-        def on_button_pressed(self, event: Button.Pressed) -> None:
-            logger.info("Button pressed")
-            logger.debug(event)
-            if event.button.id == "no":
-                try:
-                    assert "no" == "yes"
-                except AssertionError:
-                    logger.exception("Assertion error")
-
-    QuestionApp().run()
-
-
-def test2():
-    import logging
-
-    from textual.app import App
-    from textual.containers import Vertical
-    from textual.widgets import Button, Label
-
-    logger = logging.getLogger(__name__)
-
-    class LoggingConsole(RichLog):
-        file = False
-        console: Widget
-
-    class QuestionApp(App[str]):
-        DEFAULT_CSS = """
-        #buttons {
-            height: 20%;
-        }
-        Vertical {
-            border: round green 50%;
-        }
-        """
-
-        def __init__(self, *args, **kwargs):
-            super().__init__(*args, **kwargs)
-            self.consoles = []
-            logger = logging.getLogger()
-            for _ in range(2):
-                console = LoggingConsole()
-                logger.addHandler(
-                    RichHandler(
-                        console=console,  # type: ignore
-                        rich_tracebacks=True,
-                    )
-                )
-                logger.setLevel(logging.DEBUG)
-                self.consoles.append(console)
-
-        def compose(self) -> ComposeResult:
-            with Vertical(name="Buttons", id="buttons"):
-                yield Label("Do you love Textual?")
-                yield Button("Yes", id="yes", variant="primary")
-                yield Button("No", id="no", variant="error")
-            with Vertical():
-                for console in self.consoles:
-                    with Vertical():
-                        yield console
-
-        def on_button_pressed(self, event: Button.Pressed) -> None:
-            logger.info("Button pressed")
-            logger.debug(event)
-            if event.button.id == "no":
-                try:
-                    assert "no" == "yes"
-                except AssertionError:
-                    logger.exception("Assertion error")
-
-    QuestionApp().run()
-
-
-def test3():
-    from loguru import logger
-    from textual.app import App
-    from textual.containers import Vertical
-    from textual.widgets import Button, Label
-
-    logger.remove()
-
-    class LoggingConsole(RichLog):
-        file = False
-        console: Widget
-
-    class QuestionApp(App[str]):
-        DEFAULT_CSS = """
-        #buttons {
-            height: 15%;
-        }
-        Vertical {
-            border: round green 50%;
-        }
-        """
-
-        def __init__(self, *args, **kwargs):
-            super().__init__(*args, **kwargs)
-            self.consoles = []
-            for _ in range(2):
-                console = LoggingConsole()
-                logger.add(
-                    RichHandler(
-                        console=console,  # type: ignore
-                        rich_tracebacks=True,
-                    ),
-                    level="DEBUG",
-                    format=lambda _: "{message}",
-                    backtrace=False,
-                )
-                self.consoles.append(console)
-
-        def compose(self) -> ComposeResult:
-            with Vertical(name="Buttons", id="buttons"):
-                yield Label("Do you love Textual?")
-                yield Button("Yes", id="yes", variant="primary")
-                yield Button("No", id="no", variant="error")
-            with Vertical():
-                for console in self.consoles:
-                    with Vertical():
-                        yield console
-
-        def on_button_pressed(self, event: Button.Pressed) -> None:
-            logger.info("Button pressed")
-            logger.debug(event)
-            if event.button.id == "no":
-                try:
-                    assert "no" == "yes"
-                except AssertionError:
-                    logger.exception("Assertion error")
-
-    QuestionApp().run()
-
-
-def test4():
-    from enum import IntEnum, auto
-
-    from loguru import logger
-    from textual.app import App
-    from textual.containers import Vertical
-    from textual.widgets import Button, Label
-
-    EXTRA: str = "extra"
-    logger.remove()
-
-    def button_filter(record: Record, button: str):
-        return record.get(EXTRA, {}).get("button") == button
-
-    class Filters(IntEnum):
-        yes = 0
-        no = auto()
-
-        def log_filter(self, record: Record):
-            return button_filter(record=record, button=self.name)
-
-    class LoggingConsole(RichLog):
-        file = False
-        console: Widget
-
-    class QuestionApp(App[str]):
-        DEFAULT_CSS = """
-        #buttons {
-            height: 15%;
-        }
-        Vertical {
-            border: round green 50%;
-        }
-        """
-
-        def __init__(self, *args, **kwargs):
-            super().__init__(*args, **kwargs)
-            self.consoles = []
-            for filt in Filters:
-                console = LoggingConsole()
-                logger.add(
-                    RichHandler(
-                        console=console,  # type: ignore
-                        show_path=False,
-                        rich_tracebacks=True,
-                    ),
-                    level="DEBUG",
-                    format=lambda _: "{message}",
-                    backtrace=False,
-                    filter=filt.log_filter,
-                )
-                self.consoles.append(console)
-
-        def compose(self) -> ComposeResult:
-            with Vertical(name="Buttons", id="buttons"):
-                yield Label("Do you love Textual?")
-                yield Button("Yes", id="yes", variant="primary")
-                yield Button("No", id="no", variant="error")
-            with Vertical():
-                for console in self.consoles:
-                    with Vertical():
-                        yield console
-
-        def on_button_pressed(self, event: Button.Pressed) -> None:
-            logger.info("Button pressed")
-            with logger.contextualize(button=event.button.id):
-                logger.debug(event)
-                if event.button.id == "no":
-                    try:
-                        assert "no" == "yes"
-                    except AssertionError:
-                        logger.exception("Assertion error")
-
-    QuestionApp().run()
-
-
-def test5():
-    from enum import IntEnum, auto
-
-    from loguru import logger
-    from textual.app import App
-    from textual.containers import Vertical
-    from textual.widgets import Button, Label
-
-    EXTRA: str = "extra"
-    logger.remove()
-
-    def button_filter(record: Record, button: str):
-        return record.get(EXTRA, {}).get("button") == button
-
-    class Filters(IntEnum):
-        yes = 0
-        no = auto()
-
-        def log_filter(self, record: Record):
-            return button_filter(record=record, button=self.name)
-
-    class LoggingConsole(RichLog):
-        file = False
-        console: Widget
-
-    class NewDruidLog(LoggingConsole):
-        handler: RichHandler
-
-        def __init__(self, *args, **kwargs) -> None:
-            super().__init__(*args, **kwargs)
-            self.handler = RichHandler(
-                console=self,  # type: ignore
-                show_path=False,
-                rich_tracebacks=True,
-            )
-
-    class QuestionApp(App[str]):
-        DEFAULT_CSS = """
-        #buttons {
-            height: 15%;
-        }
-        Vertical {
-            border: round green 50%;
-        }
-        """
-
-        def __init__(self, *args, **kwargs):
-            super().__init__(*args, **kwargs)
-            self.consoles = []
-            for filt in Filters:
-                log = NewDruidLog()
-                logger.add(
-                    log.handler,
-                    level="DEBUG",
-                    format=lambda _: "{message}",
-                    backtrace=False,
-                    filter=filt.log_filter,
-                )
-                self.consoles.append(log)
-
-        def compose(self) -> ComposeResult:
-            with Vertical(name="Buttons", id="buttons"):
-                yield Label("Do you love Textual?")
-                yield Button("Yes", id="yes", variant="primary")
-                yield Button("No", id="no", variant="error")
-            with Vertical():
-                for console in self.consoles:
-                    with Vertical():
-                        yield console
-
-        def on_button_pressed(self, event: Button.Pressed) -> None:
-            logger.info("Button pressed")
-            with logger.contextualize(button=event.button.id):
-                logger.debug(event)
-                if event.button.id == "no":
-                    try:
-                        assert "no" == "yes"
-                    except AssertionError:
-                        logger.exception("Assertion error")
-
-    QuestionApp().run()
-
-
-if __name__ == "__main__":
-    test5()
@@ -0,0 +1,304 @@
+"""The Logs tab: a live view fed from a queue, or a pager over rotated log files."""
+
+import logging
+import os
+import queue
+import threading
+from array import array
+from bisect import bisect_right
+from logging.handlers import QueueHandler
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+from rich.console import RenderableType
+from rich.logging import RichHandler
+from rich.segment import Segment
+from textual import work
+from textual.binding import Binding
+from textual.geometry import Size
+from textual.message import Message
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+from textual.widget import Widget
+from textual.widgets import RichLog
+
+from druider.cache import LRUCache
+from druider.logging import (
+    BATCH,
+    MAX_LINES,
+    DeferredQueueHandler,
+    FileSink,
+    LevelSampler,
+)
+
+logger = logging.getLogger(__name__)
+
+PAGE = 1024
+CHUNK = 1024 * 1024
+
+
+class DruidLog(RichLog):
+    """A log view fed from a queue.
+
+    Records are queued by `queue_handler` on whichever thread logs them, then
+    rendered in batches by a listener thread and written on the UI thread;
+    `max_lines` bounds the scrollback.
+    """
+
+    file = False
+    console: Widget
+    handler: RichHandler
+    queue_handler: QueueHandler
+    showing: bool = False
+    closed: bool = False
+
+    class Rendered(Message):
+        def __init__(self, renderables: List[RenderableType]) -> None:
+            self.renderables = renderables
+            super().__init__()
+
+    def __init__(
+        self,
+        *args,
+        max_lines: int | None = MAX_LINES,
+        hidden_level: int = logging.INFO,
+        sample: int = 0,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, max_lines=max_lines, **kwargs)
+        self.handler = RichHandler(
+            console=self,  # type: ignore
+            show_path=False,
+            rich_tracebacks=True,
+        )
+        self.queue: queue.SimpleQueue[logging.LogRecord | None] = queue.SimpleQueue()
+        self.queue_handler = DeferredQueueHandler(self.queue)  # type: ignore
+        self.queue_handler.addFilter(LevelSampler(self, hidden_level, sample))
+        self._rendered: List[RenderableType] = []
+        self._listener: threading.Thread | None = None
+
+    def print(self, content):
+        # Called by `handler`, on the listener thread.
+        self._rendered.append(content)
+
+    def on_mount(self) -> None:
+        self._listener = threading.Thread(
+            target=self._listen, name="druider-log", daemon=True
+        )
+        self._listener.start()
+
+    def on_unmount(self) -> None:
+        self.closed = True
+        self.queue.put(None)
+
+    def on_show(self) -> None:
+        self.showing = True
+
+    def on_hide(self) -> None:
+        self.showing = False
+
+    def _listen(self) -> None:
+        while True:
+            record = self.queue.get()
+            count = 0
+            while record is not None:
+                self.handler.handle(record)
+                count += 1
+                if count >= BATCH:
+                    break
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if self._rendered:
+                rendered, self._rendered = self._rendered, []
+                self.post_message(self.Rendered(rendered))
+            if record is None:
+                return
+
+    def on_druid_log_rendered(self, event: Rendered) -> None:
+        for renderable in event.renderables:
+            self.write(renderable)
+
+
+class _Indexed(NamedTuple):
+    path: Path
+    inode: int
+    mtime: int
+    size: int
+    lines: int
+    pages: array
+
+
+def _scan(path: Path, start: int, lines: int, pages: array) -> Tuple[int, int]:
+    """Count lines from byte `start`, appending the offset of every PAGE-th line to `pages`.
+
+    Returns the new (size, lines); a trailing partial line is not counted yet.
+    """
+    with open(path, "rb") as file:
+        file.seek(start)
+        offset = start
+        while chunk := file.read(CHUNK):
+            count = chunk.count(b"\n")
+            if count < PAGE - lines % PAGE:
+                lines += count
+            else:
+                # A page boundary falls inside this chunk; walk it newline by newline.
+                position = 0
+                for _ in range(count):
+                    position = chunk.index(b"\n", position) + 1
+                    lines += 1
+                    if lines % PAGE == 0:
+                        pages.append(offset + position)
+            offset += len(chunk)
+    return offset, lines
+
+
+class LogPages:
+    """A sparse line index over a rotated set of log files.
+
+    Only the byte offset of every PAGE-th line is kept; a line is read by
+    seeking to its page and reading forward, and recently read pages are cached.
+    Files are tracked by inode, so renames on rotation keep their index; pages
+    are cached by inode, size and mtime, as a deleted backup's inode is reused.
+    """
+
+    sink: FileSink
+    files: List[_Indexed]
+    starts: List[int]
+
+    def __init__(self, sink: FileSink, cache_pages: int = 16) -> None:
+        self.sink = sink
+        self.files = []
+        self.starts = []
+        self.cache: LRUCache[Tuple[int, int, int, int, int], List[str]] = LRUCache(
+            cache_pages
+        )
+
+    def __len__(self) -> int:
+        return self.starts[-1] + self.files[-1].lines if self.files else 0
+
+    def scan(self) -> Tuple[List[_Indexed], List[int]] | None:
+        """The index of the files on disk, or None if it is unchanged; `update` swaps it in.
+
+        Scanning only reads the current index, so it can run on a worker
+        while lines are read on the UI thread.
+        """
+        known: Dict[int, _Indexed] = {entry.inode: entry for entry in self.files}
+        files = []
+        for path in self.sink.files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = known.get(stat.st_ino)
+            if entry is not None and entry.size == stat.st_size:
+                files.append(entry._replace(path=path))
+                continue
+            if entry is not None and entry.size < stat.st_size:
+                pages = array("Q", entry.pages)
+                size, lines = _scan(path, entry.size, entry.lines, pages)
+            else:
+                pages = array("Q", [0])
+                size, lines = _scan(path, 0, 0, pages)
+            files.append(
+                _Indexed(path, stat.st_ino, stat.st_mtime_ns, size, lines, pages)
+            )
+        if files == self.files:
+            return None
+        starts, total = [], 0
+        for entry in files:
+            starts.append(total)
+            total += entry.lines
+        return files, starts
+
+    def update(self, files: List[_Indexed], starts: List[int]) -> None:
+        self.files, self.starts = files, starts
+
+    def line(self, number: int) -> str:
+        if not 0 <= number < len(self):
+            return ""
+        position = bisect_right(self.starts, number) - 1
+        entry = self.files[position]
+        local = number - self.starts[position]
+        page = local // PAGE
+        available = min(PAGE, entry.lines - page * PAGE)
+        key = (entry.inode, entry.size, entry.mtime, page, available)
+        lines = self.cache.get(key, lambda _: self._read(entry, page, available))
+        return lines[local % PAGE] if local % PAGE < len(lines) else ""
+
+    def _read(self, entry: _Indexed, page: int, count: int) -> List[str]:
+        try:
+            with open(entry.path, "rb") as file:
+                file.seek(entry.pages[page])
+                return [
+                    file.readline().decode("utf-8", "replace").rstrip("\n")
+                    for _ in range(count)
+                ]
+        except OSError as err:
+            logger.debug("Could not read %s: %s", entry.path, err)
+            return []
+
+
+class LogPager(ScrollView, can_focus=True):
+    """The Logs tab when logging to files: pages lines in from disk as they scroll into view."""
+
+    BINDINGS = [
+        Binding("up", "scroll_up", "Scroll up", show=False),
+        Binding("down", "scroll_down", "Scroll down", show=False),
+        Binding("pageup", "page_up", "Page up", show=False),
+        Binding("pagedown", "page_down", "Page down", show=False),
+        Binding("home", "scroll_home", "First line", show=False),
+        Binding("end", "scroll_end", "Last line", show=False),
+    ]
+    DEFAULT_CSS = """
+    LogPager {
+        background: $surface;
+        color: $foreground;
+    }
+    """
+
+    pages: LogPages
+    width: int = 240
+    poll_interval: float = 1.0
+    showing: bool = False
+
+    def __init__(self, sink: FileSink, *args, **kwargs) -> None:
+        self.pages = LogPages(sink)
+        super().__init__(*args, **kwargs)
+
+    def on_mount(self) -> None:
+        self.set_interval(self.poll_interval, self.poll)
+
+    def on_show(self) -> None:
+        self.showing = True
+        self.reindex()
+
+    def on_hide(self) -> None:
+        self.showing = False
+
+    def poll(self) -> None:
+        if self.showing:
+            self.reindex()
+
+    @work(thread=True, exclusive=True, group="log-index")
+    def reindex(self) -> None:
+        found = self.pages.scan()
+        if found is not None:
+            # Swapped in on the UI thread, between the lines it renders.
+            self.app.call_from_thread(self.resize, *found)
+
+    def resize(self, files: List[_Indexed], starts: List[int]) -> None:
+        self.pages.update(files, starts)
+        following = self.scroll_y >= self.max_scroll_y
+        self.virtual_size = Size(self.width, len(self.pages))
+        if following:
+            self.scroll_end(animate=False)
+        self.refresh()
+
+    def render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        width = self.scrollable_content_region.width
+        text = self.pages.line(scroll_y + y).expandtabs()
+        strip = Strip([Segment(text, self.rich_style)])
+        return strip.crop_extend(scroll_x, scroll_x + width, self.rich_style)
@@ -1,11 +1,181 @@
+import argparse
 import logging
+import sys
+import time
 from pathlib import Path
 
-from druider.app import DruidHelper
-from druider.data import load_data
 
+def parse_args(argv=None) -> argparse.Namespace:
+    from druider.encounters import add_arguments as add_encounter_arguments
+    from druider.query import add_arguments as add_query_arguments
+    from druider.serve import add_arguments as add_serve_arguments
+    from druider.serve import add_prepare_arguments
+    from druider.sources import add_arguments as add_source_arguments
+
+    parser = argparse.ArgumentParser(prog="druider")
+    commands = parser.add_subparsers(
+        dest="command", metavar="{query,serve,prepare,encounter}"
+    )
+    query = commands.add_parser(
+        "query",
+        help="print matching creatures without starting the TUI",
+        description="Filter, search and sort the bestiary, streaming rows to stdout.",
+    )
+    add_query_arguments(query)
+    serve = commands.add_parser(
+        "serve",
+        help="serve the TUI to web browsers",
+        description="Prepare the dataset once, then serve one TUI session per browser connection.",
+    )
+    add_serve_arguments(serve)
+    prepare = commands.add_parser(
+        "prepare",
+        help="build the snapshot and indexes that --shared sessions open",
+        description="Build the data snapshot and every index sidecar once, before sessions started with "
+        "--shared (e.g. by textual serve with serve.toml) attach to them.",
+    )
+    add_prepare_arguments(prepare)
+    encounter = commands.add_parser(
+        "encounter",
+        help="suggest encounters that fit a party's XP budget",
+        description="Combine creatures, in the group sizes their organization allows, into encounters worth "
+        "the XP budget of a party level and difficulty.",
+    )
+    add_encounter_arguments(encounter)
+    parser.add_argument(
+        "--rebuild-cache",
+        action="store_true",
+        help="ignore any existing data snapshot and rebuild it from the CSV",
+    )
+    add_source_arguments(parser)
+    parser.add_argument(
+        "--table",
+        action="store_true",
+        help="show the listing as a DataTable holding every row shown, rather than rendering only "
+        "the rows on screen",
+    )
+    parser.add_argument(
+        "--shared",
+        action="store_true",
+        help="run as one of many sessions over a prepared dataset; implies --no-watch and ignores --table",
+    )
+    parser.add_argument(
+        "--metrics",
+        type=Path,
+        metavar="FILE",
+        help="time event handlers, loading, filtering, sorting and rendering; show a Metrics tab "
+        "and write the histograms to FILE as JSON on exit",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="exit once the app is interactive and print how long each startup stage took",
+    )
+    parser.add_argument(
+        "--no-watch",
+        action="store_true",
+        help="do not reload data.csv when it changes on disk",
+    )
+    parser.add_argument(
+        "--detail-cache-size",
+        type=int,
+        default=256,
+        help="number of rendered detail trees to keep (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=2,
+        help="rows above and below the cursor to pre-render (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--log-lines",
+        type=int,
+        default=5000,
+        help="lines of history kept in the Logs tab (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--log-file",
+        type=Path,
+        help="also write logs to this file, rotating it by size; the Logs tab then pages from disk",
+    )
+    parser.add_argument(
+        "--log-file-size",
+        type=int,
+        default=5,
+        help="rotate the log file after this many MiB (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--log-backups",
+        type=int,
+        default=5,
+        help="rotated log files to keep (default: %(default)s)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    started = time.perf_counter()
+    args = parse_args(argv)
+    # Parsing imports the subcommands' argument modules; the TUI's own imports are timed apart.
+    parsed = time.perf_counter()
+    if args.command == "query":
+        from druider.query import run
+
+        return run(args)
+    if args.command == "serve":
+        from druider.serve import run
+
+        return run(args)
+    if args.command == "prepare":
+        from druider.serve import run_prepare
+
+        return run_prepare(args)
+    if args.command == "encounter":
+        from druider.encounters import run
+
+        return run(args)
+
+    # The TUI stack is only imported when it is actually started.
+    from druider.app import DruidHelper, startup_report
+    from druider.logging import FileSink
+    from druider.sources import source_files
+
+    imported = time.perf_counter()
+    if args.metrics is not None:
+        from druider.metrics import enable
+
+        metrics = enable()
 
-def main():
     root = logging.getLogger()
     root.setLevel(1)
-    DruidHelper(load_data(Path.cwd() / "data.csv")).run()
+    sink = None
+    if args.log_file is not None:
+        sink = FileSink(
+            args.log_file,
+            max_bytes=args.log_file_size * 1024 * 1024,
+            backups=args.log_backups,
+        )
+    files = source_files(args)
+    app = DruidHelper(
+        files[0] if len(files) == 1 else files,
+        rebuild=args.rebuild_cache,
+        precedence=args.precedence,
+        virtual=args.shared or not args.table,
+        backend=args.backend,
+        detail_cache_size=args.detail_cache_size,
+        prefetch=args.prefetch,
+        log_lines=args.log_lines,
+        log_sink=sink,
+        started=started,
+        watch_source=not (args.no_watch or args.shared),
+        profile_startup=args.profile_startup,
+        metrics=args.metrics is not None,
+    )
+    app.timings["arguments parsed"] = parsed - started
+    app.timings["app imported"] = imported - started
+    app.run()
+    if args.profile_startup:
+        print(startup_report(app.timings), file=sys.stderr)
+    if args.metrics is not None:
+        metrics.export(args.metrics)
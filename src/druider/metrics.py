@@ -0,0 +1,145 @@
+"""Latency histograms for the hot paths, cheap enough to leave in place when switched off."""
+
+import functools
+import json
+import math
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, TypeVar
+
+T = TypeVar("T", bound=Callable)
+
+# Bucket edges grow by 2^(1/8), about 9%, which bounds the error of a percentile.
+_BASE = 2 ** (1 / 8)
+_LOG_BASE = math.log(_BASE)
+_FLOOR = 1e-7
+_NULL = nullcontext()
+
+
+class Summary(NamedTuple):
+    name: str
+    count: int
+    total: float
+    p50: float
+    p95: float
+    max: float
+
+
+class Histogram:
+    """Counts of durations in log-spaced buckets, plus their exact total and maximum."""
+
+    def __init__(self) -> None:
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        bucket = math.floor(math.log(max(seconds, _FLOOR)) / _LOG_BASE)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """Upper edge of the bucket holding the `q` quantile (capped at the maximum)."""
+        rank, seen = q * self.count, 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(_BASE ** (bucket + 1), self.max)
+        return self.max
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics: "Metrics", name: str) -> None:
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self.metrics.record(self.name, time.perf_counter() - self.started)
+
+
+class Metrics:
+    """Named latency histograms, safe to record into from any thread."""
+
+    enabled: bool = False
+
+    def __init__(self) -> None:
+        self.histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def timer(self, name: str):
+        """Context manager recording the time spent in its block under `name`."""
+        return _Timer(self, name) if self.enabled else _NULL
+
+    def summaries(self) -> List[Summary]:
+        with self._lock:
+            return [
+                Summary(
+                    name, h.count, h.total, h.quantile(0.5), h.quantile(0.95), h.max
+                )
+                for name, h in sorted(self.histograms.items())
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+
+    def export(self, path: Path) -> None:
+        """Write every summary to `path` as JSON, durations in milliseconds."""
+        rows = []
+        for summary in self.summaries():
+            row = summary._asdict()
+            for key in ("total", "p50", "p95", "max"):
+                row[key] = round(row[key] * 1000, 4)
+            rows.append(row)
+        created = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        path.write_text(
+            json.dumps({"created": created, "unit": "ms", "metrics": rows}, indent=1)
+            + "\n"
+        )
+
+
+METRICS = Metrics()
+
+
+def enable() -> Metrics:
+    METRICS.enabled = True
+    return METRICS
+
+
+def timed(name: str) -> Callable[[T], T]:
+    """Record each call of the decorated function under `name`; a flag check when metrics are off."""
+
+    def decorate(function: T) -> T:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                METRICS.record(name, time.perf_counter() - started)
+
+        return wrapper  # type: ignore
+
+    return decorate
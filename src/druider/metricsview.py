@@ -0,0 +1,59 @@
+"""The Metrics tab: latency of each instrumented path."""
+
+import logging
+
+from rich.table import Table
+from textual.widgets import Static
+
+from druider.metrics import METRICS, Metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.2f}"
+
+
+class MetricsView(Static):
+    """A table of counts and p50/p95/max latencies, refreshed while it is on screen."""
+
+    metrics: Metrics
+    poll_interval: float = 1.0
+    showing: bool = False
+
+    def __init__(self, *args, metrics: Metrics = METRICS, **kwargs) -> None:
+        self.metrics = metrics
+        super().__init__("No timings recorded yet", *args, **kwargs)
+
+    def on_mount(self) -> None:
+        self.set_interval(self.poll_interval, self.poll)
+
+    def on_show(self) -> None:
+        self.showing = True
+        self.update_table()
+
+    def on_hide(self) -> None:
+        self.showing = False
+
+    def poll(self) -> None:
+        if self.showing:
+            self.update_table()
+
+    def update_table(self) -> None:
+        summaries = self.metrics.summaries()
+        if not summaries:
+            return
+        table = Table(expand=True, box=None)
+        table.add_column("Path")
+        for title in ("Count", "p50 ms", "p95 ms", "Max ms", "Total ms"):
+            table.add_column(title, justify="right")
+        for summary in summaries:
+            table.add_row(
+                summary.name,
+                str(summary.count),
+                _ms(summary.p50),
+                _ms(summary.p95),
+                _ms(summary.max),
+                _ms(summary.total),
+            )
+        self.update(table)
@@ -0,0 +1,363 @@
+"""Structured records for the composite stat-block fields (attacks, HD, speeds, skills, feats)."""
+
+import logging
+import operator
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import chain
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+from druider import bitmap
+from druider.cache import LRUCache
+from druider.data import Column, DataType
+from druider.snapshot import SnapshotWriter
+
+logger = logging.getLogger(__name__)
+
+PARSED: Tuple[Column, ...] = (
+    Column.melee,
+    Column.ranged,
+    Column.hd,
+    Column.speed,
+    Column.skills,
+    Column.feats,
+)
+SPEEDS = ("land", "burrow", "climb", "fly", "swim")
+# Below this many rows, starting worker processes costs more than it saves.
+PARALLEL_MIN = 20_000
+CHUNK = 2_000
+
+
+class Attack(NamedTuple):
+    count: int
+    name: str
+    bonuses: Tuple[int, ...]
+    damage: str
+    crit_range: int = 20
+    crit_multiplier: int = 2
+    extra: str = ""
+
+
+class Dice(NamedTuple):
+    count: int
+    sides: int
+    modifier: int = 0
+
+
+class Parsed(NamedTuple):
+    melee: Tuple[Tuple[Attack, ...], ...]
+    ranged: Tuple[Tuple[Attack, ...], ...]
+    hd: Tuple[Dice, ...]
+    speeds: Dict[str, int]
+    skills: Dict[str, int]
+    feats: Tuple[str, ...]
+
+
+_ATTACK = re.compile(
+    r"^(?:(?P<count>\d+)\s+)?(?P<name>.+?)"
+    r"(?:\s+(?P<bonuses>[+-]\d+(?:/[+-]\d+)*)(?:\s+touch)?)?"
+    r"\s*(?:\((?P<detail>.*)\))?$"
+)
+# A modifier is only one if no further dice follow it: "5d10+1d8+5" is 5d10 and 1d8+5.
+_DICE = re.compile(r"(\d+)d(\d+)(?:\s*([+-]\s*\d+)(?![\dd]))?")
+_CRIT_RANGE = re.compile(r"/(\d+)-20\b")
+_CRIT_MULTIPLIER = re.compile(r"/[x×](\d+)")
+_SPEED = re.compile(r"^(?:(?P<mode>[a-z]+)\s+)?(?P<feet>\d+)\s*ft", re.IGNORECASE)
+_SKILL = re.compile(r"^(?P<name>.+?)\s+(?P<bonus>[+-]\d+)")
+
+
+def split_top(text: str, separators: str = ",;") -> List[str]:
+    """Split on `separators` outside parentheses and brackets, dropping empty parts."""
+    parts, depth, start = [], 0, 0
+    for position, char in enumerate(text):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth = max(depth - 1, 0)
+        elif char in separators and not depth:
+            parts.append(text[start:position])
+            start = position + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _empty(text: str) -> bool:
+    return not text or text == "NULL"
+
+
+def parse_attack(text: str) -> Attack | None:
+    match = _ATTACK.match(text.strip())
+    if match is None:
+        return None
+    bonuses = (
+        tuple(int(bonus) for bonus in match["bonuses"].split("/"))
+        if match["bonuses"]
+        else ()
+    )
+    detail = match["detail"] or ""
+    effect, _, extra = detail.partition(" plus ")
+    dice = _DICE.search(effect)
+    crit_range = _CRIT_RANGE.search(effect)
+    crit_multiplier = _CRIT_MULTIPLIER.search(effect)
+    return Attack(
+        count=int(match["count"] or 1),
+        name=match["name"].strip(),
+        bonuses=bonuses,
+        damage=dice[0].replace(" ", "") if dice else "",
+        crit_range=int(crit_range[1]) if crit_range else 20,
+        crit_multiplier=int(crit_multiplier[1]) if crit_multiplier else 2,
+        extra=extra.strip() if dice else detail.strip(),
+    )
+
+
+def parse_attacks(text: str) -> Tuple[Tuple[Attack, ...], ...]:
+    """Full-attack alternatives ("... or ..."), each a tuple of attacks."""
+    if _empty(text):
+        return ()
+    options = []
+    for option in re.split(r"\s+or\s+(?![^(]*\))", text):
+        attacks = (parse_attack(part) for part in split_top(option, ","))
+        options.append(tuple(attack for attack in attacks if attack is not None))
+    return tuple(option for option in options if option)
+
+
+def parse_hd(text: str) -> Tuple[Dice, ...]:
+    """Each group of hit dice, e.g. "20d10+5d12+375" gives 20d10 and 5d12+375.
+
+    A count of racial and class levels may come first, as in "6 HD; 5d10+1d8+5".
+    """
+    if _empty(text):
+        return ()
+    dice = []
+    for count, sides, modifier in _DICE.findall(text):
+        dice.append(Dice(int(count), int(sides), int(modifier.replace(" ", "") or 0)))
+    return tuple(dice)
+
+
+def parse_speeds(text: str) -> Dict[str, int]:
+    """Feet per movement mode; the unlabelled first speed is "land"."""
+    speeds: Dict[str, int] = {}
+    if _empty(text):
+        return speeds
+    for part in split_top(text, ",;"):
+        match = _SPEED.match(part)
+        if match is not None:
+            mode = (match["mode"] or "land").casefold()
+            speeds.setdefault(mode, int(match["feet"]))
+    return speeds
+
+
+def parse_skills(text: str) -> Dict[str, int]:
+    """Unconditional bonus per casefolded skill name; "(+24 in water)" riders are dropped."""
+    skills: Dict[str, int] = {}
+    if _empty(text):
+        return skills
+    for part in split_top(text, ",;"):
+        match = _SKILL.match(part)
+        if match is not None:
+            skills[" ".join(match["name"].split()).casefold()] = int(match["bonus"])
+    return skills
+
+
+def parse_feats(text: str) -> Tuple[str, ...]:
+    if _empty(text):
+        return ()
+    return tuple(split_top(text, ","))
+
+
+def parse_row(
+    melee: str, ranged: str, hd: str, speed: str, skills: str, feats: str
+) -> Parsed:
+    return Parsed(
+        melee=parse_attacks(melee),
+        ranged=parse_attacks(ranged),
+        hd=parse_hd(hd),
+        speeds=parse_speeds(speed),
+        skills=parse_skills(skills),
+        feats=parse_feats(feats),
+    )
+
+
+def parse_rows(rows: Iterable[Sequence[str]]) -> List[Parsed]:
+    return [parse_row(*row) for row in rows]
+
+
+def _measures(parsed: Parsed) -> Iterable[Tuple[str, float]]:
+    for mode, feet in parsed.speeds.items():
+        yield f"speed.{mode}", feet
+    for skill, bonus in parsed.skills.items():
+        yield f"skill.{skill}", bonus
+    if parsed.hd:
+        yield "hd", sum(dice.count for dice in parsed.hd)
+    for field in ("melee", "ranged"):
+        options = getattr(parsed, field)
+        bonuses = [
+            attack.bonuses[0]
+            for option in options
+            for attack in option
+            if attack.bonuses
+        ]
+        if bonuses:
+            yield f"{field}.bonus", max(bonuses)
+            yield f"{field}.attacks", max(
+                sum(attack.count for attack in option) for option in options
+            )
+
+
+class ParsedFields(Sequence):
+    """Parsed records for every row, plus sorted value/row arrays for range queries.
+
+    A measure such as ``speed.swim`` or ``skill.stealth`` is stored as its
+    values in ascending order alongside the rows they belong to, so a bound
+    is two bisections and a bitmap build.
+    """
+
+    length: int
+    records: Sequence[Parsed]
+    measures: Dict[str, Tuple[Sequence[float], Sequence[int]]]
+    overlay: Dict[int, Parsed] = {}
+    stale: int = 0
+
+    def __init__(
+        self,
+        records: Sequence[Parsed],
+        measures: Dict[str, Tuple[Sequence[float], Sequence[int]]],
+    ) -> None:
+        self.length = len(records)
+        self.records = records
+        self.measures = measures
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index):
+        if index in self.overlay:
+            return self.overlay[index]
+        return self.records[index]
+
+    def patched(self, data: DataType) -> "ParsedFields":
+        """These fields with the rows `data` patched or removed since they were built re-parsed."""
+        fields = ParsedFields(self.records, self.measures)
+        fields.length = len(data)
+        fields.overlay = {
+            index: parse_row(*(entry[column] for column in PARSED))
+            for index, entry in data.patched.items()
+            if index not in data.removed
+        }
+        fields.stale = bitmap.from_indices([*data.patched, *data.removed], len(data))
+        return fields
+
+    @classmethod
+    def build(cls, data: DataType, workers: int | None = None) -> "ParsedFields":
+        """Parse every row, across `workers` processes (one per CPU if None) for large data."""
+        columns = [data.column(column) for column in PARSED]
+        rows = list(zip(*columns))
+        workers = workers or os.cpu_count() or 1
+        if len(rows) < PARALLEL_MIN or workers == 1:
+            records = parse_rows(rows)
+        else:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            records = []
+            bounds = range(0, len(rows) + CHUNK, CHUNK)
+            chunks = [rows[start:stop] for start, stop in zip(bounds, bounds[1:])]
+            # Spawn rather than fork: this runs on a worker thread of a live app.
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(workers, mp_context=context) as pool:
+                for chunk in pool.map(parse_rows, chunks):
+                    records.extend(chunk)
+        logger.info(f"Parsed stat-block fields for {len(records)} rows")
+        entries: Dict[str, List[Tuple[float, int]]] = {}
+        for index, record in enumerate(records):
+            for name, value in _measures(record):
+                entries.setdefault(name, []).append((value, index))
+        measures = {}
+        for name, pairs in entries.items():
+            pairs.sort()
+            measures[name] = (
+                array("d", (value for value, _ in pairs)),
+                array("I", (row for _, row in pairs)),
+            )
+        return cls(records, measures)
+
+    @classmethod
+    def load(cls, data: DataType) -> "ParsedFields":
+        """The measures from their memory-mapped sidecar; records are parsed and memoized as rows are read."""
+        snapshot = data.mapped("parsed", lambda data: cls.build(data).writer())
+        measures = {
+            name: (snapshot.section(f"{name}.values"), snapshot.section(f"{name}.rows"))
+            for name in snapshot.meta["measures"]
+        }
+        return cls(_Reparsed(data), measures)
+
+    def writer(self) -> SnapshotWriter:
+        writer = SnapshotWriter(measures=list(self.measures))
+        for name, (values, rows) in self.measures.items():
+            writer.add(f"{name}.values", array("d", values))
+            writer.add(f"{name}.rows", array("I", rows))
+        return writer
+
+    def names(self) -> List[str]:
+        return sorted(self.measures)
+
+    def select(self, name: str, op: str, value: float) -> int:
+        """Bitmap of rows whose measure `name` compares `op` to `value`; rows without it never match."""
+        values, rows = self.measures.get(name, (array("d"), array("I")))
+        low, high = bisect_left(values, value), bisect_right(values, value)
+        if op == "=":
+            selected = rows[low:high]
+        elif op == "!=":
+            selected = chain(rows[:low], rows[high:])
+        elif op == "<":
+            selected = rows[:low]
+        elif op == "<=":
+            selected = rows[:high]
+        elif op == ">":
+            selected = rows[high:]
+        elif op == ">=":
+            selected = rows[low:]
+        else:
+            raise ValueError(f"Unsupported comparison {op!r}")
+        bits = bitmap.from_indices(selected, self.length)
+        if self.stale:
+            bits &= ~self.stale
+            compare = _COMPARISONS[op]
+            for index, record in self.overlay.items():
+                if any(
+                    measure == name and compare(found, value)
+                    for measure, found in _measures(record)
+                ):
+                    bits |= 1 << index
+        return bits
+
+
+class _Reparsed(Sequence):
+    """Records parsed from the rows of `data` on first access, for fields loaded without them."""
+
+    def __init__(self, data: DataType, cache_size: int = 1024) -> None:
+        self.data = data
+        self.cache: LRUCache[int, Parsed] = LRUCache(cache_size)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(len(self))))
+        return self.cache.get(index, self.parse)
+
+    def parse(self, index: int) -> Parsed:
+        return parse_row(*(self.data.cell(index, column) for column in PARSED))
+
+
+_COMPARISONS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
@@ -0,0 +1,252 @@
+"""Headless queries over the bestiary: filter, search and sort without the TUI."""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Sequence, TextIO
+
+from druider.data import Column, DataType, Kind
+from druider.sorting import SortKey
+from druider.sources import add_arguments as add_source_arguments
+from druider.sources import load_sources, source_files
+
+if TYPE_CHECKING:
+    from druider.database import Rows
+    from druider.facets import Term
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("table", "csv", "jsonl")
+DEFAULT_COLUMNS: Sequence[Column] = (
+    Column.size,
+    Column._name,
+    Column.cr,
+    Column.xp,
+    Column.hp,
+    Column.ac,
+    Column.base_speed,
+)
+_WIDTHS = {Kind.text: 24, Kind.number: 8, Kind.category: 12}
+
+
+def column(name: str) -> Column:
+    """Look a column up by key (``name``, ``_name``) or title (``Base Speed``)."""
+    key = name.strip().casefold().replace(" ", "_")
+    for candidate in Column:
+        if key in (candidate.key, candidate.key.lstrip("_")):
+            return candidate
+    raise argparse.ArgumentTypeError(f"Unknown column {name!r}")
+
+
+def columns(text: str) -> List[Column]:
+    return [column(name) for name in text.split(",") if name.strip()]
+
+
+def sort_keys(text: str) -> List[SortKey]:
+    """``name,-cr`` sorts by name, then by CR descending."""
+    keys = []
+    for name in text.split(","):
+        name = name.strip()
+        if name:
+            keys.append((column(name.lstrip("-")), name.startswith("-")))
+    return keys
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "filter",
+        nargs="?",
+        default="",
+        help="filter expression, e.g. 'type=animal, cr<=6'",
+    )
+    parser.add_argument("-s", "--search", default="", help="full-text search terms")
+    parser.add_argument(
+        "-o",
+        "--sort",
+        type=sort_keys,
+        default=[],
+        help="sort keys, '-' for descending, e.g. --sort=size,-cr",
+    )
+    parser.add_argument(
+        "-c",
+        "--columns",
+        type=columns,
+        default=list(DEFAULT_COLUMNS),
+        help="columns to print",
+    )
+    parser.add_argument(
+        "-f", "--format", choices=FORMATS, default="table", help="output format"
+    )
+    parser.add_argument("-n", "--limit", type=int, help="stop after this many rows")
+    parser.add_argument(
+        "--level",
+        type=int,
+        help="only creatures a druid of this level can wild shape into",
+    )
+    add_source_arguments(parser)
+
+
+def _uses_measures(term: "Term | None") -> bool:
+    from druider.facets import And, Measure, Not, Or
+
+    if isinstance(term, Measure):
+        return True
+    if isinstance(term, (And, Or)):
+        return any(_uses_measures(part) for part in term.terms)
+    if isinstance(term, Not):
+        return _uses_measures(term.term)
+    return False
+
+
+def select(
+    data: DataType,
+    expression: str = "",
+    search: str = "",
+    sort: Sequence[SortKey] = (),
+    level: int | None = None,
+) -> List[int]:
+    """Row indices matching `expression`, `search` and wild shape `level`, in `sort` order.
+
+    Indexes, and the modules behind them, are only loaded for the parts of
+    the query that need them.
+    """
+    from druider import bitmap
+    from druider.facets import FacetIndex, parse
+
+    term = parse(expression)
+    rows = None
+    if term is not None or level is not None:
+        facets = FacetIndex.load(data)
+        if _uses_measures(term):
+            from druider.parsing import ParsedFields
+
+            facets.fields = ParsedFields.load(data)
+        bits = facets.resolve(term)
+        if level is not None:
+            from druider.wildshape import WildShapeIndex
+
+            bits &= WildShapeIndex.build(facets).rows(level)
+        rows = bitmap.members(bits)
+    if search:
+        from druider.search import SearchIndex
+
+        found = SearchIndex.load(data).search(search)
+        if found is not None:
+            rows = (
+                sorted(found) if rows is None else [row for row in rows if row in found]
+            )
+    if sort:
+        from druider.sorting import SortEngine
+
+        return SortEngine.load(data).order(sort, rows)
+    return list(range(len(data))) if rows is None else rows
+
+
+def select_database(
+    data: DataType,
+    expression: str = "",
+    search: str = "",
+    sort: Sequence[SortKey] = (),
+    level: int | None = None,
+    limit: int | None = None,
+) -> "Rows":
+    """Like `select`, but filtered, sorted and limited by the SQLite backend and paged from a cursor."""
+    from druider.database import Database
+    from druider.facets import And, parse
+    from druider.wildshape import level_term
+
+    term = parse(expression)
+    database = Database.load(data)
+    if _uses_measures(term):
+        from druider.parsing import ParsedFields
+
+        database.fields = ParsedFields.load(data)
+    if level is not None:
+        term = level_term(level) if term is None else And((term, level_term(level)))
+    return database.select(term, search, sort, limit)
+
+
+def write_csv(
+    out: TextIO, header: Sequence[str], rows: Iterable[Sequence[str]]
+) -> None:
+    writer = csv.writer(out)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+
+
+def write_jsonl(
+    out: TextIO, header: Sequence[str], rows: Iterable[Sequence[str]]
+) -> None:
+    for row in rows:
+        out.write(json.dumps(dict(zip(header, row)), ensure_ascii=False))
+        out.write("\n")
+
+
+def write_table(
+    out: TextIO,
+    header: Sequence[str],
+    rows: Iterable[Sequence[str]],
+    widths: Sequence[int],
+) -> None:
+    def line(values: Sequence[str]) -> str:
+        cells = []
+        for value, width in zip(values, widths):
+            if len(value) > width:
+                value = value[: width - 1] + "…"
+            cells.append(f"{value:<{width}}")
+        return "  ".join(cells).rstrip() + "\n"
+
+    out.write(line(header))
+    out.write(line(["-" * width for width in widths]))
+    for row in rows:
+        out.write(line(row))
+
+
+def _cells(
+    data: DataType, rows: Iterable[int], wanted: Sequence[Column]
+) -> Iterator[List[str]]:
+    for index in rows:
+        yield [data.cell(index, column) for column in wanted]
+
+
+def run(args: argparse.Namespace, out: TextIO | None = None) -> int:
+    out = sys.stdout if out is None else out
+    try:
+        data = load_sources(source_files(args), args.precedence)
+        if args.backend == "sqlite":
+            found = select_database(
+                data, args.filter, args.search, args.sort, args.level, args.limit
+            )
+            cells = found.cells(args.columns)
+        else:
+            rows = select(data, args.filter, args.search, args.sort, args.level)
+            if args.limit is not None:
+                rows = rows[: args.limit]
+            cells = _cells(data, rows, args.columns)
+    except (OSError, ValueError) as err:
+        print(f"druider query: {err}", file=sys.stderr)
+        return 2
+    if args.format == "table":
+        header = [column.title for column in args.columns]
+        widths = [
+            max(len(title), _WIDTHS[column.kind])
+            for title, column in zip(header, args.columns)
+        ]
+    else:
+        header = [column.key.lstrip("_") for column in args.columns]
+    try:
+        if args.format == "csv":
+            write_csv(out, header, cells)
+        elif args.format == "jsonl":
+            write_jsonl(out, header, cells)
+        else:
+            write_table(out, header, cells, widths)
+        out.flush()
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`); silence the flush at exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    return 0
@@ -0,0 +1,119 @@
+"""Apply edits to the data file to an already loaded store and its indexes."""
+
+import logging
+from typing import Dict, Hashable, List, NamedTuple, Set, Tuple
+
+from druider.data import DataType, EntryType, identity
+from druider.facets import FacetIndex
+from druider.links import LinkIndex
+from druider.search import SearchIndex
+from druider.sorting import SortEngine
+from druider.wildshape import WildShapeIndex
+
+logger = logging.getLogger(__name__)
+
+
+class Changes(NamedTuple):
+    changed: Dict[int, EntryType]
+    inserted: Dict[int, EntryType]
+    removed: Set[int]
+
+    def __bool__(self) -> bool:
+        return bool(self.changed or self.inserted or self.removed)
+
+    @property
+    def rows(self) -> Set[int]:
+        """Every row index touched."""
+        return {*self.changed, *self.inserted, *self.removed}
+
+
+class Patched(NamedTuple):
+    data: DataType
+    index: SearchIndex
+    facets: FacetIndex
+    sorter: SortEngine
+    wildshape: WildShapeIndex
+    links: LinkIndex
+
+
+class Reloader:
+    """Diffs new contents of the data file against the loaded rows by id.
+
+    Indexes are patched from the ones built at load time with every change
+    since, so each reload's index work scales with the edited rows, not the file.
+    """
+
+    data: DataType
+
+    def __init__(
+        self,
+        data: DataType,
+        index: SearchIndex,
+        facets: FacetIndex,
+        sorter: SortEngine,
+        links: LinkIndex,
+    ) -> None:
+        self.data = data
+        self.index = index
+        self.facets = facets
+        self.sorter = sorter
+        self.links = links
+        self._known: Dict[Hashable, Tuple[int, int]] | None = None
+
+    def known(self) -> Dict[Hashable, Tuple[int, int]]:
+        """Row index and content hash per identity, computed on first use."""
+        if self._known is None:
+            known = {}
+            for index in range(len(self.data)):
+                if index not in self.data.removed:
+                    row = self.data[index]
+                    known.setdefault(identity(row), (index, hash(row)))
+            self._known = known
+        return self._known
+
+    def diff(self, rows: List[EntryType]) -> Changes:
+        known = self.known()
+        changes = Changes({}, {}, set())
+        seen = set()
+        end = len(self.data)
+        for row in rows:
+            key = identity(row)
+            if key in seen:
+                continue
+            seen.add(key)
+            if key not in known:
+                changes.inserted[end + len(changes.inserted)] = row
+                continue
+            index, digest = known[key]
+            if hash(row) != digest:
+                changes.changed[index] = row
+        changes.removed.update(
+            index for key, (index, _) in known.items() if key not in seen
+        )
+        return changes
+
+    def apply(self, changes: Changes) -> Patched:
+        data = self.data.patch({**changes.changed, **changes.inserted}, changes.removed)
+        known = self.known()
+        for index, row in (*changes.changed.items(), *changes.inserted.items()):
+            known[identity(row)] = (index, hash(row))
+        for key in [
+            key for key, (index, _) in known.items() if index in changes.removed
+        ]:
+            del known[key]
+        self.data = data
+        facets = self.facets.patched(data)
+        # Links are patched from the last reload's, with this one's changes only.
+        self.links = self.links.patched(data, changes)
+        logger.info(
+            f"Reloaded {len(changes.changed)} changed, {len(changes.inserted)} inserted"
+            f" and {len(changes.removed)} removed rows"
+        )
+        return Patched(
+            data,
+            self.index.patched(data),
+            facets,
+            self.sorter.patched(data),
+            WildShapeIndex.build(facets),
+            self.links,
+        )
@@ -0,0 +1,137 @@
+import logging
+import re
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Sequence, Set, Tuple
+
+from druider.data import Column, DataType
+from druider.metrics import timed
+from druider.snapshot import SnapshotWriter
+
+logger = logging.getLogger(__name__)
+
+SEARCHABLE: Tuple[Column, ...] = (
+    Column._name,
+    Column.feats,
+    Column.skills,
+    Column.sq,
+    Column.languages,
+    Column.environment,
+    Column.organization,
+)
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD.findall(text.casefold())
+
+
+class SearchIndex:
+    """Inverted index from words to the rows containing them.
+
+    Tokens are kept sorted and their postings stored back to back, so every
+    token sharing a prefix owns one contiguous slice of `postings`.
+    """
+
+    tokens: Sequence[str]
+    offsets: Sequence[int]
+    postings: Sequence[int]
+    cache_size: int = 256
+    stale: FrozenSet[int] = frozenset()
+    extra: Dict[str, Set[int]] = {}
+
+    def __init__(
+        self, tokens: Sequence[str], offsets: Sequence[int], postings: Sequence[int]
+    ) -> None:
+        self.tokens = tokens
+        self.offsets = offsets
+        self.postings = postings
+        self._cache: OrderedDict[str, FrozenSet[int]] = OrderedDict()
+
+    @classmethod
+    def build(cls, data: DataType) -> "SearchIndex":
+        words: Dict[str, Set[int]] = {}
+        for column in SEARCHABLE:
+            for row, text in enumerate(data.column(column)):
+                for token in tokenize(text):
+                    words.setdefault(token, set()).add(row)
+        tokens = sorted(words)
+        offsets = array("I", [0])
+        postings = array("I")
+        for token in tokens:
+            postings.extend(sorted(words[token]))
+            offsets.append(len(postings))
+        logger.info(f"Indexed {len(tokens)} search tokens")
+        return cls(tokens, offsets, postings)
+
+    @classmethod
+    def load(cls, data: DataType) -> "SearchIndex":
+        snapshot = data.mapped("search", lambda data: cls.build(data).writer())
+        return cls(
+            snapshot.text("tokens"),
+            snapshot.section("offsets"),
+            snapshot.section("postings"),
+        )
+
+    def patched(self, data: DataType) -> "SearchIndex":
+        """This index with the rows `data` patched or removed since it was built re-indexed.
+
+        Their old postings are masked out and their new tokens kept in a small
+        side table scanned alongside the main one.
+        """
+        index = SearchIndex(self.tokens, self.offsets, self.postings)
+        index.stale = frozenset(data.patched).union(data.removed)
+        extra: Dict[str, Set[int]] = {}
+        for row, entry in data.patched.items():
+            if row not in data.removed:
+                for column in SEARCHABLE:
+                    for token in tokenize(entry[column]):
+                        extra.setdefault(token, set()).add(row)
+        index.extra = extra
+        return index
+
+    def writer(self) -> SnapshotWriter:
+        writer = SnapshotWriter()
+        writer.add_text("tokens", self.tokens)
+        writer.add("offsets", array("I", self.offsets))
+        writer.add("postings", array("I", self.postings))
+        return writer
+
+    def prefix(self, prefix: str) -> FrozenSet[int]:
+        """Rows with any token starting with `prefix`."""
+        try:
+            self._cache.move_to_end(prefix)
+            return self._cache[prefix]
+        except KeyError:
+            pass
+        start = bisect_left(self.tokens, prefix)
+        stop = bisect_left(self.tokens, prefix[:-1] + chr(ord(prefix[-1]) + 1), start)
+        first, last = self.offsets[start], self.offsets[stop]
+        rows = frozenset(self.postings[first:last])
+        if self.stale:
+            rows = rows.difference(self.stale).union(
+                *(
+                    extra
+                    for token, extra in self.extra.items()
+                    if token.startswith(prefix)
+                )
+            )
+        self._cache[prefix] = rows
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return rows
+
+    @timed("search")
+    def search(self, query: str) -> FrozenSet[int] | None:
+        """Rows matching every word of `query` as a prefix, or None for an empty query."""
+        terms = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not terms:
+            return None
+        rows = self.prefix(terms[0])
+        for term in terms[1:]:
+            if not rows:
+                break
+            rows = rows & self.prefix(term)
+        return rows
@@ -0,0 +1,115 @@
+"""Serve the TUI to browsers, with every session sharing one prepared dataset."""
+
+import argparse
+import logging
+import shlex
+import sys
+import time
+from pathlib import Path
+from typing import Sequence
+
+from druider.data import DataType
+from druider.sources import add_arguments as add_source_arguments
+from druider.sources import load_sources, source_files
+
+logger = logging.getLogger(__name__)
+
+
+def prepare(
+    files: Sequence[Path],
+    precedence: str = "first",
+    rebuild: bool = False,
+    backend: str = "memory",
+) -> DataType:
+    """Build the snapshot and every index sidecar for `files`, so sessions only open them."""
+    from druider.facets import FacetIndex
+    from druider.links import LinkIndex
+    from druider.parsing import ParsedFields
+    from druider.search import SearchIndex
+    from druider.sorting import SortEngine
+
+    started = time.perf_counter()
+    data = load_sources(files, precedence, rebuild=rebuild)
+    SearchIndex.load(data)
+    FacetIndex.load(data)
+    SortEngine.load(data)
+    ParsedFields.load(data)
+    LinkIndex.load(data)
+    if backend == "sqlite":
+        from druider.database import Database
+
+        Database.load(data, rebuild=rebuild)
+    logger.info(f"Prepared {len(data)} rows in {time.perf_counter() - started:.2f}s")
+    return data
+
+
+def add_prepare_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--rebuild-cache",
+        action="store_true",
+        help="rebuild the snapshot and indexes even if they are current",
+    )
+    add_source_arguments(parser)
+
+
+def run_prepare(args: argparse.Namespace) -> int:
+    logging.basicConfig(level=logging.INFO)
+    prepare(
+        source_files(args),
+        args.precedence,
+        rebuild=args.rebuild_cache,
+        backend=args.backend,
+    )
+    return 0
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--host",
+        default="localhost",
+        help="interface to listen on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8000,
+        help="port to listen on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--public-url", help="URL the server is reached at, if behind a proxy"
+    )
+    parser.add_argument(
+        "--rebuild-cache",
+        action="store_true",
+        help="rebuild the snapshot and indexes before serving",
+    )
+    add_source_arguments(parser)
+
+
+def run(args: argparse.Namespace) -> int:
+    try:
+        from textual_serve.server import Server
+    except ImportError:
+        print(
+            "druider serve: textual-serve is not installed (pip install 'druider[serve]')",
+            file=sys.stderr,
+        )
+        return 2
+    logging.basicConfig(level=logging.INFO)
+    files = source_files(args)
+    prepare(files, args.precedence, rebuild=args.rebuild_cache, backend=args.backend)
+    # Each browser connection runs its own process; --shared keeps them on the prepared
+    # files and stops them watching the source, so only `prepare` ever rebuilds.
+    sources = " ".join(f"--data {shlex.quote(str(file.resolve()))}" for file in files)
+    command = (
+        f"{shlex.quote(sys.executable)} -m druider --shared {sources}"
+        f" --precedence {args.precedence} --backend {args.backend}"
+    )
+    Server(
+        command,
+        host=args.host,
+        port=args.port,
+        title="DruidHelper",
+        public_url=args.public_url,
+    ).serve()
+    return 0
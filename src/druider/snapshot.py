@@ -0,0 +1,253 @@
+"""Binary, memory-mappable columnar snapshots.
+
+A snapshot is a single file made of named, aligned sections preceded by a
+JSON header. Sections are exposed as `memoryview`s over an `mmap`, so a
+column costs nothing until it is actually read.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"DRUIDSNP"
+VERSION = 1
+SUFFIX = ".snapshot"
+
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGN = 8
+_PAGE = 4096
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """Identity of a source file: size, modification time and content hash."""
+
+    size: int
+    mtime_ns: int
+    digest: str
+
+    @classmethod
+    def of(cls, file: Path, digest: bool = True) -> "Fingerprint":
+        stat = file.stat()
+        return cls(stat.st_size, stat.st_mtime_ns, file_digest(file) if digest else "")
+
+    def same_stat(self, other: "Fingerprint") -> bool:
+        return self.size == other.size and self.mtime_ns == other.mtime_ns
+
+
+def file_digest(file: Path) -> str:
+    digest = hashlib.sha1()
+    with file.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_path(file: Path) -> Path:
+    return file.with_name(file.name + SUFFIX)
+
+
+def mapped_path(file: Path, name: str) -> Path:
+    return file.with_name(f"{file.name}.{name}{SUFFIX}")
+
+
+class TextColumn(Sequence):
+    """Lazily decoded UTF-8 strings stored as an offsets section and a blob."""
+
+    def __init__(self, offsets: memoryview, blob: memoryview) -> None:
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        start, stop = self.offsets[index], self.offsets[index + 1]
+        return str(self.blob[start:stop], "utf-8")
+
+    def __iter__(self):
+        blob, offsets = self.blob, self.offsets
+        start = offsets[0]
+        for index in range(1, len(offsets)):
+            end = offsets[index]
+            yield str(blob[start:end], "utf-8")
+            start = end
+
+
+def encode_text(values: Iterable[str]) -> Tuple[array, bytes]:
+    offsets = [0]
+    chunks = []
+    position = 0
+    for value in values:
+        chunk = value.encode("utf-8")
+        position += len(chunk)
+        offsets.append(position)
+        chunks.append(chunk)
+    return array("I" if position < 1 << 32 else "Q", offsets), b"".join(chunks)
+
+
+class SnapshotWriter:
+    """Collect named sections and serialize them into a snapshot."""
+
+    def __init__(self, **meta) -> None:
+        self.meta = meta
+        self.sections: Dict[str, Tuple[str, bytes]] = {}
+
+    def add(self, name: str, data: array | bytes) -> None:
+        if isinstance(data, array):
+            self.sections[name] = (data.typecode, data.tobytes())
+        else:
+            self.sections[name] = ("B", bytes(data))
+
+    def add_text(self, name: str, values: Iterable[str]) -> None:
+        offsets, blob = encode_text(values)
+        self.add(f"{name}.offsets", offsets)
+        self.add(f"{name}.blob", blob)
+
+    def _header(self, fingerprint: Fingerprint, start: int) -> Tuple[dict, int]:
+        sections = {}
+        position = start
+        for name, (typecode, data) in self.sections.items():
+            sections[name] = [position, len(data), typecode]
+            position += _padded(len(data))
+        header = {
+            "fingerprint": asdict(fingerprint),
+            "meta": self.meta,
+            "sections": sections,
+        }
+        return header, position
+
+    def to_bytes(self, fingerprint: Fingerprint) -> bytes:
+        # Header offsets depend on the header length, so size it in two passes.
+        header, _ = self._header(fingerprint, 0)
+        reserved = _padded(_PREAMBLE.size + len(_dump(header)) + _PAGE, _PAGE)
+        header, _ = self._header(fingerprint, reserved)
+        encoded = _dump(header)
+        parts = [_PREAMBLE.pack(MAGIC, VERSION, reserved - _PREAMBLE.size), encoded]
+        parts.append(b" " * (reserved - _PREAMBLE.size - len(encoded)))
+        for _, data in self.sections.values():
+            parts.append(data)
+            parts.append(b"\0" * (_padded(len(data)) - len(data)))
+        return b"".join(parts)
+
+    def write(self, path: Path, fingerprint: Fingerprint) -> None:
+        temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temp.write_bytes(self.to_bytes(fingerprint))
+        os.replace(temp, path)
+
+
+class Snapshot:
+    """Read-only view over a serialized snapshot."""
+
+    def __init__(self, buffer, header: dict) -> None:
+        self.buffer = memoryview(buffer)
+        self.header = header
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Snapshot":
+        magic, version, length = _PREAMBLE.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a druider snapshot, or an incompatible version")
+        start = _PREAMBLE.size
+        stop = start + length
+        header = json.loads(bytes(data[start:stop]))
+        return cls(data, header)
+
+    @classmethod
+    def open(cls, path: Path) -> "Snapshot":
+        with path.open("rb") as fh:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_bytes(mapped)
+
+    @property
+    def fingerprint(self) -> Fingerprint:
+        return Fingerprint(**self.header["fingerprint"])
+
+    @property
+    def meta(self) -> dict:
+        return self.header["meta"]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.header["sections"]
+
+    def section(self, name: str) -> memoryview:
+        offset, length, typecode = self.header["sections"][name]
+        stop = offset + length
+        view = self.buffer[offset:stop]
+        return view if typecode == "B" else view.cast(typecode)
+
+    def text(self, name: str) -> TextColumn:
+        return TextColumn(self.section(f"{name}.offsets"), self.section(f"{name}.blob"))
+
+
+def open_cached(path: Path, source: Path) -> Snapshot | None:
+    """Open the snapshot at `path` if it is still valid for `source`."""
+    try:
+        snapshot = Snapshot.open(path)
+    except (OSError, ValueError, struct.error) as err:
+        logger.debug(f"Snapshot {path} unusable: {err}")
+        return None
+    current = Fingerprint.of(source, digest=False)
+    stored = snapshot.fingerprint
+    if stored.same_stat(current):
+        return snapshot
+    if stored.size != current.size:
+        return None
+    # Same size, new mtime (e.g. a checkout): only the content hash can tell.
+    current = Fingerprint(current.size, current.mtime_ns, file_digest(source))
+    if current.digest != stored.digest:
+        return None
+    _rewrite_fingerprint(path, snapshot, current)
+    return snapshot
+
+
+def open_mapped(path: Path, digest: str, **meta) -> Snapshot | None:
+    """Open the sidecar snapshot at `path` if it was built from content `digest` with `meta`."""
+    try:
+        snapshot = Snapshot.open(path)
+    except (OSError, ValueError, struct.error) as err:
+        logger.debug(f"Sidecar {path} unusable: {err}")
+        return None
+    if snapshot.fingerprint.digest != digest:
+        return None
+    if any(snapshot.meta.get(key) != value for key, value in meta.items()):
+        return None
+    return snapshot
+
+
+def _rewrite_fingerprint(
+    path: Path, snapshot: Snapshot, fingerprint: Fingerprint
+) -> None:
+    header = dict(snapshot.header, fingerprint=asdict(fingerprint))
+    encoded = _dump(header)
+    reserved = _PREAMBLE.unpack_from(snapshot.buffer)[2]
+    if len(encoded) > reserved:
+        return
+    try:
+        with path.open("r+b") as fh:
+            fh.seek(_PREAMBLE.size)
+            fh.write(encoded + b" " * (reserved - len(encoded)))
+    except OSError as err:
+        logger.debug(f"Could not refresh snapshot fingerprint: {err}")
+
+
+def _dump(header: dict) -> bytes:
+    return json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+
+def _padded(length: int, align: int = _ALIGN) -> int:
+    return -(-length // align) * align
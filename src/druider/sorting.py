@@ -0,0 +1,221 @@
+import logging
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence as SequenceABC
+from typing import Any, Dict, Iterable, List, Sequence, Set, Tuple
+
+from druider.data import Column, DataType, EntryType, sort_key
+from druider.metrics import timed
+from druider.snapshot import SnapshotWriter
+
+logger = logging.getLogger(__name__)
+
+SORTABLE: Tuple[Column, ...] = (
+    Column._name,
+    Column.size,
+    Column.cr,
+    Column.xp,
+    Column.hp,
+    Column.ac,
+    Column.base_speed,
+    Column.fly_speed,
+    Column.climb_speed,
+    Column.swim_speed,
+    Column.burrow_speed,
+)
+
+SortKey = Tuple[Column, bool]
+
+
+class SortEngine:
+    """Argsort permutations and dense ranks for the sortable columns.
+
+    A rank array maps each row to its position among distinct values of a
+    column, so any multi-key ordering is a few stable sorts on small ints.
+    """
+
+    data: DataType
+    permutations: Dict[Column, Sequence[int]]
+    ranks: Dict[Column, Sequence[int]]
+
+    def __init__(
+        self,
+        data: DataType,
+        permutations: Dict[Column, Sequence[int]],
+        ranks: Dict[Column, Sequence[int]],
+    ) -> None:
+        self.data = data
+        self.permutations = permutations
+        self.ranks = ranks
+
+    @classmethod
+    def build(cls, data: DataType) -> "SortEngine":
+        engine = cls(data, {}, {})
+        for column in SORTABLE:
+            engine.rank(column)
+        return engine
+
+    @classmethod
+    def load(cls, data: DataType) -> "SortEngine":
+        snapshot = data.mapped("sort", lambda data: cls.build(data).writer())
+        permutations = {
+            column: snapshot.section(f"permutation.{column.name}")
+            for column in SORTABLE
+        }
+        ranks = {column: snapshot.section(f"rank.{column.name}") for column in SORTABLE}
+        return cls(data, permutations, ranks)
+
+    def writer(self) -> SnapshotWriter:
+        writer = SnapshotWriter()
+        for column in SORTABLE:
+            writer.add(
+                f"permutation.{column.name}", array("I", self.permutation(column))
+            )
+            writer.add(f"rank.{column.name}", array("I", self.rank(column)))
+        return writer
+
+    def permutation(self, column: Column) -> Sequence[int]:
+        """Row indices in ascending order of `column`, ties in row order."""
+        try:
+            return self.permutations[column]
+        except KeyError:
+            keys = self.data.sort_keys(column)
+            order = array("I", sorted(range(len(self.data)), key=keys.__getitem__))
+            self.permutations[column] = order
+            return order
+
+    def rank(self, column: Column) -> Sequence[int]:
+        try:
+            return self.ranks[column]
+        except KeyError:
+            pass
+        keys = self.data.sort_keys(column)
+        ranks = array("I", bytes(4 * len(self.data)))
+        rank, previous = -1, object()
+        for row in self.permutation(column):
+            key = keys[row]
+            if key != previous:
+                rank, previous = rank + 1, key
+            ranks[row] = rank
+        self.ranks[column] = ranks
+        return ranks
+
+    def patched(self, data: DataType) -> "SortEngine":
+        """This engine with ranks for the rows `data` has patched since it was built.
+
+        A patched value equal to an existing one takes its rank; new values are
+        slotted between the neighbouring ranks, so no other row is re-ranked.
+        """
+        rows = [
+            (index, entry)
+            for index, entry in data.patched.items()
+            if index not in data.removed
+        ]
+        ranks = {
+            column: _PatchedRanks(
+                self.rank(column), self._slot(column, rows), len(data)
+            )
+            for column in SORTABLE
+        }
+        return SortEngine(data, {}, ranks)
+
+    def _slot(
+        self, column: Column, rows: List[Tuple[int, EntryType]]
+    ) -> Dict[int, float]:
+        permutation, ranks = self.permutation(column), self.rank(column)
+        base = self.data.base
+
+        def key_of(row: int) -> Any:
+            return sort_key(column, base.cell(row, column))
+
+        slotted: Dict[int, float] = {}
+        gaps: Dict[int, Set[Any]] = {}
+        placed: Dict[int, Tuple[int, Any]] = {}
+        for index, entry in rows:
+            key = sort_key(column, entry[column])
+            position = bisect_left(permutation, key, key=key_of)
+            if position < len(permutation) and key_of(permutation[position]) == key:
+                slotted[index] = ranks[permutation[position]]
+            else:
+                gaps.setdefault(position, set()).add(key)
+                placed[index] = (position, key)
+        steps: Dict[Tuple[int, Any], float] = {}
+        for position, keys in gaps.items():
+            below = ranks[permutation[position - 1]] if position else -1
+            for step, key in enumerate(sorted(keys), 1):
+                steps[position, key] = below + step / (len(keys) + 1)
+        for index, slot in placed.items():
+            slotted[index] = steps[slot]
+        return slotted
+
+    @timed("sort.order")
+    def order(
+        self, keys: Sequence[SortKey], rows: Iterable[int] | None = None
+    ) -> List[int]:
+        """Stable multi-key order of `rows` (all rows if None); `keys` is most significant first."""
+        if rows is None:
+            if (
+                len(keys) == 1
+                and not keys[0][1]
+                and not self.data.removed
+                and not self.data.patched
+            ):
+                return list(self.permutation(keys[0][0]))
+            rows = (
+                row for row in range(len(self.data)) if row not in self.data.removed
+            )
+        ordered = list(rows)
+        # Least significant key first; each stable pass preserves the previous ones.
+        for column, reverse in reversed(keys):
+            ordered.sort(key=self.rank(column).__getitem__, reverse=reverse)
+        return ordered
+
+
+class _PatchedRanks(SequenceABC):
+    """Base ranks, with patched rows' ranks read from `slotted`."""
+
+    def __init__(
+        self, ranks: Sequence[int], slotted: Dict[int, float], length: int
+    ) -> None:
+        self.ranks = ranks
+        self.slotted = slotted
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index):
+        slotted = self.slotted.get(index)
+        return self.ranks[index] if slotted is None else slotted
+
+
+class SortStack:
+    """Most-significant-first sort keys, driven by header clicks."""
+
+    keys: List[SortKey]
+
+    def __init__(self, limit: int = 3) -> None:
+        self.limit = limit
+        self.keys = []
+
+    def __bool__(self) -> bool:
+        return bool(self.keys)
+
+    def push(self, column: Column) -> None:
+        """Make `column` the primary key, or flip its direction if it already is."""
+        if self.keys and self.keys[0][0] is column:
+            self.keys[0] = (column, not self.keys[0][1])
+        else:
+            others = [key for key in self.keys if key[0] is not column]
+            self.keys = [(column, False), *others][: self.limit]
+
+    def clear(self) -> None:
+        self.keys = []
+
+    def indicator(self, column: Column) -> str:
+        """Direction arrow, plus priority when sorting by several keys."""
+        for position, (key, reverse) in enumerate(self.keys):
+            if key is column:
+                priority = position + 1 if len(self.keys) > 1 else ""
+                return f"{'▼' if reverse else '▲'}{priority}"
+        return ""
@@ -0,0 +1,162 @@
+"""Merge several bestiary files into one store, deduplicated, keeping each row's origin."""
+
+import argparse
+import hashlib
+import logging
+import os
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+from druider.data import (
+    SCHEMA,
+    DataType,
+    EntryType,
+    Store,
+    build_snapshot,
+    encode_rows,
+    identity,
+    load_data,
+)
+from druider.snapshot import (
+    Fingerprint,
+    Snapshot,
+    open_cached,
+    open_mapped,
+    snapshot_path,
+)
+
+logger = logging.getLogger(__name__)
+
+PRECEDENCE = ("first", "last")
+BACKENDS = ("memory", "sqlite")
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--data",
+        type=Path,
+        action="append",
+        metavar="FILE",
+        help="a CSV or JSONL bestiary file; repeat to merge several (default: ./data.csv)",
+    )
+    parser.add_argument(
+        "--precedence",
+        choices=PRECEDENCE,
+        default="first",
+        help="which file wins when several list the same creature (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="memory",
+        help="run filters, search and sorting over in-memory indexes or an indexed SQLite database "
+        "kept beside the data (default: %(default)s)",
+    )
+
+
+def source_files(args: argparse.Namespace) -> List[Path]:
+    return args.data or [Path.cwd() / "data.csv"]
+
+
+def _build(file: Path) -> None:
+    build_snapshot(file)
+
+
+def load_each(files: Sequence[Path], rebuild: bool = False) -> List[DataType]:
+    """Load every file from its own snapshot, building stale snapshots in parallel.
+
+    Snapshots are written by worker processes and then mapped here, so an
+    unchanged source is never parsed again.
+    """
+    stale = [
+        file
+        for file in files
+        if rebuild or open_cached(snapshot_path(file), file) is None
+    ]
+    if len(stale) > 1:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        logger.info(f"Building snapshots for {len(stale)} sources in parallel")
+        # Spawn rather than fork: this runs on a worker thread of a live app.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            min(len(stale), os.cpu_count() or 1), mp_context=context
+        ) as pool:
+            list(pool.map(_build, stale))
+        rebuild = False
+    return [load_data(file, rebuild=rebuild) for file in files]
+
+
+def merge(
+    stores: Sequence[DataType], precedence: str = "first"
+) -> Tuple[List[EntryType], List[int]]:
+    """Rows of `stores` deduplicated by id (else name and source), with the store each came from.
+
+    With "first" precedence the earliest store listing a creature wins,
+    with "last" the latest; either way a row keeps the position where the
+    creature first appeared. One pass, one dict lookup per row.
+    """
+    if precedence not in PRECEDENCE:
+        raise ValueError(
+            f"Unknown precedence {precedence!r}, expected one of {', '.join(PRECEDENCE)}"
+        )
+    rows: List[EntryType] = []
+    origins: List[int] = []
+    positions: Dict[Hashable, int] = {}
+    for number, store in enumerate(stores):
+        for index in range(len(store)):
+            row = store[index]
+            key = identity(row)
+            position = positions.get(key)
+            if position is None:
+                positions[key] = len(rows)
+                rows.append(row)
+                origins.append(number)
+            elif precedence == "last":
+                rows[position] = row
+                origins[position] = number
+    return rows, origins
+
+
+def merged_path(files: Sequence[Path]) -> Path:
+    """Where the merged store (and, by name, its index sidecars) is kept: beside the first file."""
+    return files[0].with_name(f"{files[0].name}.merged")
+
+
+def load_sources(
+    files: Sequence[Path], precedence: str = "first", rebuild: bool = False
+) -> DataType:
+    """One store over every file in `files`; a single file loads exactly as `load_data` does."""
+    if len(files) == 1:
+        return load_data(files[0], rebuild=rebuild)
+    started = time.perf_counter()
+    stores = load_each(files, rebuild)
+    digest = hashlib.sha1(precedence.encode())
+    for file, store in zip(files, stores):
+        digest.update(f"\0{file}\0{store.snapshot.fingerprint.digest}".encode())
+    fingerprint = Fingerprint(0, 0, digest.hexdigest())
+    source = merged_path(files)
+    path = snapshot_path(source)
+    snapshot = None if rebuild else open_mapped(path, fingerprint.digest, schema=SCHEMA)
+    if snapshot is None:
+        rows, origins = merge(stores, precedence)
+        writer = encode_rows(
+            rows,
+            header=stores[0].snapshot.meta.get("header", []),
+            sources=[str(f) for f in files],
+        )
+        writer.add("origin.codes", array("H", origins))
+        try:
+            writer.write(path, fingerprint)
+            snapshot = Snapshot.open(path)
+        except OSError as err:
+            logger.warning(f"Could not write merged snapshot {path}: {err}")
+            snapshot = Snapshot.from_bytes(writer.to_bytes(fingerprint))
+        logger.info(
+            f"Merged {sum(map(len, stores))} rows from {len(files)} sources into {len(rows)}"
+        )
+    logger.info(f"Loaded {len(files)} sources in {time.perf_counter() - started:.2f}s")
+    return Store(snapshot, source=source)
@@ -0,0 +1,336 @@
+import logging
+from typing import (
+    TYPE_CHECKING,
+    AbstractSet,
+    Dict,
+    Iterable,
+    List,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from rich.segment import Segment
+from textual.binding import Binding
+from textual.events import Click
+from textual.geometry import Size
+from textual.message import Message
+from textual.reactive import reactive
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+
+from druider.compare import MARK
+from druider.data import Column, DataType, EntryType
+from druider.metrics import timed
+from druider.sorting import SortEngine, SortStack
+
+if TYPE_CHECKING:
+    from druider.database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class VirtualAnimals(ScrollView, can_focus=True):
+    """A listing that only materializes the rows around the viewport.
+
+    The table holds nothing but `rows`, the data indices in display order;
+    cells are read from the store when a line is rendered, for the visible
+    window plus `overscan` rows either side.
+    """
+
+    COMPONENT_CLASSES = {
+        "virtual-animals--header",
+        "virtual-animals--cursor",
+        "virtual-animals--even-row",
+    }
+    DEFAULT_CSS = """
+    VirtualAnimals {
+        background: $surface;
+        color: $foreground;
+        & > .virtual-animals--header {
+            text-style: bold;
+            background: $panel;
+            color: $foreground;
+        }
+        & > .virtual-animals--even-row {
+            background: $surface-lighten-1 50%;
+        }
+        & > .virtual-animals--cursor {
+            background: $block-cursor-blurred-background;
+            color: $block-cursor-blurred-foreground;
+        }
+        &:focus > .virtual-animals--cursor {
+            background: $block-cursor-background;
+            color: $block-cursor-foreground;
+            text-style: $block-cursor-text-style;
+        }
+    }
+    """
+    BINDINGS = [
+        Binding("up", "cursor_up", "Cursor up", show=False),
+        Binding("down", "cursor_down", "Cursor down", show=False),
+        Binding("pageup", "page_up", "Page up", show=False),
+        Binding("pagedown", "page_down", "Page down", show=False),
+        Binding("home", "first", "First row", show=False),
+        Binding("end", "last", "Last row", show=False),
+        Binding("enter", "select_cursor", "Select", show=False),
+        Binding("m", "toggle_mark", "Compare"),
+    ]
+
+    class RowHighlighted(Message):
+        def __init__(self, table: "VirtualAnimals", row: int) -> None:
+            self.table = table
+            self.row = row
+            super().__init__()
+
+    class RowSelected(Message):
+        def __init__(self, table: "VirtualAnimals", row: int) -> None:
+            self.table = table
+            self.row = row
+            super().__init__()
+
+    class Marked(Message):
+        def __init__(self, row: int, marked: bool) -> None:
+            self.row = row
+            self.marked = marked
+            super().__init__()
+
+    data: DataType
+    candidates: List[int]
+    rows: Sequence[int]
+    marked: Set[int]
+    sorter: "SortEngine | Database | None" = None
+    sort_stack: SortStack
+    overscan: int = 20
+    cursor_row = reactive(0)
+    _columns: Dict[Column, int] = {
+        Column.size: 10,
+        Column._name: 28,
+        Column.cr: 6,
+        Column.xp: 10,
+        Column.hp: 6,
+        Column.ac: 5,
+        Column.base_speed: 12,
+    }
+    _padding = 1
+
+    def __init__(self, data: DataType, *args, **kwargs) -> None:
+        self.data = data
+        self.candidates = []
+        self.rows = []
+        self.marked = set()
+        self.sort_stack = SortStack()
+        self._cells: Dict[int, Tuple[str, ...]] = {}
+        self._window: Tuple[int, int] = (0, 0)
+        self._pending: List[EntryType] = []
+        super().__init__(*args, **kwargs)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rows)
+
+    @property
+    def cursor_data_row(self) -> int | None:
+        return self.rows[self.cursor_row] if self.rows else None
+
+    @property
+    def _line_width(self) -> int:
+        return sum(width + 2 * self._padding for width in self._columns.values())
+
+    def add_batch(self, start: int, rows: List[EntryType]) -> None:
+        """Show freshly parsed rows before the store they belong to is ready."""
+        self._pending.extend(rows)
+        self.rows.extend(range(start, start + len(rows)))
+        self._window = (0, 0)
+        self.virtual_size = Size(self._line_width, len(self.rows) + 1)
+        self.refresh()
+
+    def set_data(self, data: DataType, sorter: "SortEngine | Database") -> None:
+        self.data = data
+        self.sorter = sorter
+        self._pending = []
+
+    def refresh_rows(self, rows: Iterable[int]) -> None:
+        """Drop the materialized cells of `rows`, so they are re-read when next drawn."""
+        for index in rows:
+            self._cells.pop(index, None)
+        self._window = (0, 0)
+        self.refresh()
+
+    def show_rows(self, rows: AbstractSet[int] | None) -> None:
+        """Show the candidates in `rows` (all of them if None), keeping the cursor's row."""
+        current = self.cursor_data_row
+        wanted = (
+            self.candidates
+            if rows is None
+            else [i for i in self.candidates if i in rows]
+        )
+        if self.sort_stack and self.sorter is not None:
+            wanted = self.sorter.order(self.sort_stack.keys, wanted)
+        self.set_rows(wanted, keep=current)
+
+    def set_rows(self, rows: Sequence[int], keep: int | None = None) -> None:
+        """Show `rows`, a list or a database query's paged rows, keeping row `keep` under the cursor."""
+        self.rows = rows
+        self._cells.clear()
+        self._window = (0, 0)
+        self.virtual_size = Size(self._line_width, len(rows) + 1)
+        try:
+            position = rows.index(keep) if keep is not None else 0
+        except ValueError:
+            position = 0
+        self.cursor_row = min(position, max(len(rows) - 1, 0))
+        self.refresh()
+
+    def neighbors(self, index: int, radius: int) -> List[int]:
+        """Rows displayed up to `radius` positions above and below row `index`."""
+        if self.cursor_data_row == index:
+            position = self.cursor_row
+        else:
+            try:
+                position = self.rows.index(index)
+            except ValueError:
+                return []
+        rows = []
+        for offset in range(1, radius + 1):
+            for near in (position + offset, position - offset):
+                if 0 <= near < len(self.rows):
+                    rows.append(self.rows[near])
+        return rows
+
+    @timed("sort.column")
+    def sort_data_column(self, column: Column) -> None:
+        self.sort_stack.push(column)
+        if self.sorter is not None:
+            self.set_rows(
+                self.sorter.order(self.sort_stack.keys, self.rows),
+                keep=self.cursor_data_row,
+            )
+
+    def _materialize(self, position: int) -> None:
+        height = self.scrollable_content_region.height
+        start = max(position - self.overscan, 0)
+        stop = min(position + height + self.overscan, len(self.rows))
+        self._cells = {
+            index: self._cells.get(index) or self._row_cells(index)
+            for index in self.rows[start:stop]
+        }
+        self._window = (start, stop)
+
+    def _row_cells(self, index: int) -> Tuple[str, ...]:
+        if self._pending:
+            return tuple(self._pending[index][column] for column in self._columns)
+        return tuple(self.data.cell(index, column) for column in self._columns)
+
+    def _cell_text(self, values) -> str:
+        padding = " " * self._padding
+        parts = []
+        for value, width in zip(values, self._columns.values()):
+            if len(value) > width:
+                value = value[: width - 1] + "…"
+            parts.append(f"{padding}{value:<{width}}{padding}")
+        return "".join(parts)
+
+    def _header_labels(self) -> List[str]:
+        labels = []
+        for column in self._columns:
+            indicator = self.sort_stack.indicator(column)
+            labels.append(f"{column.title} {indicator}" if indicator else column.title)
+        return labels
+
+    def render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        width = self.scrollable_content_region.width
+        if y == 0:
+            style = self.get_component_rich_style("virtual-animals--header")
+            text = self._cell_text(self._header_labels())
+        else:
+            position = scroll_y + y - 1
+            if position >= len(self.rows):
+                return Strip.blank(width, self.rich_style)
+            if not self._window[0] <= position < self._window[1]:
+                self._materialize(position)
+            if position == self.cursor_row:
+                style = self.get_component_rich_style("virtual-animals--cursor")
+            elif position % 2:
+                style = self.get_component_rich_style("virtual-animals--even-row")
+            else:
+                style = self.rich_style
+            index = self.rows[position]
+            text = self._cell_text(self._cells[index])
+            if index in self.marked:
+                # The first column's padding holds the mark.
+                text = MARK + text[1:]
+        strip = Strip([Segment(text.ljust(self._line_width), style)], self._line_width)
+        return strip.crop_extend(scroll_x, scroll_x + width, style)
+
+    def watch_cursor_row(self, previous: int, cursor: int) -> None:
+        height = self.scrollable_content_region.height - 1
+        if cursor < self.scroll_y:
+            self.scroll_to(y=cursor, animate=False)
+        elif height > 0 and cursor >= self.scroll_y + height:
+            self.scroll_to(y=cursor - height + 1, animate=False)
+        self.refresh()
+        if self.rows:
+            self.post_message(self.RowHighlighted(self, self.rows[cursor]))
+
+    def _move(self, delta: int) -> None:
+        if self.rows:
+            self.cursor_row = max(0, min(self.cursor_row + delta, len(self.rows) - 1))
+
+    def action_cursor_up(self) -> None:
+        self._move(-1)
+
+    def action_cursor_down(self) -> None:
+        self._move(1)
+
+    def action_page_up(self) -> None:
+        self._move(-(self.scrollable_content_region.height - 1))
+
+    def action_page_down(self) -> None:
+        self._move(self.scrollable_content_region.height - 1)
+
+    def action_first(self) -> None:
+        self._move(-len(self.rows))
+
+    def action_last(self) -> None:
+        self._move(len(self.rows))
+
+    def action_select_cursor(self) -> None:
+        if self.rows:
+            self.post_message(self.RowSelected(self, self.rows[self.cursor_row]))
+
+    def mark(self, index: int, marked: bool = True) -> None:
+        """Mark row `index` for comparison, or unmark it."""
+        if (index in self.marked) == marked:
+            return
+        if marked:
+            self.marked.add(index)
+        else:
+            self.marked.discard(index)
+        self.refresh()
+        self.post_message(self.Marked(index, marked))
+
+    def action_toggle_mark(self) -> None:
+        index = self.cursor_data_row
+        if index is not None:
+            self.mark(index, index not in self.marked)
+
+    def on_click(self, event: Click) -> None:
+        if event.y == 0:
+            column = self._column_at(event.x + self.scroll_x)
+            if column is not None:
+                logger.info(f"Sorting Animals by {column!r}")
+                self.sort_data_column(column)
+            return
+        position = self.scroll_y + event.y - 1
+        if position < len(self.rows):
+            self.cursor_row = position
+            self.action_select_cursor()
+
+    def _column_at(self, x: int) -> Column | None:
+        for column, width in self._columns.items():
+            x -= width + 2 * self._padding
+            if x < 0:
+                return column
+        return None
@@ -0,0 +1,277 @@
+"""Which creatures a druid can wild shape into at each level, and what each form grants."""
+
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from druider import bitmap
+from druider.data import Size
+from druider.facets import And, Facet, FacetIndex, Is, Or, Term
+
+logger = logging.getLogger(__name__)
+
+LEVELS = range(1, 21)
+
+
+class Adjustments(NamedTuple):
+    str: int = 0
+    dex: int = 0
+    con: int = 0
+    natural_armor: int = 0
+
+    def __str__(self) -> str:
+        return ", ".join(
+            f"{value:+d} {_LABELS[name]}"
+            for name, value in self._asdict().items()
+            if value
+        )
+
+
+_LABELS = {"str": "Str", "dex": "Dex", "con": "Con", "natural_armor": "natural armor"}
+
+
+class Form(NamedTuple):
+    """A size of creature made available by one wild shape spell."""
+
+    spell: str
+    level: int
+    kind: str
+    size: Size
+    adjustments: Adjustments
+
+    @property
+    def label(self) -> str:
+        return f"{self.spell}: {self.size.name} {self.kind}"
+
+
+# Druid wild shape (Pathfinder): beast shape I at 4th level, II and elemental
+# body I at 6th, III with elemental body II and plant shape I at 8th, then
+# elemental body III / plant shape II at 10th and IV / III at 12th.
+FORMS: Tuple[Form, ...] = (
+    Form("Beast Shape I", 4, "animal", Size.small, Adjustments(dex=2, natural_armor=1)),
+    Form(
+        "Beast Shape I", 4, "animal", Size.medium, Adjustments(str=2, natural_armor=2)
+    ),
+    Form(
+        "Beast Shape II",
+        6,
+        "animal",
+        Size.tiny,
+        Adjustments(str=-2, dex=4, natural_armor=1),
+    ),
+    Form(
+        "Beast Shape II",
+        6,
+        "animal",
+        Size.large,
+        Adjustments(str=4, dex=-2, natural_armor=4),
+    ),
+    Form(
+        "Beast Shape III",
+        8,
+        "animal",
+        Size.diminutive,
+        Adjustments(str=-4, dex=6, natural_armor=1),
+    ),
+    Form(
+        "Beast Shape III",
+        8,
+        "animal",
+        Size.huge,
+        Adjustments(str=6, dex=-4, natural_armor=6),
+    ),
+    Form("Elemental Body I", 6, "air", Size.small, Adjustments(dex=2, natural_armor=2)),
+    Form(
+        "Elemental Body I", 6, "earth", Size.small, Adjustments(str=2, natural_armor=4)
+    ),
+    Form(
+        "Elemental Body I", 6, "fire", Size.small, Adjustments(dex=2, natural_armor=2)
+    ),
+    Form(
+        "Elemental Body I", 6, "water", Size.small, Adjustments(con=2, natural_armor=4)
+    ),
+    Form(
+        "Elemental Body II", 8, "air", Size.medium, Adjustments(dex=4, natural_armor=3)
+    ),
+    Form(
+        "Elemental Body II",
+        8,
+        "earth",
+        Size.medium,
+        Adjustments(str=4, natural_armor=5),
+    ),
+    Form(
+        "Elemental Body II", 8, "fire", Size.medium, Adjustments(dex=4, natural_armor=3)
+    ),
+    Form(
+        "Elemental Body II",
+        8,
+        "water",
+        Size.medium,
+        Adjustments(con=4, natural_armor=5),
+    ),
+    Form(
+        "Elemental Body III",
+        10,
+        "air",
+        Size.large,
+        Adjustments(str=2, dex=4, natural_armor=4),
+    ),
+    Form(
+        "Elemental Body III",
+        10,
+        "earth",
+        Size.large,
+        Adjustments(str=6, dex=-2, con=2, natural_armor=6),
+    ),
+    Form(
+        "Elemental Body III",
+        10,
+        "fire",
+        Size.large,
+        Adjustments(dex=4, con=2, natural_armor=4),
+    ),
+    Form(
+        "Elemental Body III",
+        10,
+        "water",
+        Size.large,
+        Adjustments(str=2, dex=-2, con=6, natural_armor=6),
+    ),
+    Form(
+        "Elemental Body IV",
+        12,
+        "air",
+        Size.huge,
+        Adjustments(str=4, dex=6, natural_armor=4),
+    ),
+    Form(
+        "Elemental Body IV",
+        12,
+        "earth",
+        Size.huge,
+        Adjustments(str=8, dex=-2, con=4, natural_armor=6),
+    ),
+    Form(
+        "Elemental Body IV",
+        12,
+        "fire",
+        Size.huge,
+        Adjustments(dex=6, con=4, natural_armor=4),
+    ),
+    Form(
+        "Elemental Body IV",
+        12,
+        "water",
+        Size.huge,
+        Adjustments(str=4, dex=-2, con=8, natural_armor=6),
+    ),
+    Form("Plant Shape I", 8, "plant", Size.small, Adjustments(con=2, natural_armor=2)),
+    Form(
+        "Plant Shape I",
+        8,
+        "plant",
+        Size.medium,
+        Adjustments(str=2, con=2, natural_armor=2),
+    ),
+    Form(
+        "Plant Shape II",
+        10,
+        "plant",
+        Size.large,
+        Adjustments(str=4, con=2, natural_armor=4),
+    ),
+    Form(
+        "Plant Shape III",
+        12,
+        "plant",
+        Size.huge,
+        Adjustments(str=8, dex=-2, con=4, natural_armor=6),
+    ),
+)
+ELEMENTS = ("air", "earth", "fire", "water")
+
+
+class WildShapeIndex:
+    """Bitmaps of the creatures each form, and each druid level, can become.
+
+    Built from the facet bitmaps, so a level switch is a dictionary lookup.
+    """
+
+    length: int
+    forms: Dict[Form, int]
+    levels: Dict[int, int]
+
+    def __init__(
+        self, length: int, forms: Dict[Form, int], levels: Dict[int, int]
+    ) -> None:
+        self.length = length
+        self.forms = forms
+        self.levels = levels
+
+    @classmethod
+    def build(cls, facets: FacetIndex) -> "WildShapeIndex":
+        forms = {form: _creatures(facets, form) for form in FORMS}
+        levels = {}
+        for level in LEVELS:
+            bits = 0
+            for form, rows in forms.items():
+                if form.level <= level:
+                    bits |= rows
+            levels[level] = bits
+        logger.info(
+            f"Wild shape: {bitmap.count(levels[LEVELS[-1]])} eligible creatures"
+        )
+        return cls(facets.length, forms, levels)
+
+    def rows(self, level: int | None) -> int:
+        """Creatures available at druid `level`; everything when None."""
+        return bitmap.full(self.length) if level is None else self.levels.get(level, 0)
+
+    def form(self, row: int) -> Form | None:
+        """The form that lets a druid become the creature at `row`, if any."""
+        for form, rows in self.forms.items():
+            if rows >> row & 1:
+                return form
+        return None
+
+    def options(self) -> Iterable[Tuple[str, int]]:
+        """(label, level) for every druid level that has wild shape."""
+        for level in LEVELS:
+            if any(form.level <= level for form in FORMS):
+                yield f"Druid {level} ({bitmap.count(self.levels[level])})", level
+
+
+def _creatures(facets: FacetIndex, form: Form) -> int:
+    return form_term(form).resolve(facets)
+
+
+def form_term(form: Form) -> Term:
+    """The filter matching the creatures `form` can become."""
+    sized = Is(Facet.size, (form.size.name,))
+    if form.kind in ELEMENTS:
+        return And(
+            (
+                sized,
+                Is(Facet.type, ("outsider",)),
+                Is(Facet.subtype, ("elemental",)),
+                Is(Facet.subtype, (form.kind,)),
+            )
+        )
+    return And((sized, Is(Facet.type, (form.kind,))))
+
+
+def level_term(level: int) -> Term:
+    """The filter matching every creature a druid of `level` can wild shape into."""
+    forms = (
+        tuple(form_term(form) for form in FORMS if form.level <= level)
+        if level in LEVELS
+        else ()
+    )
+    return Or(forms)
+
+
+def describe(form: Form) -> List[str]:
+    return [
+        f"Wild shape: {form.label} (druid {form.level})",
+        f"Adjustments: {form.adjustments}",
+    ]
@@ -0,0 +1,22 @@
+from itertools import islice
+from pathlib import Path
+
+import pytest
+
+from druider.data import DataType, load_data
+
+BESTIARY = Path(__file__).parents[1] / "data.csv"
+
+
+@pytest.fixture
+def source(tmp_path: Path) -> Path:
+    """The first 400 creatures of the bestiary, in a scratch directory for its sidecars."""
+    path = tmp_path / "data.csv"
+    with BESTIARY.open(encoding="utf-8") as bestiary:
+        path.write_text("".join(islice(bestiary, 401)), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def data(source: Path) -> DataType:
+    return load_data(source)
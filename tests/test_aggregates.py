@@ -0,0 +1,56 @@
+import math
+import random
+
+import pytest
+
+from druider import bitmap
+from druider.aggregates import MEASURES, Aggregates, GroupBy, Summary, groups
+from druider.facets import FacetIndex, parse
+
+
+def recomputed(data, facets, by, selection, measure):
+    """`Aggregates.summaries` for `selection`, computed from scratch."""
+    values = data.sort_keys(measure)
+    found = []
+    for label, bits in groups(facets, by).items():
+        rows = bitmap.members(selection & bits)
+        if rows:
+            present = [values[row] for row in rows if values[row] != -math.inf]
+            summary = (
+                Summary(
+                    len(present),
+                    sum(present) / len(present),
+                    min(present),
+                    max(present),
+                )
+                if present
+                else None
+            )
+            found.append((label, len(rows), summary))
+    return found
+
+
+@pytest.mark.parametrize("by", list(GroupBy))
+def test_update_matches_a_recompute(data, by):
+    facets = FacetIndex.build(data)
+    aggregates = Aggregates(data, facets, by)
+    generator = random.Random(7)
+    rows = range(len(data))
+    selections = [
+        facets.universe,
+        parse("type=animal").resolve(facets),
+        parse("type=animal OR type=vermin").resolve(facets),
+        parse("cr<=3").resolve(facets),
+        bitmap.from_indices(generator.sample(rows, 40), len(data)),
+        bitmap.from_indices(generator.sample(rows, 300), len(data)),
+        0,
+        facets.universe,
+    ]
+    for selection in selections:
+        aggregates.update(selection)
+        for measure in MEASURES:
+            found = aggregates.summaries(measure)
+            expected = recomputed(data, facets, by, selection, measure)
+            assert [row[:2] for row in found] == [row[:2] for row in expected]
+            for (*_, summary), (*_, want) in zip(found, expected):
+                assert summary == (want and pytest.approx(want))
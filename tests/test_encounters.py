@@ -0,0 +1,97 @@
+import io
+import re
+
+import pytest
+
+from druider.encounters import (
+    MAX_COUNT,
+    EncounterIndex,
+    budget,
+    group_sizes,
+    run,
+    xp_for_cr,
+)
+from druider.main import parse_args
+
+
+@pytest.mark.parametrize(
+    "cr, xp",
+    [(-9, 50), (-4, 50), (-1, 135), (0, 200), (1, 400), (2, 600), (3, 800)]
+    + [(4, 1200), (10, 9600), (20, 307200)],
+)
+def test_xp_for_cr(cr, xp):
+    assert xp_for_cr(cr) == xp
+
+
+@pytest.mark.parametrize(
+    "level, party, difficulty, xp",
+    [
+        (1, 4, "average", 400),
+        (5, 4, "hard", 3200),
+        (5, 3, "average", 1200),
+        (5, 6, "average", 2400),
+        (5, 4, "easy", 1200),
+    ],
+)
+def test_budget(level, party, difficulty, xp):
+    assert budget(level, party, difficulty) == xp
+
+
+def test_budget_rejects_unknown_difficulty():
+    with pytest.raises(ValueError):
+        budget(5, 4, "deadly")
+
+
+@pytest.mark.parametrize(
+    "text, sizes",
+    [
+        ("", {1: "solitary"}),
+        ("NULL", {1: "solitary"}),
+        (
+            "solitary, pair, or pack (3-6)",
+            {1: "solitary", 2: "pair"} | dict.fromkeys(range(3, 7), "pack"),
+        ),
+        (
+            "gang (2-4) or band (3-9)",
+            dict.fromkeys(range(2, 5), "gang") | dict.fromkeys(range(5, 10), "band"),
+        ),
+        ("tribe (1d4 bands plus 10 leaders)", {1: "solitary"}),
+        ("colony (10)", {10: "colony"}),
+        ("any", dict.fromkeys(range(1, MAX_COUNT + 1), "any")),
+    ],
+)
+def test_group_sizes(text, sizes):
+    assert group_sizes(text) == sizes
+
+
+def test_group_sizes_allowed_and_limit():
+    text = "solitary, pair, or band (10-30)"
+    assert group_sizes(text, allowed={"pair", "band"}) == {2: "pair"} | dict.fromkeys(
+        range(10, MAX_COUNT + 1), "band"
+    )
+    assert max(group_sizes(text, limit=30)) == 30
+    assert group_sizes(text, allowed={"pack"}) == {}
+
+
+def test_find_fits_the_budget(data):
+    index = EncounterIndex.build(data)
+    total = budget(6)
+    found = index.find(total, kinds=3, count=5, slack=0.2)
+    assert found
+    seen = set()
+    for encounter in found:
+        assert 0.8 * total <= encounter.xp <= total
+        assert len(encounter.rows) == 3
+        assert not seen & encounter.rows
+        seen |= encounter.rows
+
+
+def test_run_names_groups_past_the_default_size(source):
+    args = parse_args(
+        ["encounter", "-l", "15", "-k", "1", "-n", "10", "--max-group", "30"]
+        + ["--organization", "band,gang,troop,colony,swarm", "--data", str(source)]
+    )
+    out = io.StringIO()
+    assert run(args, out) == 0
+    counts = [int(count) for count in re.findall(r"(\d+) × ", out.getvalue())]
+    assert max(counts) > MAX_COUNT
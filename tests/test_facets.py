@@ -0,0 +1,105 @@
+import pytest
+
+from druider import bitmap
+from druider.data import Column, Size
+from druider.facets import (
+    And,
+    Contains,
+    Facet,
+    FacetIndex,
+    Is,
+    Measure,
+    Not,
+    Or,
+    Range,
+    parse,
+)
+
+
+@pytest.mark.parametrize(
+    "expression, term",
+    [
+        ("type=animal", Is(Facet.type, ("animal",))),
+        ("Type = Animal", Is(Facet.type, ("animal",))),
+        ('type="magical beast"', Is(Facet.type, ("magical beast",))),
+        ("type=magical beast", Is(Facet.type, ("magical beast",))),
+        ("type!=animal", Not(Is(Facet.type, ("animal",)))),
+        ("environment ~ forest", Contains(Facet.environment, "forest")),
+        ("cr<=1/2", Range(Facet.cr, high=0.5)),
+        ("size>=large", Range(Facet.size, low="large")),
+        ("speed.swim>=30", Measure("speed.swim", ">=", 30.0)),
+        ('"skill.sleight of hand">+5', Measure("skill.sleight of hand", ">", 5.0)),
+        ("cr<1/2", And((Range(Facet.cr, high=0.5), Not(Is(Facet.cr, (0.5,)))))),
+        ("cr>6", And((Range(Facet.cr, low=6.0), Not(Is(Facet.cr, (6.0,)))))),
+        (
+            "type=animal size=small",
+            And((Is(Facet.type, ("animal",)), Is(Facet.size, ("small",)))),
+        ),
+        (
+            "type=animal AND NOT size=small",
+            And((Is(Facet.type, ("animal",)), Not(Is(Facet.size, ("small",))))),
+        ),
+        (
+            "not (type=animal or type=vermin)",
+            Not(Or((Is(Facet.type, ("animal",)), Is(Facet.type, ("vermin",))))),
+        ),
+        (
+            "type=animal OR type=magical beast, size<=large, cr<=6",
+            And(
+                (
+                    Or(
+                        (
+                            Is(Facet.type, ("animal",)),
+                            Is(Facet.type, ("magical beast",)),
+                        )
+                    ),
+                    Range(Facet.size, high="large"),
+                    Range(Facet.cr, high=6.0),
+                )
+            ),
+        ),
+    ],
+)
+def test_parse(expression, term):
+    assert parse(expression) == term
+
+
+def test_parse_blank():
+    assert parse("   ") is None
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "colour=red",
+        "type=",
+        "type animal",
+        "(type=animal",
+        "type=animal)",
+        "cr<=many",
+        "size=enormous",
+        "type<animal",
+        "type=animal !",
+        "speed.warp>1",
+        "hd~3",
+        "hd>=many",
+    ],
+)
+def test_parse_rejects(expression):
+    with pytest.raises(ValueError):
+        parse(expression)
+
+
+def test_resolve_matches_a_scan(data):
+    term = parse("type=animal OR type=vermin, size<=small, cr<=1")
+    expected = [
+        row
+        for row in range(len(data))
+        if data.cell(row, Column.type) in ("animal", "vermin")
+        and Size.parse(data.cell(row, Column.size)) <= Size.small
+        and Facet.cr.normalize(data.cell(row, Column.cr)) <= 1
+    ]
+    assert expected
+    # Built, then written to its sidecar, then read back from it.
+    for index in (FacetIndex.build(data), FacetIndex.load(data), FacetIndex.load(data)):
+        assert bitmap.members(term.resolve(index)) == expected
@@ -0,0 +1,71 @@
+from array import array
+
+from druider.logging import FileSink
+from druider.logview import PAGE, LogPages, _scan
+
+
+def write_lines(path, start, stop, tail=""):
+    with open(path, "a", encoding="utf-8") as file:
+        file.writelines(f"line {n}\n" for n in range(start, stop))
+        file.write(tail)
+
+
+def offsets(path):
+    """The byte offset of every line of `path`, scanned the slow way."""
+    found, offset = [], 0
+    for line in path.read_bytes().splitlines(keepends=True):
+        found.append(offset)
+        offset += len(line)
+    return found
+
+
+def test_scan_pages_every_page_lines(tmp_path):
+    path = tmp_path / "druider.log"
+    write_lines(path, 0, 2 * PAGE + 500)
+    pages = array("Q", [0])
+    size, lines = _scan(path, 0, 0, pages)
+    every = offsets(path)
+    assert (size, lines) == (path.stat().st_size, 2 * PAGE + 500)
+    assert list(pages) == [0, every[PAGE], every[2 * PAGE]]
+
+
+def test_scan_leaves_a_partial_line_uncounted(tmp_path):
+    path = tmp_path / "druider.log"
+    write_lines(path, 0, PAGE, tail="half a li")
+    pages = array("Q", [0])
+    size, lines = _scan(path, 0, 0, pages)
+    assert lines == PAGE
+    assert size == path.stat().st_size
+    assert list(pages) == [0, size - len("half a li")]
+
+
+def test_scan_resumes_like_a_full_scan(tmp_path):
+    path = tmp_path / "druider.log"
+    write_lines(path, 0, PAGE - 3)
+    pages = array("Q", [0])
+    size, lines = _scan(path, 0, 0, pages)
+    write_lines(path, PAGE - 3, 3 * PAGE + 7)
+    size, lines = _scan(path, size, lines, pages)
+    full = array("Q", [0])
+    assert (size, lines) == _scan(path, 0, 0, full)
+    assert pages == full
+
+
+def test_pages_read_lines_across_rotated_files(tmp_path):
+    sink = FileSink(tmp_path / "druider.log", backups=2)
+    write_lines(tmp_path / "druider.log.1", 0, PAGE + 10)
+    write_lines(tmp_path / "druider.log", PAGE + 10, PAGE + 20)
+    log = LogPages(sink, cache_pages=2)
+    log.update(*log.scan())
+    assert len(log) == PAGE + 20
+    assert [log.line(n) for n in (0, PAGE - 1, PAGE, PAGE + 19)] == [
+        "line 0",
+        f"line {PAGE - 1}",
+        f"line {PAGE}",
+        f"line {PAGE + 19}",
+    ]
+    assert log.line(PAGE + 20) == ""
+    assert log.scan() is None
+    write_lines(tmp_path / "druider.log", PAGE + 20, PAGE + 30)
+    log.update(*log.scan())
+    assert log.line(PAGE + 29) == f"line {PAGE + 29}"
@@ -0,0 +1,128 @@
+import pytest
+
+from druider.data import Column
+from druider.parsing import (
+    PARSED,
+    Attack,
+    Dice,
+    ParsedFields,
+    parse_attack,
+    parse_attacks,
+    parse_feats,
+    parse_hd,
+    parse_row,
+    parse_skills,
+    parse_speeds,
+    split_top,
+)
+
+
+def test_split_top_ignores_nested_separators():
+    assert split_top("a (b, c), d; e [f; g],, ") == ["a (b, c)", "d", "e [f; g]"]
+
+
+@pytest.mark.parametrize(
+    "text, attack",
+    [
+        ("bite +5 (1d6+2)", Attack(1, "bite", (5,), "1d6+2")),
+        ("2 claws +12 (1d6 + 5)", Attack(2, "claws", (12,), "1d6+5")),
+        (
+            "+1 longsword +15/+10 (1d8+7/19-20)",
+            Attack(1, "+1 longsword", (15, 10), "1d8+7", crit_range=19),
+        ),
+        ("slam +10 (1d8+3/x3)", Attack(1, "slam", (10,), "1d8+3", crit_multiplier=3)),
+        (
+            "bite +12 (2d6+5 plus grab)",
+            Attack(1, "bite", (12,), "2d6+5", extra="grab"),
+        ),
+        ("touch +4 touch (paralysis)", Attack(1, "touch", (4,), "", extra="paralysis")),
+        (
+            "swarm (3d6 plus distraction)",
+            Attack(1, "swarm", (), "3d6", extra="distraction"),
+        ),
+    ],
+)
+def test_parse_attack(text, attack):
+    assert parse_attack(text) == attack
+
+
+def test_parse_attacks_splits_alternatives_and_attacks():
+    options = parse_attacks(
+        "2 claws +12 (1d6+5), bite +12 (2d6+5) or slam +10 (1d8+3 or 2d6)"
+    )
+    assert [[attack.name for attack in option] for option in options] == [
+        ["claws", "bite"],
+        ["slam"],
+    ]
+    assert options[1][0].damage == "1d8+3"
+
+
+@pytest.mark.parametrize(
+    "text, dice",
+    [
+        ("3d8", (Dice(3, 8),)),
+        ("12d10+48 plus 20", (Dice(12, 10, 48),)),
+        ("3d8 +6", (Dice(3, 8, 6),)),
+        ("2d8-2", (Dice(2, 8, -2),)),
+        ("20d10+5d12+375", (Dice(20, 10), Dice(5, 12, 375))),
+        ("6 HD; 5d10+1d8+5", (Dice(5, 10), Dice(1, 8, 5))),
+    ],
+)
+def test_parse_hd(text, dice):
+    assert parse_hd(text) == dice
+
+
+def test_parse_speeds():
+    assert parse_speeds("30 ft., climb 20 ft., fly 60 ft. (good); swim 40 ft.") == {
+        "land": 30,
+        "climb": 20,
+        "fly": 60,
+        "swim": 40,
+    }
+
+
+def test_parse_skills_drops_riders():
+    assert parse_skills(
+        "Stealth +10 (+18 in forests), Sleight of  Hand +5, Swim -1"
+    ) == {
+        "stealth": 10,
+        "sleight of hand": 5,
+        "swim": -1,
+    }
+
+
+def test_parse_feats_keeps_parenthesized_choices():
+    assert parse_feats("Power Attack, Weapon Focus (bite, claw)") == (
+        "Power Attack",
+        "Weapon Focus (bite, claw)",
+    )
+
+
+@pytest.mark.parametrize("empty", ["", "NULL"])
+def test_empty_fields(empty):
+    parsed = parse_row(*(empty,) * len(PARSED))
+    assert parsed.melee == parsed.ranged == parsed.hd == parsed.feats == ()
+    assert parsed.speeds == parsed.skills == {}
+
+
+def test_select_matches_the_records(data):
+    fields = ParsedFields.build(data)
+    swim = [
+        row
+        for row in range(len(data))
+        if parse_speeds(data.cell(row, Column.speed)).get("swim", 0) >= 30
+    ]
+    assert swim
+    assert fields.select("speed.swim", ">=", 30) == sum(1 << row for row in swim)
+    assert fields.select("speed.warp", ">=", 30) == 0
+    with pytest.raises(ValueError):
+        fields.select("speed.swim", "~", 30)
+
+
+def test_load_matches_build(data):
+    built, loaded = ParsedFields.build(data), ParsedFields.load(data)
+    assert loaded.names() == built.names()
+    assert [loaded[row] for row in range(len(data))] == list(built.records)
+    assert loaded[5] is loaded[5]
+    for name in built.names():
+        assert loaded.select(name, "<", 10) == built.select(name, "<", 10)
@@ -0,0 +1,88 @@
+from typing import List
+
+from druider.data import Column, DataType, EntryType, sort_key
+from druider.facets import Facet, FacetIndex
+from druider.links import Link, LinkIndex
+from druider.reload import Patched, Reloader
+from druider.search import SearchIndex
+from druider.sorting import SORTABLE, SortEngine
+from druider.wildshape import WildShapeIndex
+
+
+def edited(row: EntryType, **cells: str) -> EntryType:
+    entry = list(row)
+    for name, value in cells.items():
+        entry[Column[name]] = value
+    return tuple(entry)
+
+
+def current(data: DataType) -> List[EntryType]:
+    return [data[row] for row in range(len(data)) if row not in data.removed]
+
+
+def live(data: DataType, rows) -> set:
+    return {row for row in rows if row not in data.removed}
+
+
+def assert_rebuilt(patched: Patched) -> None:
+    """Every patched index answers as one built from the patched rows does."""
+    data = patched.data
+    # A build indexes tombstoned rows too; patched indexes drop them.
+    alive = sum(1 << row for row in live(data, range(len(data))))
+    facets = FacetIndex.build(data)
+    for facet in Facet:
+        for key in facets.values(facet):
+            assert patched.facets.rows(facet, key) == facets.rows(facet, key) & alive
+    index = SearchIndex.build(data)
+    for query in ("wolf", "abys", "dire wolf", "renamed", "zzz"):
+        assert live(data, patched.index.search(query)) == live(
+            data, index.search(query)
+        )
+    sorter = SortEngine.build(data)
+    for column in SORTABLE:
+        for reverse in (False, True):
+            keys = [(column, reverse)]
+            assert [
+                sort_key(column, data.cell(row, column))
+                for row in patched.sorter.order(keys)
+            ] == [
+                sort_key(column, data.cell(row, column)) for row in sorter.order(keys)
+            ]
+    wildshape = WildShapeIndex.build(facets)
+    for level in range(1, 21):
+        assert patched.wildshape.rows(level) == wildshape.rows(level) & alive
+    links = LinkIndex.build(data)
+    for row in range(len(data)):
+        for link in Link:
+            assert set(patched.links.get(link, row)) == set(links.get(link, row))
+
+
+def test_reload_patches_like_a_rebuild(data):
+    reloader = Reloader(
+        data,
+        SearchIndex.build(data),
+        FacetIndex.build(data),
+        SortEngine.build(data),
+        LinkIndex.build(data),
+    )
+    rows = current(data)
+    rows[3] = edited(rows[3], _name="Renamed Genie", size="Tiny", group="Demon")
+    rows[7] = edited(rows[7], type="animal", cr="1/2", variantparent="Aboleth")
+    inserted = edited(rows[10], id="99999", _name="Abyssal Wolf Pup", size="Small")
+    del rows[10]
+    rows.append(inserted)
+    changes = reloader.diff(rows)
+    assert set(changes.changed) == {3, 7}
+    assert changes.inserted == {len(data): inserted}
+    assert changes.removed == {10}
+    patched = reloader.apply(changes)
+    assert patched.data[3][Column._name] == "Renamed Genie"
+    assert_rebuilt(patched)
+
+    # A second reload patches on top of the first.
+    rows = current(patched.data)
+    rows[0] = edited(rows[0], _name="Renamed Aasimar", type="animal", size="Small")
+    changes = reloader.diff(rows[:-1])
+    assert set(changes.changed) == {0} and not changes.inserted
+    assert changes.removed == {len(data)}
+    assert_rebuilt(reloader.apply(changes))